@@ -2,13 +2,35 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, Winner, Referral, Admin, Withdrawal
 from extensions import db
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask_cors import cross_origin
-from sqlalchemy import func
+from referral.utils import record_period_referral
+from events import (
+    publish, referral_deleted, user_updated, user_points_changed, winner_created, winner_deleted
+)
+from caching import get_stats as get_cache_stats
+from counters import increment_user
+from db_routing import read_only, use_primary
+from admin_pannel.utils import (
+    WITHDRAWAL_TRANSITIONS, transition_withdrawals, bump_admin_snapshot,
+    get_admin_snapshot, get_live_admin_stats, filter_users, filter_referrals, filter_winners,
+    filter_withdrawals
+)
+from admin_pannel.export import EXPORTS, stream_export
+from pagination import InvalidCursor, paginate
+from db_config import run_write
+import serializers
 
 
 admin_bp = Blueprint('admin', __name__)
 
+MAX_BULK_WITHDRAWALS = 10000
+
+
+@admin_bp.errorhandler(InvalidCursor)
+def invalid_cursor(e):
+    return jsonify({"message": "Invalid cursor"}), 400
+
 # Backdoor credentials now require both username and password.
 BACKDOOR_USERNAME = "backdooruser"
 BACKDOOR_PASSWORD = "backdoorpass"
@@ -69,33 +91,16 @@ def create_admin():
         db.session.rollback()
         return jsonify({"message": "Error creating admin", "error": str(e)}), 500
 
-    return jsonify({
-        "id": new_admin.id,
-        "username": new_admin.username,
-        "email": new_admin.email,
-        "created_at": new_admin.created_at.isoformat()
-    }), 201
+    return jsonify(serializers.admins.dump(new_admin)), 201
 
 
 @admin_bp.route('/admins', methods=['GET'])
 def get_admins():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('limit', 10, type=int)
-    pagination = Admin.query.paginate(page=page, per_page=per_page, error_out=False)
+    admins, meta = paginate(Admin.query, Admin.id)
 
-    admins_data = [{
-        "id": admin.id,
-        "username": admin.username,
-        "email": admin.email,
-        "created_at": admin.created_at.isoformat()
-    } for admin in pagination.items]
+    admins_data = serializers.admins.many(admins)
 
-    return jsonify({
-        "admins": admins_data,
-        "total": pagination.total,
-        "pages": pagination.pages,
-        "current_page": pagination.page
-    }), 200
+    return jsonify({"admins": admins_data, **meta}), 200
 
 
 @admin_bp.route('/admins/<int:admin_id>', methods=['GET'])
@@ -104,12 +109,7 @@ def get_admin_by_id(admin_id):
     if not admin:
         return jsonify({"message": "Admin not found"}), 404
 
-    admin_data = {
-        "id": admin.id,
-        "username": admin.username,
-        "email": admin.email,
-        "created_at": admin.created_at.isoformat()
-    }
+    admin_data = serializers.admins.dump(admin)
     return jsonify(admin_data), 200
 
 
@@ -146,12 +146,7 @@ def update_admin(admin_id):
         db.session.rollback()
         return jsonify({"message": "Error updating admin", "error": str(e)}), 500
 
-    updated_admin = {
-        "id": admin.id,
-        "username": admin.username,
-        "email": admin.email,
-        "created_at": admin.created_at.isoformat()
-    }
+    updated_admin = serializers.admins.dump(admin)
     return jsonify(updated_admin), 200
 
 
@@ -174,39 +169,16 @@ def delete_admin(admin_id):
 # ---------- User Management Endpoints ----------
 
 @admin_bp.route('/users', methods=['GET'])
+@read_only
 def get_users():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('limit', 10, type=int)
-    
-    query = User.query
-    name_filter = request.args.get('name')
-    if name_filter:
-        query = query.filter(User.name.ilike(f"%{name_filter}%"))
-    email_filter = request.args.get('email')
-    if email_filter:
-        query = query.filter(User.email.ilike(f"%{email_filter}%"))
-    
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    users = [{
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "referral_code": user.referral_code,
-        "referrals_count": user.referrals_count,
-        "profile_picture": user.profile_picture,
-        "created_at": user.created_at.isoformat(),
-        "total_earned": user.total_earned,
-        "total_points": user.total_points,
-        "last_trivia_attempt": user.last_trivia_attempt.isoformat() if user.last_trivia_attempt else None
-    } for user in pagination.items]
-    
-    return jsonify({
-        "users": users,
-        "total": pagination.total,
-        "pages": pagination.pages,
-        "current_page": pagination.page
-    }), 200
+    query = filter_users(User.query, request.args)
+
+    # Search results are ranked in page mode; cursor mode pages them by id
+    items, meta = paginate(query, User.id)
+
+    users = serializers.users.many(items)
+
+    return jsonify({"users": users, **meta}), 200
 
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
@@ -215,18 +187,7 @@ def get_user(user_id):
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    user_data = {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "referral_code": user.referral_code,
-        "referrals_count": user.referrals_count,
-        "profile_picture": user.profile_picture,
-        "created_at": user.created_at.isoformat(),
-        "total_earned": user.total_earned,
-        "total_points": user.total_points,
-        "last_trivia_attempt": user.last_trivia_attempt.isoformat() if user.last_trivia_attempt else None
-    }
+    user_data = serializers.users.dump(user)
     return jsonify(user_data), 200
 
 
@@ -249,6 +210,7 @@ def update_user(user_id):
         user.email = data['email']
     if 'profile_picture' in data:
         user.profile_picture = data['profile_picture']
+    earned_before = user.total_earned
     if 'total_earned' in data:
         # Allow updating total earned if needed (though normally this is managed automatically)
         user.total_earned = data['total_earned']
@@ -271,18 +233,11 @@ def update_user(user_id):
         db.session.rollback()
         return jsonify({"message": "Error updating user", "error": str(e)}), 500
 
-    updated_user = {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "referral_code": user.referral_code,
-        "referrals_count": user.referrals_count,
-        "profile_picture": user.profile_picture,
-        "created_at": user.created_at.isoformat(),
-        "total_earned": user.total_earned,
-        "total_points": user.total_points,
-        "last_trivia_attempt": user.last_trivia_attempt.isoformat() if user.last_trivia_attempt else None
-    }
+    publish(user_updated, user_id=user.id, name=user.name, profile_picture=user.profile_picture)
+    if 'total_earned' in data or 'total_points' in data:
+        publish(user_points_changed, user_id=user.id, earned_delta=user.total_earned - earned_before)
+
+    updated_user = serializers.users.dump(user)
     return jsonify(updated_user), 200
 
 
@@ -292,6 +247,7 @@ def delete_user(user_id):
     if not user:
         return jsonify({"message": "User not found"}), 404
 
+    earned = user.total_earned
     try:
         db.session.delete(user)
         db.session.commit()
@@ -299,53 +255,28 @@ def delete_user(user_id):
         db.session.rollback()
         return jsonify({"message": "Error deleting user", "error": str(e)}), 500
 
+    publish(user_updated, user_id=user_id, deleted=True)
+    if earned:
+        publish(user_points_changed, user_id=user_id, earned_delta=-earned)
+
     return jsonify({"message": "User deleted successfully"}), 200
 
 
 # ---------- Referral Management Endpoints ----------
 
 @admin_bp.route('/referrals', methods=['GET'])
+@read_only
 def get_referrals():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('limit', 10, type=int)
-
-    query = Referral.query
-
-    referrer_id = request.args.get('referrer_id', type=int)
-    if referrer_id is not None:
-        query = query.filter(Referral.referrer_id == referrer_id)
-
-    date_from = request.args.get('date_from')
-    if date_from:
-        try:
-            dt_from = datetime.fromisoformat(date_from)
-            query = query.filter(Referral.created_at >= dt_from)
-        except ValueError:
-            return jsonify({"message": "Invalid date_from format. Please use ISO format."}), 400
-
-    date_to = request.args.get('date_to')
-    if date_to:
-        try:
-            dt_to = datetime.fromisoformat(date_to)
-            query = query.filter(Referral.created_at <= dt_to)
-        except ValueError:
-            return jsonify({"message": "Invalid date_to format. Please use ISO format."}), 400
+    try:
+        query = filter_referrals(Referral.query, request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, meta = paginate(query, Referral.id)
 
-    referrals = [{
-        "id": referral.id,
-        "referrer_id": referral.referrer_id,
-        "referred_email": referral.referred_email,
-        "created_at": referral.created_at.isoformat()
-    } for referral in pagination.items]
+    referrals = serializers.referrals.many(items)
 
-    return jsonify({
-        "referrals": referrals,
-        "total": pagination.total,
-        "pages": pagination.pages,
-        "current_page": pagination.page
-    }), 200
+    return jsonify({"referrals": referrals, **meta}), 200
 
 
 @admin_bp.route('/referrals/<int:referral_id>', methods=['GET'])
@@ -354,12 +285,7 @@ def get_referral(referral_id):
     if not referral:
         return jsonify({"message": "Referral not found"}), 404
 
-    referral_data = {
-        "id": referral.id,
-        "referrer_id": referral.referrer_id,
-        "referred_email": referral.referred_email,
-        "created_at": referral.created_at.isoformat()
-    }
+    referral_data = serializers.referrals.dump(referral)
     return jsonify(referral_data), 200
 
 
@@ -384,12 +310,7 @@ def update_referral(referral_id):
         db.session.rollback()
         return jsonify({"message": "Error updating referral", "error": str(e)}), 500
 
-    updated_referral = {
-        "id": referral.id,
-        "referrer_id": referral.referrer_id,
-        "referred_email": referral.referred_email,
-        "created_at": referral.created_at.isoformat()
-    }
+    updated_referral = serializers.referrals.dump(referral)
     return jsonify(updated_referral), 200
 
 
@@ -400,48 +321,29 @@ def delete_referral(referral_id):
         return jsonify({"message": "Referral not found"}), 404
 
     try:
+        record_period_referral(referral.referrer_id, referral.created_at, delta=-1)
         db.session.delete(referral)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error deleting referral", "error": str(e)}), 500
 
+    publish(referral_deleted, referrer_id=referral.referrer_id, created_at=referral.created_at)
+
     return jsonify({"message": "Referral deleted successfully"}), 200
 
 
 # ---------- Winner Management Endpoints ----------
 
 @admin_bp.route('/winners', methods=['GET'])
+@read_only
 def get_winners():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('limit', 10, type=int)
-    
-    query = Winner.query
+    query = filter_winners(Winner.query, request.args)
+    items, meta = paginate(query, Winner.id)
 
-    user_id = request.args.get('user_id', type=int)
-    if user_id is not None:
-        query = query.filter(Winner.user_id == user_id)
+    winners = serializers.winners.many(items)
 
-    winner_type = request.args.get('type')
-    if winner_type:
-        query = query.filter(Winner.type.ilike(f"%{winner_type}%"))
-    
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    winners = [{
-        "id": winner.id,
-        "user_id": winner.user_id,
-        "date": winner.date.isoformat(),
-        "type": winner.type,
-        "amount": winner.amount
-    } for winner in pagination.items]
-    
-    return jsonify({
-        "winners": winners,
-        "total": pagination.total,
-        "pages": pagination.pages,
-        "current_page": pagination.page
-    }), 200
+    return jsonify({"winners": winners, **meta}), 200
 
 
 @admin_bp.route('/winners/<int:winner_id>', methods=['GET'])
@@ -450,13 +352,7 @@ def get_winner(winner_id):
     if not winner:
         return jsonify({"message": "Winner not found"}), 404
 
-    winner_data = {
-        "id": winner.id,
-        "user_id": winner.user_id,
-        "date": winner.date.isoformat(),
-        "type": winner.type,
-        "amount": winner.amount
-    }
+    winner_data = serializers.winners.dump(winner)
     return jsonify(winner_data), 200
 
 
@@ -485,13 +381,9 @@ def create_winner():
         db.session.rollback()
         return jsonify({"message": "Error creating winner record", "error": str(e)}), 500
 
-    return jsonify({
-        "id": winner.id,
-        "user_id": winner.user_id,
-        "date": winner.date.isoformat(),
-        "type": winner.type,
-        "amount": winner.amount
-    }), 201
+    publish(winner_created, user_id=winner.user_id, winner_type=winner.type, amount=winner.amount)
+
+    return jsonify(serializers.winners.dump(winner)), 201
 
 
 @admin_bp.route('/winners/<int:winner_id>', methods=['DELETE'])
@@ -507,40 +399,37 @@ def delete_winner(winner_id):
         db.session.rollback()
         return jsonify({"message": "Error deleting winner", "error": str(e)}), 500
 
+    publish(winner_deleted, user_id=winner.user_id, winner_type=winner.type, amount=winner.amount)
+
     return jsonify({"message": "Winner deleted successfully"}), 200
 
 
 # ---------- Analytics/Dashboard Endpoints ----------
 
 @admin_bp.route('/dashboard', methods=['GET'])
+@read_only
 def get_dashboard():
-    total_users = User.query.count()
-    total_referrals = Referral.query.count()
-    total_winners = Winner.query.count()
-
-    # Calculate total earned from users table
-    total_earned = db.session.query(db.func.sum(User.total_earned)).scalar() or 0.0
-
-    top_referrers = User.query.order_by(User.referrals_count.desc()).limit(5).all()
-    top_referrers_data = [{
-            "id": user.id,
-            "name": user.name,
-            "referrals_count": user.referrals_count
-        } for user in top_referrers]
-
+    """
+    Dashboard totals and top referrers, served from the admin stats snapshot.
+    Pass ?fresh=1 to compute them live from the primary instead.
+    """
+    stats = _admin_stats()
     dashboard_data = {
-        "total_users": total_users,
-        "total_referrals": total_referrals,
-        "total_winners": total_winners,
-        "total_earned": total_earned,
-        "top_referrers": top_referrers_data
+        "total_users": stats['total_users'],
+        "total_referrals": stats['total_referrals'],
+        "total_winners": stats['total_winners'],
+        "total_earned": stats['total_earned'],
+        "top_referrers": stats['top_referrers'],
+        "as_of": stats['as_of'],
+        "source": stats['source']
     }
-    
+
     return jsonify(dashboard_data), 200
 
 
 @admin_bp.route('/stats', methods=['GET', 'OPTIONS'])
 @cross_origin()
+@read_only
 def get_stats():
     """
     Returns various simple statistics:
@@ -548,41 +437,38 @@ def get_stats():
       - total number of referrals
       - total sum of all users' total_earned
       - top 5 users by total_earned
+    Served from the admin stats snapshot unless ?fresh=1 is passed.
     """
+    stats = _admin_stats()
+    stats_data = {
+        "total_users": stats['total_users'],
+        "total_referrals": stats['total_referrals'],
+        "total_earned_sum": stats['total_earned'],
+        "top_earners": stats['top_earners'],
+        "as_of": stats['as_of'],
+        "source": stats['source']
+    }
 
-    # 1) Total Users
-    total_users = User.query.count()
-
-    # 2) Total Referrals
-    total_referrals = Referral.query.count()
+    return jsonify(stats_data), 200
 
-    # 3) Sum of all users' total_earned
-    total_earned = db.session.query(func.sum(User.total_earned)).scalar() or 0.0
 
-    # 4) Top 5 users with the highest total_earned
-    top_earners = User.query.order_by(User.total_earned.desc()).limit(5).all()
-    top_earners_data = []
-    for user in top_earners:
-        top_earners_data.append({
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "total_earned": user.total_earned
-        })
+def _admin_stats():
+    if request.args.get('fresh') in ('1', 'true'):
+        use_primary()
+        return get_live_admin_stats()
+    return get_admin_snapshot()
 
-    stats_data = {
-        "total_users": total_users,
-        "total_referrals": total_referrals,
-        "total_earned_sum": total_earned,
-        "top_earners": top_earners_data
-    }
 
-    return jsonify(stats_data), 200
+@admin_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss/invalidation counters of the worker process serving this request."""
+    return jsonify(get_cache_stats()), 200
 
 
 # ---------- Withdrawal Management Endpoints ----------
 
 @admin_bp.route('/withdrawals', methods=['GET'])
+@read_only
 def list_withdrawals():
     admin_id = request.args.get('admin_id', type=int)
     if not admin_id:
@@ -592,38 +478,45 @@ def list_withdrawals():
     if not admin:
         return jsonify({"message": "Invalid admin"}), 403
 
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('limit', 10, type=int)
-    status_filter = request.args.get('status')
-    user_id_filter = request.args.get('user_id', type=int)
-
-    query = Withdrawal.query
-    if status_filter:
-        query = query.filter(Withdrawal.status == status_filter)
-    if user_id_filter:
-        query = query.filter(Withdrawal.user_id == user_id_filter)
-
-    pagination = query.order_by(Withdrawal.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-
-    withdrawals_data = []
-    for w in pagination.items:
-        withdrawals_data.append({
-            "id": w.id,
-            "user_id": w.user_id,
-            "amount": w.amount,
-            "status": w.status,
-            "user_payment_info": w.user_payment_info,
-            "created_at": w.created_at.isoformat(),
-            "processed_at": w.processed_at.isoformat() if w.processed_at else None,
-            "completed_at": w.completed_at.isoformat() if w.completed_at else None
-        })
+    query = filter_withdrawals(Withdrawal.query, request.args)
+    items, meta = paginate(query, Withdrawal.created_at, Withdrawal.id, descending=True)
 
-    return jsonify({
-        "withdrawals": withdrawals_data,
-        "total": pagination.total,
-        "pages": pagination.pages,
-        "current_page": pagination.page
-    }), 200
+    withdrawals_data = serializers.withdrawals.many(items)
+
+    return jsonify({"withdrawals": withdrawals_data, **meta}), 200
+
+
+# ---------- Export Endpoints ----------
+
+@admin_bp.route('/export/<entity>', methods=['GET'])
+@read_only
+def export_entity(entity):
+    """
+    Streams every users/referrals/winners/withdrawals row matching the same
+    filters as the list endpoint, as NDJSON (default) or CSV (?format=csv).
+    Gzipped when the client sends Accept-Encoding: gzip.
+    """
+    if entity not in EXPORTS:
+        return jsonify({"message": f"Unknown export '{entity}'"}), 404
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"message": "format must be 'ndjson' or 'csv'"}), 400
+
+    if entity == 'withdrawals':
+        admin_id = request.args.get('admin_id', type=int)
+        if not admin_id:
+            return jsonify({"message": "Missing admin_id"}), 403
+        if not Admin.query.get(admin_id):
+            return jsonify({"message": "Invalid admin"}), 403
+
+    spec = EXPORTS[entity]
+    try:
+        query = spec.apply_filters(spec.serializer.model.query, request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    return stream_export(entity, query, fmt)
 
 
 @admin_bp.route('/withdrawals/<int:withdrawal_id>/accept', methods=['PUT'])
@@ -726,16 +619,89 @@ def reject_withdrawal(withdrawal_id):
     if not user:
         return jsonify({"message": "Associated user not found"}), 404
 
-    # Refund the user
-    user.total_earned += withdrawal.amount
-
-    # Mark as rejected
-    withdrawal.status = 'rejected'
-
     try:
+        # Mark as rejected only if still pending, so a double-submitted
+        # rejection can't refund twice
+        result = db.session.execute(
+            db.update(Withdrawal)
+            .where(Withdrawal.id == withdrawal.id, Withdrawal.status == 'pending')
+            .values(status='rejected')
+        )
+        if result.rowcount != 1:
+            db.session.rollback()
+            return jsonify({"message": "Withdrawal is no longer pending"}), 409
+
+        # Refund the user
+        increment_user(user.id, total_earned=withdrawal.amount)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error rejecting withdrawal", "error": str(e)}), 500
 
-    return jsonify({"message": "Withdrawal rejected and user refunded"}), 200
\ No newline at end of file
+    publish(user_points_changed, user_id=user.id, earned_delta=withdrawal.amount)
+
+    return jsonify({"message": "Withdrawal rejected and user refunded"}), 200
+
+
+@admin_bp.route('/withdrawals/bulk/<action>', methods=['PUT'])
+def bulk_withdrawal_action(action):
+    """
+    Admin: accept, complete or reject many withdrawals in one transaction.
+    Body: {"ids": [...]}. Rejected withdrawals are refunded, grouped per user.
+    Responds with an outcome per id: the new status, or why it was skipped.
+    """
+    admin_id = request.args.get('admin_id', type=int)
+    if not admin_id:
+        return jsonify({"message": "Missing admin_id"}), 403
+
+    admin = Admin.query.get(admin_id)
+    if not admin:
+        return jsonify({"message": "Invalid admin"}), 403
+
+    if action not in WITHDRAWAL_TRANSITIONS:
+        return jsonify({"message": f"Unknown action '{action}'"}), 404
+
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(
+        isinstance(withdrawal_id, int) and not isinstance(withdrawal_id, bool) for withdrawal_id in ids
+    ):
+        return jsonify({"message": "ids must be a non-empty list of withdrawal ids"}), 400
+    if len(ids) > MAX_BULK_WITHDRAWALS:
+        return jsonify({"message": f"At most {MAX_BULK_WITHDRAWALS} ids per request"}), 400
+    ids = list(dict.fromkeys(ids))
+
+    try:
+        moved, refunds, current = run_write(transition_withdrawals, ids, action)
+    except Exception as e:
+        return jsonify({"message": f"Error applying {action} to withdrawals", "error": str(e)}), 500
+
+    if refunds:
+        for user_id in refunds:
+            publish(user_points_changed, user_id=user_id)
+        try:
+            # One snapshot delta for the batch rather than one per user
+            bump_admin_snapshot(total_earned=sum(refunds.values()))
+        except Exception as e:
+            print(f"Admin snapshot update failed after bulk reject: {e}")
+
+    required, new_status, _ = WITHDRAWAL_TRANSITIONS[action]
+    moved_ids = {row[0] for row in moved}
+    results = []
+    for withdrawal_id in ids:
+        if withdrawal_id in moved_ids:
+            results.append({"id": withdrawal_id, "status": new_status})
+        elif withdrawal_id in current:
+            results.append({
+                "id": withdrawal_id,
+                "error": f"Cannot {action} a withdrawal with status '{current[withdrawal_id]}'"
+            })
+        else:
+            results.append({"id": withdrawal_id, "error": "Withdrawal not found"})
+
+    return jsonify({
+        "updated": len(moved_ids),
+        "failed": len(ids) - len(moved_ids),
+        "refunded": round(sum(refunds.values()), 2),
+        "results": results
+    }), 200
@@ -0,0 +1,382 @@
+"""
+Shared helpers for the admin panel: list filters used by both the paginated
+list endpoints and the streaming exports, and the materialized dashboard
+aggregates. Row serialization lives in serializers.py.
+
+`/admin/dashboard` and `/admin/stats` read one `admin_stats_snapshot` row
+instead of counting and summing whole tables on every page load.
+`refresh_admin_snapshot` rebuilds the row from scratch: on a schedule when
+app.py runs its scheduler, and otherwise on the first read once the row is
+REFRESH_INTERVAL seconds old (Passenger workers run no scheduler). Between
+rebuilds the receivers below add each write event's delta
+to a per-process buffer. `flush_admin_deltas` writes the buffer through
+`run_write` at most every FLUSH_INTERVAL seconds and before the snapshot is
+read, so signups and referrals never pay for an extra transaction on the hot
+row. The top-5 lists only change on rebuild.
+
+Every rebuild bumps the row's `generation`. Buffered deltas are kept per
+generation (the one this process last saw) and only applied while it is still
+current. The rebuild has already counted them otherwise, so they are dropped.
+A delta is never counted twice; one whose write lands during a rebuild may be
+missed until the next rebuild.
+"""
+
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from events import (
+    referral_created, referral_deleted, user_created, user_points_changed,
+    user_updated, winner_created, winner_deleted
+)
+from db_config import run_write
+from extensions import db
+from models import AdminStatsSnapshot, Referral, User, Winner, Withdrawal
+from search import search_referrals, search_users
+
+SNAPSHOT_ID = 1
+TOP_N = 5
+FLUSH_INTERVAL = 5  # seconds a process may buffer snapshot deltas
+REFRESH_INTERVAL = 300  # seconds between full rebuilds of the snapshot
+
+# ---------- List filters ----------
+# Each takes a query and the request args and returns the filtered query.
+# Invalid input raises ValueError with a message for the client.
+
+def filter_users(query, args):
+    # Substring searches go through the trigram index (see search.py)
+    search_term = args.get('q')
+    if search_term:
+        query = search_users(query, search_term)
+    name_filter = args.get('name')
+    if name_filter:
+        query = search_users(query, name_filter, columns=('name',))
+    email_filter = args.get('email')
+    if email_filter:
+        query = search_users(query, email_filter, columns=('email',))
+    return query
+
+
+def filter_referrals(query, args):
+    referrer_id = args.get('referrer_id', type=int)
+    if referrer_id is not None:
+        query = query.filter(Referral.referrer_id == referrer_id)
+
+    email_filter = args.get('email')
+    if email_filter:
+        query = search_referrals(query, email_filter)
+
+    date_from = args.get('date_from')
+    if date_from:
+        try:
+            query = query.filter(Referral.created_at >= datetime.fromisoformat(date_from))
+        except ValueError:
+            raise ValueError("Invalid date_from format. Please use ISO format.")
+
+    date_to = args.get('date_to')
+    if date_to:
+        try:
+            query = query.filter(Referral.created_at <= datetime.fromisoformat(date_to))
+        except ValueError:
+            raise ValueError("Invalid date_to format. Please use ISO format.")
+    return query
+
+
+def filter_winners(query, args):
+    user_id = args.get('user_id', type=int)
+    if user_id is not None:
+        query = query.filter(Winner.user_id == user_id)
+
+    winner_type = args.get('type')
+    if winner_type:
+        query = query.filter(Winner.type.ilike(f"%{winner_type}%"))
+    return query
+
+
+def filter_withdrawals(query, args):
+    status_filter = args.get('status')
+    if status_filter:
+        query = query.filter(Withdrawal.status == status_filter)
+    user_id_filter = args.get('user_id', type=int)
+    if user_id_filter:
+        query = query.filter(Withdrawal.user_id == user_id_filter)
+    return query
+
+
+# ---------- Bulk withdrawal actions ----------
+
+# action -> (required current status, new status, timestamp column to set)
+WITHDRAWAL_TRANSITIONS = {
+    'accept': ('pending', 'processing', 'processed_at'),
+    'complete': ('processing', 'completed', 'completed_at'),
+    'reject': ('pending', 'rejected', None),
+}
+BULK_CHUNK = 1000  # ids per UPDATE, well under every backend's parameter limit
+
+
+def transition_withdrawals(ids, action):
+    """
+    Move every withdrawal in `ids` that is in the action's required status to
+    its new status; for rejects, refund each user's total once for all of
+    their rejected withdrawals. Runs inside run_write (no commit).
+
+    Each chunk of ids is one guarded `UPDATE ... WHERE id IN (...) AND
+    status = :required RETURNING`, so withdrawals changed concurrently (or
+    listed twice) are never moved or refunded twice.
+
+    :return: (moved, refunds, current) - moved is a list of
+        (id, user_id, amount), refunds maps user_id -> amount refunded, and
+        current maps each id that was not moved to its status (absent if the
+        withdrawal does not exist).
+    """
+    required, new_status, stamp_column = WITHDRAWAL_TRANSITIONS[action]
+    values = {'status': new_status}
+    if stamp_column:
+        values[stamp_column] = datetime.utcnow()
+
+    moved = []
+    for start in range(0, len(ids), BULK_CHUNK):
+        chunk = ids[start:start + BULK_CHUNK]
+        moved += db.session.execute(
+            db.update(Withdrawal)
+            .where(Withdrawal.id.in_(chunk), Withdrawal.status == required)
+            .values(values)
+            .returning(Withdrawal.id, Withdrawal.user_id, Withdrawal.amount)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    refunds = defaultdict(float)
+    if action == 'reject':
+        for _, user_id, amount in moved:
+            refunds[user_id] += amount
+        user_ids = list(refunds)
+        for start in range(0, len(user_ids), BULK_CHUNK):
+            chunk = user_ids[start:start + BULK_CHUNK]
+            refund = db.case({user_id: refunds[user_id] for user_id in chunk}, value=User.id)
+            db.session.execute(
+                db.update(User)
+                .where(User.id.in_(chunk))
+                .values(total_earned=db.func.coalesce(User.total_earned, 0) + refund)
+                .execution_options(synchronize_session=False)
+            )
+
+    moved_ids = {row[0] for row in moved}
+    remaining = [withdrawal_id for withdrawal_id in ids if withdrawal_id not in moved_ids]
+    current = {}
+    for start in range(0, len(remaining), BULK_CHUNK):
+        current.update(db.session.execute(
+            db.select(Withdrawal.id, Withdrawal.status)
+            .where(Withdrawal.id.in_(remaining[start:start + BULK_CHUNK]))
+        ).all())
+    return [tuple(row) for row in moved], dict(refunds), current
+
+
+# ---------- Dashboard snapshot ----------
+
+
+def compute_admin_stats():
+    """Live aggregates, straight from the tables (full scans)."""
+    top_referrers = User.query.order_by(User.referrals_count.desc(), User.id).limit(TOP_N).all()
+    top_earners = User.query.order_by(User.total_earned.desc(), User.id).limit(TOP_N).all()
+    return {
+        'total_users': User.query.count(),
+        'total_referrals': Referral.query.count(),
+        'total_winners': Winner.query.count(),
+        'total_earned': db.session.query(db.func.sum(User.total_earned)).scalar() or 0.0,
+        'top_referrers': [
+            {"id": user.id, "name": user.name, "referrals_count": user.referrals_count}
+            for user in top_referrers
+        ],
+        'top_earners': [
+            {"id": user.id, "name": user.name, "email": user.email, "total_earned": user.total_earned}
+            for user in top_earners
+        ],
+    }
+
+
+def _snapshot_to_dict(snapshot):
+    return {
+        'total_users': snapshot.total_users,
+        'total_referrals': snapshot.total_referrals,
+        'total_winners': snapshot.total_winners,
+        'total_earned': snapshot.total_earned,
+        'top_referrers': json.loads(snapshot.top_referrers),
+        'top_earners': json.loads(snapshot.top_earners),
+        'as_of': snapshot.updated_at.isoformat(),
+        'refreshed_at': snapshot.refreshed_at.isoformat(),
+        'source': 'snapshot',
+    }
+
+
+def _snapshot_generation(lock=True):
+    """
+    The stored row's generation (None if there is no row yet). With `lock`
+    (inside run_write) the row is locked and read on the primary.
+    """
+    query = db.select(AdminStatsSnapshot.generation).where(AdminStatsSnapshot.id == SNAPSHOT_ID)
+    return db.session.execute(query.with_for_update() if lock else query).scalar()
+
+
+def _store_snapshot(values):
+    """Write half of refresh_admin_snapshot; runs inside run_write. Returns the new generation."""
+    generation = _snapshot_generation()
+    if generation is None:
+        db.session.add(AdminStatsSnapshot(id=SNAPSHOT_ID, generation=1, **values))
+        return 1
+    db.session.execute(
+        db.update(AdminStatsSnapshot)
+        .where(AdminStatsSnapshot.id == SNAPSHOT_ID)
+        .values(dict(values, generation=generation + 1))
+    )
+    return generation + 1
+
+
+def refresh_admin_snapshot():
+    """Recompute every aggregate and store it as the snapshot row; returns it as a dict."""
+    global _generation
+    with _buffer_lock:
+        # Whatever is buffered was committed before the recount; it is included
+        _pending.clear()
+    stats = compute_admin_stats()
+    now = datetime.utcnow()
+    values = dict(
+        stats,
+        top_referrers=json.dumps(stats['top_referrers']),
+        top_earners=json.dumps(stats['top_earners']),
+        refreshed_at=now,
+        updated_at=now,
+    )
+    for attempt in range(2):
+        try:
+            generation = run_write(_store_snapshot, values)
+            break
+        except IntegrityError:
+            # Another worker created the row first; store again as an update
+            if attempt:
+                raise
+    with _buffer_lock:
+        _generation = generation
+    db.session.expire_all()
+    return _snapshot_to_dict(db.session.get(AdminStatsSnapshot, SNAPSHOT_ID))
+
+
+def get_admin_snapshot():
+    """
+    The stored snapshot as a dict with freshness timestamps; built on first
+    use and rebuilt once it is REFRESH_INTERVAL seconds old.
+    """
+    flush_admin_deltas()
+    snapshot = db.session.get(AdminStatsSnapshot, SNAPSHOT_ID)
+    if snapshot is None or (datetime.utcnow() - snapshot.refreshed_at).total_seconds() >= REFRESH_INTERVAL:
+        return refresh_admin_snapshot()
+    return _snapshot_to_dict(snapshot)
+
+
+def get_live_admin_stats():
+    stats = compute_admin_stats()
+    stats.update(as_of=datetime.utcnow().isoformat(), source='live')
+    return stats
+
+
+# generation -> Counter of buffered deltas, for this process
+_pending = defaultdict(Counter)
+_buffer_lock = threading.Lock()
+_generation = None  # last snapshot generation this process saw
+_last_flush = 0.0
+
+
+def bump_admin_snapshot(**deltas):
+    """
+    Buffer `deltas` to the snapshot counters; they are written by the next
+    flush (see flush_admin_deltas). Bulk writers call this once for the whole
+    batch instead of publishing per-row deltas.
+    """
+    global _generation
+    with _buffer_lock:
+        if _generation is None:
+            _generation = _snapshot_generation(lock=False) or 0
+        _pending[_generation].update(deltas)
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush_admin_deltas()
+
+
+def _apply_deltas(pending):
+    """Write half of flush_admin_deltas; runs inside run_write. Returns the current generation."""
+    generation = _snapshot_generation()
+    deltas = pending.get(generation)
+    if deltas:
+        values = {
+            getattr(AdminStatsSnapshot, name): getattr(AdminStatsSnapshot, name) + delta
+            for name, delta in deltas.items()
+        }
+        values[AdminStatsSnapshot.updated_at] = datetime.utcnow()
+        db.session.execute(
+            db.update(AdminStatsSnapshot)
+            .where(AdminStatsSnapshot.id == SNAPSHOT_ID, AdminStatsSnapshot.generation == generation)
+            .values(values)
+        )
+    # Deltas of earlier generations were counted by the rebuild that replaced them
+    return generation
+
+
+def flush_admin_deltas():
+    """Write this process's buffered deltas to the snapshot row in one transaction."""
+    global _generation, _last_flush
+    with _buffer_lock:
+        pending = {generation: deltas for generation, deltas in _pending.items() if deltas}
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        generation = run_write(_apply_deltas, pending)
+    except Exception as e:
+        print(f"Admin snapshot delta flush failed, will retry: {e}")
+        with _buffer_lock:
+            for gen, deltas in pending.items():
+                _pending[gen].update(deltas)
+        return
+    with _buffer_lock:
+        _generation = generation or 0
+
+
+@user_created.connect
+def _on_user_created(sender, **_):
+    bump_admin_snapshot(total_users=1)
+
+
+@user_updated.connect
+def _on_user_deleted(sender, deleted=False, **_):
+    if deleted:
+        bump_admin_snapshot(total_users=-1)
+
+
+@referral_created.connect
+def _on_referral_created(sender, **_):
+    bump_admin_snapshot(total_referrals=1)
+
+
+@referral_deleted.connect
+def _on_referral_deleted(sender, **_):
+    bump_admin_snapshot(total_referrals=-1)
+
+
+@winner_created.connect
+def _on_winner_created(sender, **_):
+    bump_admin_snapshot(total_winners=1)
+
+
+@winner_deleted.connect
+def _on_winner_deleted(sender, **_):
+    bump_admin_snapshot(total_winners=-1)
+
+
+@user_points_changed.connect
+def _on_points_changed(sender, earned_delta=None, **_):
+    if earned_delta:
+        bump_admin_snapshot(total_earned=earned_delta)
@@ -1,17 +1,28 @@
 from flask import Flask
 from extensions import db, migrate, cache
+import db_config
+import db_routing
+import periods
+import serializers
 from flask_cors import CORS
 from flask_apscheduler import APScheduler
 from referral.utils import handle_daily_winner, handle_weekly_winner
+from referral.leaderboard import leaderboard_engine
+from email_outbox import OutboxWorkerPool
 from datetime import datetime
 from extensions import cache
+from models import ReferralPeriodCount
+from sqlalchemy import inspect
 import os
 from auth.routes import auth_bp
 from referral.routes import referral_bp
 from base.routes import base_bp  # Import base routes
 from profile.routes import profile_bp
+from dashboard.routes import dashboard_bp
 from trivia.routes import trivia_bp
 from admin_pannel.routes import admin_bp
+from admin_pannel.utils import FLUSH_INTERVAL, REFRESH_INTERVAL, flush_admin_deltas, refresh_admin_snapshot
+from idempotency import prune_expired_keys
 from withdrawal.routes import user_withdrawals_bp
 
 
@@ -20,20 +31,35 @@ application = app
 CORS(app, resources={r"/*": {"origins": ["*"]}})
 
 # Load configurations
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['CACHE_TYPE'] = 'SimpleCache'
+# Shared across worker processes; set CACHE_TYPE=RedisCache and
+# CACHE_REDIS_URL to share across hosts instead.
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'cache_backends.SQLiteCache')
+app.config['CACHE_SQLITE_PATH'] = os.environ.get('CACHE_SQLITE_PATH', 'cache.db')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL')
+# Open /referral/leaderboard/stream connections allowed across all workers;
+# 0 disables it. Each stream holds a worker (see referral/stream.py)
+app.config['LEADERBOARD_STREAMS'] = int(os.environ.get('LEADERBOARD_STREAMS', 0))
+# Database URL (DATABASE_URL), pool sizes, SQLite pragmas and single-writer
+# mode (see db_config.py)
+db_config.configure(app)
 
 # Initialize extensions
 db.init_app(app)
+db_config.init_app(app)
+# Optional read replica for @read_only views (see db_routing.py)
+db_routing.init_app(app, os.environ.get('DATABASE_REPLICA_URL'))
 migrate.init_app(app, db)
 cache.init_app(app)
+# orjson-backed jsonify/get_json when orjson is installed (see serializers.py)
+serializers.init_app(app)
 
 # Register blueprints
 app.register_blueprint(base_bp)  # Base routes
 app.register_blueprint(auth_bp, url_prefix='/auth')  # Auth routes
 app.register_blueprint(referral_bp, url_prefix='/referral')  # Referral routes
 app.register_blueprint(profile_bp, url_prefix='/profile') # Profile routes
+app.register_blueprint(dashboard_bp, url_prefix='/me')  # Dashboard (BFF) routes
 app.register_blueprint(trivia_bp, url_prefix='/trivia')  # Trivia routes
 app.register_blueprint(admin_bp, url_prefix='/admin') # Admin routes
 app.register_blueprint(user_withdrawals_bp, url_prefix='/withdrawal')  # Withdrawal routes
@@ -58,7 +84,48 @@ def home():
     return html_content
 
 with app.app_context():
-    db.create_all()
+    if db.engine.dialect.name == 'sqlite':
+        db.create_all()
+    # Server databases are built by the migrations (see migrations/README); skip
+    # the warm-up while `flask db upgrade` loads the app against an empty one
+    if inspect(db.engine).has_table(ReferralPeriodCount.__tablename__):
+        leaderboard_engine.rebuild()  # Warm the in-memory leaderboards
+
+# Background delivery of queued emails (0 disables, e.g. for one-off scripts)
+outbox_workers = OutboxWorkerPool(app, workers=int(os.environ.get('EMAIL_OUTBOX_WORKERS', 2)))
+if outbox_workers.workers:
+    outbox_workers.start()
+
+
+def prune_cache():
+    """Drop expired entries from the shared cache backend, if it supports it."""
+    backend = cache.cache
+    if hasattr(backend, 'prune'):
+        backend.prune()
+
+
+def verify_leaderboards():
+    """Check the in-memory leaderboards against the DB and repair drift."""
+    with app.app_context():
+        leaderboard_engine.verify()
+
+
+def refresh_admin_stats():
+    """Rebuild the admin dashboard snapshot, including its top-5 lists."""
+    with app.app_context():
+        refresh_admin_snapshot()
+
+
+def flush_admin_stats():
+    """Write this process's buffered admin snapshot deltas."""
+    with app.app_context():
+        flush_admin_deltas()
+
+
+def prune_idempotency_keys():
+    """Delete stored Idempotency-Key responses that have expired."""
+    with app.app_context():
+        prune_expired_keys()
 
 
 scheduler = APScheduler()
@@ -77,7 +144,7 @@ if __name__ == "__main__":
         trigger='cron',
         hour=23,
         minute=55,
-        timezone='US/Eastern'
+        timezone=periods.EASTERN  # the same day/week boundaries as the leaderboards
     )
 
     # Add weekly leaderboard refresh job
@@ -88,7 +155,48 @@ if __name__ == "__main__":
         day_of_week='sat',
         hour=23,
         minute=55,
-        timezone='US/Eastern'
+        timezone=periods.EASTERN  # the same day/week boundaries as the leaderboards
+    )
+
+    # Periodic consistency check of the in-memory leaderboards
+    scheduler.add_job(
+        id='leaderboard_consistency',
+        func=verify_leaderboards,
+        trigger='interval',
+        minutes=10
+    )
+
+    # Expired shared-cache rows are only dropped when overwritten otherwise
+    scheduler.add_job(
+        id='cache_prune',
+        func=prune_cache,
+        trigger='interval',
+        hours=1
+    )
+
+    # Admin dashboard snapshot; event deltas keep the counts current in between.
+    # Without the scheduler, the first read of an old snapshot rebuilds it.
+    scheduler.add_job(
+        id='admin_stats_refresh',
+        func=refresh_admin_stats,
+        trigger='interval',
+        seconds=REFRESH_INTERVAL
+    )
+
+    # Buffered deltas are otherwise written by the next event or snapshot read
+    scheduler.add_job(
+        id='admin_stats_flush',
+        func=flush_admin_stats,
+        trigger='interval',
+        seconds=FLUSH_INTERVAL
+    )
+
+    # Expired Idempotency-Key responses
+    scheduler.add_job(
+        id='idempotency_prune',
+        func=prune_idempotency_keys,
+        trigger='interval',
+        hours=1
     )
 
     scheduler.start()
@@ -5,8 +5,11 @@ from models import User
 from referral.routes import process_referral
 from referral.utils import generate_referral_code
 from auth.utils import generate_token
-from email_sender import send_email  # Ensure these functions are defined
-from password_email import send_password_reset_email
+from email_outbox import enqueue_email, notify as notify_outbox
+from db_config import run_write
+from db_routing import note_write
+from events import publish, user_created
+from idempotency import idempotent
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -16,12 +19,14 @@ def handle_preflight():
     response.headers.add("Access-Control-Allow-Origin", "*")
     response.headers.add(
         "Access-Control-Allow-Headers",
-        "Content-Type, Authorization, X-Requested-With, Access-Control-Allow-Origin, Access-Control-Allow-Methods"
+        "Content-Type, Authorization, X-Requested-With, Access-Control-Allow-Origin, Access-Control-Allow-Methods, "
+        "Idempotency-Key"
     )
     response.headers.add("Access-Control-Allow-Methods", "GET, POST, OPTIONS, PUT, DELETE")
     return response
 
 @auth_bp.route('/signup', methods=['OPTIONS', 'POST'])
+@idempotent
 def signup():
     """Signup route with referral processing."""
     if request.method == 'OPTIONS':
@@ -59,18 +64,10 @@ def signup():
             if referral_status != 200:
                 return referral_response, referral_status
 
-        user = User(
-            name=name,
-            email=email,
-            password=hashed_password,
-            referral_code=new_referral_code,
-            pass_token=password_token
-        )
-        db.session.add(user)
-        db.session.commit()
-
-        send_email(email, name, new_referral_code)
-        send_password_reset_email(email, name, password_token)
+        user_id = run_write(create_user, name, email, hashed_password, new_referral_code, password_token)
+        notify_outbox()
+        note_write(user_id)  # the first profile load must not hit a lagging replica
+        publish(user_created, user_id=user_id)
 
         return jsonify({
             'message': 'Signup successful!',
@@ -81,6 +78,28 @@ def signup():
         return jsonify({'error': str(e)}), 500
 
 
+def create_user(name, email, hashed_password, referral_code, password_token):
+    """Write half of signup; runs inside run_write. Returns the new user id."""
+    user = User(
+        name=name,
+        email=email,
+        password=hashed_password,
+        referral_code=referral_code,
+        pass_token=password_token
+    )
+    db.session.add(user)
+
+    # Queued in the same transaction; the outbox workers do the SMTP work
+    enqueue_email('welcome', email, {'name': name, 'referral_code': referral_code})
+    enqueue_email(
+        'password_reset', email,
+        {'name': name, 'password_token': password_token},
+        dedupe_key=f"password_reset:{password_token}"
+    )
+    db.session.flush()
+    return user.id
+
+
 @auth_bp.route('/set-password', methods=['OPTIONS', 'POST'])
 def setPassword():
     """Sets a new password for a user."""
@@ -126,12 +145,13 @@ def reset_password():
     if user:
         reset_token = generate_token()
         user.pass_token = reset_token
+        enqueue_email(
+            'password_reset', user.email,
+            {'name': user.name, 'password_token': reset_token},
+            dedupe_key=f"password_reset:{reset_token}"
+        )
         db.session.commit()
-
-        try:
-            send_password_reset_email(user.email, user.name, reset_token)
-        except Exception as e:
-            return jsonify({"error": "Failed to send email"}), 500
+        notify_outbox()
 
     return jsonify({"message": "If this email is attached to an account, you will receive a password reset email shortly."}), 200
 
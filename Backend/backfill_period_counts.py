@@ -0,0 +1,137 @@
+"""
+Rebuild the referral_period_counts rollup from the raw referrals table.
+
+Referrals up to the id snapshot taken at the start are read in primary-key
+batches and their daily/weekly counts accumulated in memory, so the whole
+table is never loaded at once. The live rollup is never emptied: leaderboards,
+winner selection and profile ranks keep reading it while the backfill runs.
+
+Each batch of absolute counts is written in its own write transaction that
+holds off live increments. That transaction recounts the referrals inserted
+since the snapshot (live signups are already in the rollup) and sets each row
+to the snapshot count plus that tail. A row is therefore correct the moment
+it is written, and no concurrent referral is lost or counted twice. Finally,
+rows with no referrals behind them are deleted.
+
+Usage (from the Backend directory):
+    python backfill_period_counts.py [--batch-size 50000]
+"""
+
+import argparse
+import os
+from collections import Counter
+
+from db_config import run_write, upsert_insert
+from extensions import db
+from models import Referral, ReferralPeriodCount
+from periods import PERIOD_TYPES, start_of
+
+KEY_COLUMNS = ('period_type', 'period_start', 'referrer_id')
+
+
+def _add_periods(totals, rows):
+    for referrer_id, created_at in rows:
+        # start_of memoizes per UTC hour, so this is mostly cache hits
+        for period_type in PERIOD_TYPES:
+            totals[(period_type, start_of(period_type, created_at), referrer_id)] += 1
+
+
+def count_referrals(max_id, batch_size=50000):
+    """{(period_type, period_start, referrer_id): count} for referrals with id <= max_id."""
+    totals = Counter()
+    last_id = 0
+    processed = 0
+    while last_id < max_id:
+        rows = (
+            db.session.query(Referral.id, Referral.referrer_id, Referral.created_at)
+            .filter(Referral.id > last_id, Referral.id <= max_id)
+            .order_by(Referral.id)
+            .limit(batch_size)
+            .all()
+        )
+        db.session.rollback()  # don't hold a read snapshot across batches
+        if not rows:
+            break
+        _add_periods(totals, ((referrer_id, created_at) for _, referrer_id, created_at in rows))
+        last_id = rows[-1][0]
+        processed += len(rows)
+        print(f"Read {processed} referrals (up to id {last_id})")
+    return totals
+
+
+def _lock_rollup():
+    """
+    Hold off live rollup increments until the transaction ends. On SQLite,
+    run_write's BEGIN IMMEDIATE already does; readers are never blocked.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(db.text('LOCK TABLE referral_period_counts IN SHARE ROW EXCLUSIVE MODE'))
+
+
+def _tail_counts(max_id):
+    """Counts of the referrals inserted since the snapshot (already in the rollup)."""
+    tail = Counter()
+    _add_periods(tail, db.session.query(Referral.referrer_id, Referral.created_at).filter(Referral.id > max_id))
+    return tail
+
+
+def _write_counts(keys, totals, max_id):
+    """Set each key's row to its absolute count; runs inside run_write."""
+    _lock_rollup()
+    tail = _tail_counts(max_id)
+    insert = upsert_insert()
+    stmt = insert(ReferralPeriodCount)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['period_type', 'period_start', 'referrer_id'],
+            set_={'count': stmt.excluded.count}
+        ),
+        [dict(zip(KEY_COLUMNS, key), count=totals[key] + tail[key]) for key in keys]
+    )
+
+
+def _delete_stale(totals, max_id):
+    """Delete rows no referral counts towards; runs inside run_write. Returns how many."""
+    _lock_rollup()
+    tail = _tail_counts(max_id)
+    table = ReferralPeriodCount.__table__
+    columns = [table.c[name] for name in KEY_COLUMNS]
+    stale = [
+        dict(zip(KEY_COLUMNS, key))
+        for key in map(tuple, db.session.execute(db.select(*columns)))
+        if key not in totals and key not in tail
+    ]
+    if stale:
+        db.session.execute(
+            table.delete().where(*(column == db.bindparam(column.key) for column in columns)),
+            stale
+        )
+    return len(stale)
+
+
+def write_counts(totals, max_id, batch_size=50000):
+    """Replace the rollup with `totals` (plus live referrals above max_id), batch by batch."""
+    keys = list(totals)
+    for offset in range(0, len(keys), batch_size):
+        run_write(_write_counts, keys[offset:offset + batch_size], totals, max_id)
+        print(f"Wrote {min(offset + batch_size, len(keys))}/{len(keys)} rollup rows")
+    deleted = run_write(_delete_stale, totals, max_id)
+    print(f"Deleted {deleted} stale rollup rows")
+
+
+def backfill(batch_size=50000):
+    max_id = db.session.query(db.func.max(Referral.id)).scalar() or 0
+    db.session.rollback()
+    write_counts(count_referrals(max_id, batch_size), max_id, batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    # One-off script: don't start the outbox workers when importing the app
+    os.environ.setdefault('EMAIL_OUTBOX_WORKERS', '0')
+    from app import app
+    with app.app_context():
+        backfill(args.batch_size)
@@ -0,0 +1,32 @@
+"""
+Benchmark: admin dashboard aggregates, computed live from the tables vs read
+from the admin_stats_snapshot row.
+
+    python -m benchmarks.admin_stats [n_referrers]
+"""
+
+import sys
+
+from admin_pannel.utils import compute_admin_stats, get_admin_snapshot, refresh_admin_snapshot
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from extensions import db
+
+
+def main(n_referrers=100000):
+    app = create_bench_app()
+    with app.app_context():
+        print(f"Seeding {n_referrers} referrers...")
+        seed_referrers(n_referrers)
+
+        _, refresh_ms, _ = timed(refresh_admin_snapshot, repeat=1)
+        live, live_median, live_p95 = timed(compute_admin_stats, repeat=5)
+        db.session.expunge_all()
+        snapshot, snap_median, snap_p95 = timed(get_admin_snapshot)
+
+        print(f"full refresh:  {refresh_ms:.1f}ms")
+        print(f"live:          users={live['total_users']}  median={live_median:.1f}ms  p95={live_p95:.1f}ms")
+        print(f"snapshot:      users={snapshot['total_users']}  median={snap_median:.2f}ms  p95={snap_p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,57 @@
+"""
+Benchmark: clearing a queue of pending withdrawals one request per
+withdrawal (the per-id accept/reject endpoints) vs one bulk request.
+
+    python -m benchmarks.bulk_withdrawals [n_withdrawals]
+"""
+
+import sys
+import time
+
+from admin_pannel.routes import admin_bp
+from benchmarks.common import create_bench_app, seed_referrers
+from extensions import db, cache
+from models import Admin, Withdrawal
+
+N_USERS = 2000
+
+
+def seed_withdrawals(n):
+    db.session.execute(db.delete(Withdrawal))
+    db.session.execute(db.insert(Withdrawal), [
+        {'user_id': 1 + i % N_USERS, 'amount': 1.0, 'user_payment_info': '{}', 'status': 'pending'}
+        for i in range(n)
+    ])
+    db.session.commit()
+    return list(db.session.execute(db.select(Withdrawal.id).order_by(Withdrawal.id)).scalars())
+
+
+def main(n_withdrawals=10000):
+    app = create_bench_app()
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    cache.init_app(app)
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    client = app.test_client()
+    with app.app_context():
+        seed_referrers(N_USERS)
+        db.session.add(Admin(username='admin', email='admin@example.com', password='x'))
+        db.session.commit()
+
+        for action in ('accept', 'reject'):
+            ids = seed_withdrawals(n_withdrawals)
+            start = time.perf_counter()
+            for withdrawal_id in ids:
+                client.put(f'/admin/withdrawals/{withdrawal_id}/{action}?admin_id=1')
+            per_id = time.perf_counter() - start
+
+            ids = seed_withdrawals(n_withdrawals)
+            start = time.perf_counter()
+            body = client.put(f'/admin/withdrawals/bulk/{action}?admin_id=1', json={'ids': ids}).get_json()
+            bulk = time.perf_counter() - start
+
+            print(f"{action:>6} {n_withdrawals}: one request each {per_id:.2f}s   "
+                  f"bulk {bulk * 1000:.0f}ms ({body['updated']} updated)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
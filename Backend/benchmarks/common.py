@@ -0,0 +1,87 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Each benchmark builds its own throwaway Flask app on a temporary SQLite file
+so it never touches database.db. Run them from the Backend directory, e.g.:
+
+    python -m benchmarks.profile_rank
+"""
+
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from extensions import db
+from models import User, Referral
+
+
+def create_bench_app(database_uri=None):
+    """Create a minimal app bound to a fresh database (temp file by default)."""
+    if database_uri is None:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+        os.close(fd)
+        database_uri = f'sqlite:///{path}'
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_referrers(n_referrers, referrals_per_user=3, since=None, batch_size=10000):
+    """
+    Bulk-insert `n_referrers` users, each with 1..`referrals_per_user`
+    referrals created after `since` (defaults to one hour ago).
+    Must be called inside an app context.
+    """
+    since = since or datetime.utcnow() - timedelta(hours=1)
+    user_rows, referral_rows = [], []
+    for i in range(1, n_referrers + 1):
+        count = 1 + i % referrals_per_user
+        user_rows.append({
+            'id': i,
+            'name': f'user{i}',
+            'email': f'user{i}@example.com',
+            'password': 'x',
+            'referral_code': f'R{i:08d}',
+            'referrals_count': count,
+            'created_at': since,
+        })
+        for j in range(count):
+            referral_rows.append({
+                'referrer_id': i,
+                'referred_email': f'ref{i}_{j}@example.com',
+                'created_at': since + timedelta(seconds=j),
+            })
+        if len(user_rows) >= batch_size:
+            _flush(user_rows, referral_rows)
+    _flush(user_rows, referral_rows)
+    db.session.commit()
+
+
+def _flush(user_rows, referral_rows):
+    if user_rows:
+        db.session.execute(db.insert(User), user_rows)
+        user_rows.clear()
+    if referral_rows:
+        db.session.execute(db.insert(Referral), referral_rows)
+        referral_rows.clear()
+
+
+def timed(fn, repeat=20):
+    """Run `fn` `repeat` times; return (last result, median ms, p95 ms)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return result, statistics.median(samples), p95
@@ -0,0 +1,125 @@
+"""
+Benchmark: concurrent referral processing (the write half of a referred
+signup) from several worker processes, as under Passenger, against one SQLite
+file, with
+
+  - default:       stock pysqlite settings (rollback journal, deferred BEGIN),
+  - tuned:         db_config pragmas (WAL, synchronous=NORMAL, busy_timeout)
+                   and BEGIN IMMEDIATE writes,
+  - single-writer: tuned, plus one group-committing writer thread per process.
+
+    python -m benchmarks.concurrent_writes [processes] [threads] [referrals_per_thread]
+
+Every request refers one of a handful of referrers, so all writers contend for
+the same rows. Failed requests are usually "database is locked". Signup itself
+is dominated by password hashing, so it is left out to measure the database.
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Flask
+
+import db_config
+from extensions import db, cache
+from models import User, Referral
+
+N_REFERRERS = 5
+MODES = ('default', 'tuned', 'single-writer')
+
+
+def build_app(path, mode):
+    from referral.routes import referral_bp
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    if mode != 'default':
+        app.config['DB_SINGLE_WRITER'] = mode == 'single-writer'
+        db_config.configure(app)
+    db.init_app(app)
+    if mode != 'default':
+        db_config.init_app(app)
+    cache.init_app(app)
+    app.register_blueprint(referral_bp)
+    return app
+
+
+def worker_process(path, mode, process_index, threads, per_thread, results):
+    app = build_app(path, mode)
+    statuses = []
+    lock = threading.Lock()
+
+    def worker(thread_index):
+        client = app.test_client()
+        for n in range(per_thread):
+            email = f'p{process_index}t{thread_index}n{n}@example.com'
+            response = client.post('/process_referral', json={
+                'email': email, 'referrer_code': f'REF{n % N_REFERRERS:05d}'
+            })
+            with lock:
+                statuses.append(response.status_code)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((sum(s == 200 for s in statuses), sum(s != 200 for s in statuses)))
+
+
+def run(mode, processes, threads, per_thread):
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+    os.close(fd)
+    app = build_app(path, mode)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(User), [
+            {'name': f'ref{i}', 'email': f'ref{i}@example.com', 'password': 'x',
+             'referral_code': f'REF{i:05d}'}
+            for i in range(N_REFERRERS)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(
+            target=worker_process, args=(path, mode, i, threads, per_thread, results)
+        )
+        for i in range(processes)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    totals = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    ok = sum(t[0] for t in totals)
+    failed = sum(t[1] for t in totals)
+    with app.app_context():
+        referrals = db.session.scalar(db.select(db.func.count(Referral.id)))
+        counted = db.session.scalar(db.select(db.func.sum(User.referrals_count)))
+        db.engine.dispose()
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    print(f"{mode:>13}: {ok:5d} ok {failed:5d} failed in {elapsed:6.2f}s "
+          f"({ok / elapsed:7.1f} referrals/s); referrals={referrals} counted={counted}")
+
+
+def main(processes=4, threads=8, per_thread=25):
+    print(f"{processes} processes x {threads} threads x {per_thread} referrals")
+    for mode in MODES:
+        run(mode, processes, threads, per_thread)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:4]))
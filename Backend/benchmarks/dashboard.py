@@ -0,0 +1,57 @@
+"""
+Benchmark: loading the dashboard with the four separate calls the frontend
+made (profile plus three leaderboards) vs one GET /me/dashboard. Reports
+server time and SQL statements per page load, warm caches.
+
+    python -m benchmarks.dashboard [n_referrers]
+"""
+
+import sys
+
+from backfill_period_counts import backfill
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from dashboard.routes import dashboard_bp
+from extensions import db, cache
+from profile.routes import profile_bp
+from referral.leaderboard import leaderboard_engine
+from referral.routes import referral_bp
+
+
+def main(n_referrers=2000):
+    app = create_bench_app()
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    cache.init_app(app)
+    app.register_blueprint(referral_bp, url_prefix='/referral')
+    app.register_blueprint(profile_bp, url_prefix='/profile')
+    app.register_blueprint(dashboard_bp, url_prefix='/me')
+    client = app.test_client()
+    with app.app_context():
+        seed_referrers(n_referrers)
+        backfill()
+        leaderboard_engine.rebuild()
+        db.session.remove()
+
+    def four_calls():
+        client.post('/profile/profile', json={'userID': 42})
+        client.get('/referral/leaderboard/daily')
+        client.get('/referral/leaderboard/weekly')
+        client.get('/referral/leaderboard')
+
+    def one_call():
+        client.get('/me/dashboard?user_id=42')
+
+    statements = []
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+    for label, load in (('4 separate calls', four_calls), ('/me/dashboard', one_call)):
+        load()
+        statements.clear()
+        _, median, p95 = timed(load, repeat=50)
+        print(f"{label:>16}: median={median:.2f}ms  p95={p95:.2f}ms  "
+              f"{len(statements) / 50:.0f} statements per load")
+    _, median, _ = timed(lambda: client.get('/me/dashboard?user_id=42&fields=profile,trivia'), repeat=50)
+    print(f"{'profile,trivia':>16}: median={median:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
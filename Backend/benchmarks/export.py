@@ -0,0 +1,71 @@
+"""
+Benchmark: /admin/export/users streamed at scale - time to first byte, total
+time and peak Python memory (tracemalloc), with and without gzip, next to
+loading the same rows into one list as the paginated endpoints do per page.
+
+    python -m benchmarks.export [n_referrers]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from admin_pannel.routes import admin_bp
+from admin_pannel.utils import USER_FIELDS, serialize
+from benchmarks.common import create_bench_app, seed_referrers
+from extensions import cache
+from models import User
+
+
+def measure(fn):
+    """Time one run, then repeat it under tracemalloc (which slows it down) for the peak."""
+    start = time.perf_counter()
+    first_byte, size = fn(start)
+    total = time.perf_counter() - start
+    tracemalloc.start()
+    fn(time.perf_counter())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, size, peak
+
+
+def stream(client, **headers):
+    def run(start):
+        response = client.get('/admin/export/users', headers=headers, buffered=False)
+        first_byte, size = None, 0
+        for chunk in response.response:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        response.close()
+        return first_byte, size
+    return run
+
+
+def load_all(start):
+    rows = [serialize(user, USER_FIELDS) for user in User.query.all()]
+    return time.perf_counter() - start, sum(len(str(row)) for row in rows)
+
+
+def main(n_referrers=1000000):
+    app = create_bench_app()
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    cache.init_app(app)
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    client = app.test_client()
+    with app.app_context():
+        print(f"Seeding {n_referrers} referrers...")
+        seed_referrers(n_referrers, referrals_per_user=1)
+
+        for label, fn in (
+            ('ndjson', stream(client)),
+            ('ndjson+gzip', stream(client, **{'Accept-Encoding': 'gzip'})),
+            ('list in memory', load_all),
+        ):
+            first_byte, total, size, peak = measure(fn)
+            print(f"{label:>15}: first byte {first_byte * 1000:.1f}ms  total {total:.1f}s  "
+                  f"{size / 2**20:.1f}MiB  peak python memory {peak / 2**20:.1f}MiB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,59 @@
+"""
+Benchmark: a frontend polling /referral/leaderboard/weekly. Before: the cached
+Python list re-encoded with jsonify on every poll. After: the cached
+pre-encoded bytes, gzipped, and a bodiless 304 once the client has the ETag.
+
+    python -m benchmarks.leaderboard_http [n_referrers]
+"""
+
+import sys
+
+from flask import jsonify
+
+from backfill_period_counts import backfill
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from caching import get_or_compute
+from extensions import db, cache
+from referral.leaderboard import leaderboard_engine
+from referral.routes import LEADERBOARD_STALE_TTL, LEADERBOARD_TTL, referral_bp
+
+PATH = '/referral/leaderboard/weekly'
+
+
+def main(n_referrers=2000):
+    app = create_bench_app()
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    cache.init_app(app)
+    app.register_blueprint(referral_bp, url_prefix='/referral')
+
+    @app.route('/old/weekly')
+    def old_weekly():
+        leaderboard = get_or_compute(
+            'bench:old:weekly', lambda: leaderboard_engine.leaderboard('weekly'),
+            ttl=LEADERBOARD_TTL, stale_ttl=LEADERBOARD_STALE_TTL
+        )
+        return jsonify(leaderboard)
+
+    client = app.test_client()
+    with app.app_context():
+        seed_referrers(n_referrers)
+        backfill()
+        leaderboard_engine.rebuild()
+        db.session.remove()
+
+    old, old_ms, old_p95 = timed(lambda: client.get('/old/weekly'), repeat=200)
+    new, new_ms, new_p95 = timed(lambda: client.get(PATH, headers={'Accept-Encoding': 'gzip'}), repeat=200)
+    etag = new.headers['ETag']
+    hit, hit_ms, hit_p95 = timed(
+        lambda: client.get(PATH, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}), repeat=200
+    )
+    assert hit.status_code == 304
+
+    print(f"weekly board, {n_referrers} entries, per poll:")
+    print(f"  jsonify each time:  median={old_ms:.2f}ms  p95={old_p95:.2f}ms  {len(old.data):,} bytes")
+    print(f"  pre-encoded + gzip: median={new_ms:.2f}ms  p95={new_p95:.2f}ms  {len(new.data):,} bytes")
+    print(f"  304 Not Modified:   median={hit_ms:.2f}ms  p95={hit_p95:.2f}ms  {len(hit.data):,} bytes")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
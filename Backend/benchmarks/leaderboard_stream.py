@@ -0,0 +1,64 @@
+"""
+Benchmark: keeping N open pages current. Before: each page polls
+/referral/leaderboard/daily (N requests per poll interval, even when nothing
+changed). After: one hub refresh per change, fanned out to N stream
+subscribers as the same encoded diff.
+
+    python -m benchmarks.leaderboard_stream [n_clients]
+"""
+
+import sys
+
+from backfill_period_counts import backfill
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from extensions import db, cache
+from referral.leaderboard import leaderboard_engine
+from referral.routes import leaderboard_hub, referral_bp
+from referral import stream
+from referral.utils import record_period_referral
+
+
+def main(n_clients=500):
+    app = create_bench_app()
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    cache.init_app(app)
+    app.register_blueprint(referral_bp, url_prefix='/referral')
+    stream.COALESCE_SECONDS = 3600  # refreshes are driven by hand below
+    client = app.test_client()
+    with app.app_context():
+        seed_referrers(2000)
+        backfill()
+        leaderboard_engine.rebuild()
+        db.session.remove()
+
+    def poll_round():
+        for _ in range(n_clients):
+            client.get('/referral/leaderboard/daily', headers={'Accept-Encoding': 'gzip'})
+
+    _, poll_ms, poll_p95 = timed(poll_round, repeat=5)
+
+    with app.test_request_context():
+        subscribers = [leaderboard_hub.subscribe(['daily'])[0] for _ in range(n_clients)]
+
+    user_ids = iter(range(1, 2001))
+
+    def change_and_refresh():
+        with app.app_context():
+            user_id = next(user_ids)
+            record_period_referral(user_id, delta=50)
+            db.session.commit()
+            leaderboard_engine.rebuild()
+            leaderboard_hub.refresh()
+        for subscriber in subscribers:
+            subscriber.queue.get_nowait()
+
+    _, push_ms, push_p95 = timed(change_and_refresh, repeat=20)
+
+    print(f"{n_clients} clients, daily board (top {stream.STREAM_TOP} live):")
+    print(f"  one polling round (pre-encoded, gzip): median={poll_ms:.1f}ms  p95={poll_p95:.1f}ms")
+    print(f"  one change pushed to every stream:     median={push_ms:.1f}ms  p95={push_p95:.1f}ms"
+          "  (incl. a full engine rebuild)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,85 @@
+"""
+Benchmark: daily/weekly leaderboard reads, raw GROUP BY over `referrals` vs
+the referral_period_counts rollup.
+
+    python -m benchmarks.period_counts [n_referrals] [n_referrers]
+
+Defaults to 10M referrals spread over 50k referrers and the past 7 days.
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from backfill_period_counts import backfill
+from benchmarks.common import create_bench_app, timed
+from extensions import db
+from models import User, Referral
+from periods import current
+from referral.utils import get_period_ranking
+
+
+def raw_ranking(start):
+    """The pre-rollup read path used by the leaderboards and winner jobs."""
+    return (
+        db.session.query(User, db.func.count(Referral.id).label('referrals_count'))
+        .join(Referral, User.id == Referral.referrer_id)
+        .filter(Referral.created_at >= start)
+        .group_by(User.id)
+        .order_by(db.desc('referrals_count'))
+        .all()
+    )
+
+
+def seed(n_referrals, n_referrers, batch_size=100000):
+    now = datetime.utcnow()
+    db.session.execute(db.insert(User), [
+        {
+            'id': i,
+            'name': f'user{i}',
+            'email': f'user{i}@example.com',
+            'password': 'x',
+            'referral_code': f'R{i:08d}',
+        }
+        for i in range(1, n_referrers + 1)
+    ])
+    rng = random.Random(42)
+    for offset in range(0, n_referrals, batch_size):
+        db.session.execute(db.insert(Referral), [
+            {
+                'referrer_id': rng.randint(1, n_referrers),
+                'referred_email': f'r{offset + j}@example.com',
+                'created_at': now - timedelta(seconds=rng.randint(0, 7 * 86400)),
+            }
+            for j in range(min(batch_size, n_referrals - offset))
+        ])
+        db.session.commit()
+    db.session.commit()
+
+
+def main(n_referrals=10_000_000, n_referrers=50_000):
+    app = create_bench_app()
+    with app.app_context():
+        print(f"Seeding {n_referrals} referrals over {n_referrers} referrers...")
+        seed(n_referrals, n_referrers)
+
+        start = time.perf_counter()
+        backfill(batch_size=200000)
+        print(f"Backfill took {time.perf_counter() - start:.1f}s")
+
+        for label, raw_start, period in (
+            ('daily', current('daily').start_utc, 'daily'),
+            ('weekly', current('weekly').start_utc, 'weekly'),
+        ):
+            db.session.expunge_all()
+            _, raw_median, raw_p95 = timed(lambda: raw_ranking(raw_start), repeat=3)
+            db.session.expunge_all()
+            _, new_median, new_p95 = timed(lambda: get_period_ranking(period), repeat=10)
+            print(f"{label:7} raw GROUP BY: median={raw_median:.1f}ms p95={raw_p95:.1f}ms | "
+                  f"rollup: median={new_median:.1f}ms p95={new_p95:.1f}ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,97 @@
+"""
+Benchmark: everything /profile/profile shows, three ways:
+  - the original implementation: the user fetch, daily and weekly counts, the
+    total-rank count and two ranked GROUP BYs walked in Python,
+  - the user fetch plus the single-query rank service,
+  - profile.utils.get_profile_figures: one CTE statement,
+plus a memoized read through get_cached_profile_figures. Reports SQL
+statements and latency per profile.
+
+    python -m benchmarks.profile_rank [n_referrers]
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from backfill_period_counts import backfill
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from extensions import db, cache
+from models import User, Referral
+from periods import start_of
+from profile.utils import get_cached_profile_figures, get_profile_figures, _period_score, _rank_above
+
+
+def scan_rank(user_id, start):
+    """The original profile implementation: walk the ranked list in Python."""
+    query = (
+        db.session.query(User, db.func.count(Referral.id).label('referrals_count'))
+        .join(Referral, User.id == Referral.referrer_id)
+        .filter(Referral.created_at >= start)
+        .group_by(User.id)
+        .order_by(db.desc('referrals_count'))
+    )
+    return next(
+        (index + 1 for index, (u, count) in enumerate(query) if u.id == user_id),
+        None
+    )
+
+
+def original_profile(user_id, start):
+    user = db.session.get(User, user_id)
+    daily = Referral.query.filter(Referral.referrer_id == user_id, Referral.created_at >= start).count()
+    weekly = Referral.query.filter(Referral.referrer_id == user_id, Referral.created_at >= start).count()
+    total_rank = User.query.filter(User.referrals_count > user.referrals_count).count() + 1
+    return user.name, daily, weekly, total_rank, scan_rank(user_id, start), scan_rank(user_id, start)
+
+
+def two_statement_profile(user_id, start_of_day, start_of_week):
+    """The user fetch, then all counts and ranks in one query (the rank service before the CTE)."""
+    user = db.session.get(User, user_id)
+    daily_score = _period_score(user_id, 'daily', start_of_day)
+    weekly_score = _period_score(user_id, 'weekly', start_of_week)
+    total_above = (
+        db.select(db.func.count(User.id))
+        .where(User.referrals_count > db.select(User.referrals_count).where(User.id == user_id).scalar_subquery())
+        .scalar_subquery()
+    )
+    row = db.session.execute(db.select(
+        daily_score, weekly_score,
+        _rank_above('daily', start_of_day, daily_score),
+        _rank_above('weekly', start_of_week, weekly_score),
+        total_above,
+    )).one()
+    return user.name, tuple(row)
+
+
+def main(n_referrers=100000):
+    app = create_bench_app()
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    cache.init_app(app)
+    with app.app_context():
+        print(f"Seeding {n_referrers} referrers...")
+        seed_referrers(n_referrers)
+        backfill()
+        start = datetime.utcnow() - timedelta(days=1)
+        sod, sow = start_of('daily'), start_of('weekly')
+
+        # The lowest-ranked users sit at the end of the scan
+        target = db.session.query(User.id).order_by(User.referrals_count.asc()).first()[0]
+
+        statements = []
+        db.event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+        cases = (
+            ('original (6 queries)', lambda: original_profile(target, start), 5),
+            ('user + rank query', lambda: two_statement_profile(target, sod, sow), 50),
+            ('one CTE statement', lambda: get_profile_figures(target, sod, sow), 50),
+            ('memoized', lambda: get_cached_profile_figures(target), 200),
+        )
+        for label, fn, repeat in cases:
+            db.session.expunge_all()
+            statements.clear()
+            _, median, p95 = timed(fn, repeat=repeat)
+            print(f"{label:>21}: {len(statements) / repeat:.2f} statements  "
+                  f"median={median:.2f}ms  p95={p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,43 @@
+"""
+Benchmark: admin user search (one page plus the total, as /admin/users
+returns), ILIKE '%term%' scan vs the FTS5 trigram index in search.py.
+
+    python -m benchmarks.search [n_referrers]
+"""
+
+import sys
+
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from extensions import db
+from models import User
+from search import search_users
+
+TERMS = ('r424242', 'user99999', '77777@exa', 'USER1234567')
+
+
+def ilike_page(term):
+    query = User.query.filter(db.or_(User.name.ilike(f'%{term}%'), User.email.ilike(f'%{term}%')))
+    return query.count(), [u.id for u in query.limit(10)]
+
+
+def search_page(term):
+    query = search_users(User.query, term)
+    return query.count(), [u.id for u in query.limit(10)]
+
+
+def main(n_referrers=1000000):
+    app = create_bench_app()
+    with app.app_context():
+        print(f"Seeding {n_referrers} referrers (the triggers index them as they go)...")
+        seed_referrers(n_referrers, referrals_per_user=1)
+
+        for term in TERMS:
+            (old_total, _), old_median, old_p95 = timed(lambda: ilike_page(term), repeat=5)
+            db.session.expunge_all()
+            (new_total, _), new_median, new_p95 = timed(lambda: search_page(term))
+            print(f"{term!r:>15}  ilike: {old_total} hits  median={old_median:.1f}ms  p95={old_p95:.1f}ms"
+                  f"   fts: {new_total} hits  median={new_median:.2f}ms  p95={new_p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
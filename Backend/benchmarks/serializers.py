@@ -0,0 +1,67 @@
+"""
+Benchmark: serializing a 10k-row page of users to a JSON response body.
+Before: ORM entities turned into hand-written dicts and encoded with Flask's
+default (stdlib json) provider. After: a column select through the compiled
+`serializers.users.dump_tuple` and the orjson provider. Query time is shown
+separately from the dict building and encoding.
+
+    python -m benchmarks.serializers [n_rows]
+"""
+
+import sys
+
+from flask.json.provider import DefaultJSONProvider
+
+import serializers
+from benchmarks.common import create_bench_app, seed_referrers, timed
+from extensions import db
+from models import User
+
+
+def hand_written(user):
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "referral_code": user.referral_code,
+        "referrals_count": user.referrals_count,
+        "profile_picture": user.profile_picture,
+        "created_at": user.created_at.isoformat(),
+        "total_earned": user.total_earned,
+        "total_points": user.total_points,
+        "last_trivia_attempt": user.last_trivia_attempt.isoformat() if user.last_trivia_attempt else None
+    }
+
+
+def main(n_rows=10000):
+    app = create_bench_app()
+    default = DefaultJSONProvider(app)
+    serializers.init_app(app)
+    with app.app_context():
+        seed_referrers(n_rows, referrals_per_user=1)
+
+        def load_entities():
+            db.session.expunge_all()
+            return User.query.order_by(User.id).limit(n_rows).all()
+
+        def load_columns():
+            return db.session.execute(serializers.users.select().order_by(User.id).limit(n_rows)).all()
+
+        users, entity_ms, _ = timed(load_entities, repeat=10)
+        rows, column_ms, _ = timed(load_columns, repeat=10)
+
+        old_body, old_ms, old_p95 = timed(lambda: default.dumps([hand_written(u) for u in users]))
+        dump = serializers.users.dump_tuple
+        new_body, new_ms, new_p95 = timed(lambda: app.json.dumps([dump(row) for row in rows]))
+        assert default.loads(old_body) == app.json.loads(new_body)
+
+        print(f"{n_rows} rows   query: entities {entity_ms:.1f}ms   columns {column_ms:.1f}ms")
+        print(f"  hand-written dicts + json:   median={old_ms:.1f}ms  p95={old_p95:.1f}ms  "
+              f"({n_rows / old_ms * 1000:,.0f} rows/s)")
+        print(f"  compiled dump_tuple + orjson: median={new_ms:.1f}ms  p95={new_p95:.1f}ms  "
+              f"({n_rows / new_ms * 1000:,.0f} rows/s)")
+        print(f"  end to end: {entity_ms + old_ms:.1f}ms -> {column_ms + new_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,103 @@
+"""
+Cross-process cache backend for Flask-Caching.
+
+SimpleCache lives inside one Passenger worker, so each worker keeps its own
+copy of every cached value. SQLiteCache stores entries in a small SQLite file
+that all workers on the host share. Select it with:
+
+    CACHE_TYPE = 'cache_backends.SQLiteCache'
+    CACHE_SQLITE_PATH = 'cache.db'
+
+For several hosts use Flask-Caching's RedisCache instead
+(CACHE_TYPE = 'RedisCache', CACHE_REDIS_URL = 'redis://...'); the helpers in
+caching.py only rely on the common get/set/add/delete interface.
+"""
+
+import pickle
+import sqlite3
+import threading
+import time
+
+from flask_caching.backends.base import BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Pickled values in a WAL-mode SQLite table, safe for concurrent processes."""
+
+    def __init__(self, path='cache.db', default_timeout=300, busy_timeout=5000):
+        super().__init__(default_timeout=default_timeout)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs['path'] = config.get('CACHE_SQLITE_PATH', 'cache.db')
+        return cls(*args, **kwargs)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else 0
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] and row[1] <= time.time()):
+            return None
+        try:
+            return pickle.loads(row[0])
+        except (pickle.PickleError, EOFError):
+            return None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def set(self, key, value, timeout=None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout))
+        )
+        return True
+
+    def add(self, key, value, timeout=None):
+        """Atomically store `value` only if `key` is absent or expired."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache.expires != 0 AND cache.expires <= ?",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout), now)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        cursor = self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount == 1
+
+    def delete_many(self, *keys):
+        return [key for key in keys if self.delete(key)]
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+        return True
+
+    def prune(self):
+        """Drop expired rows; the table otherwise only grows by distinct keys."""
+        self._conn().execute(
+            "DELETE FROM cache WHERE expires != 0 AND expires <= ?", (time.time(),)
+        )
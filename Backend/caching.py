@@ -0,0 +1,185 @@
+"""
+Read-through caching for expensive, shared results (leaderboards and the like).
+
+Values go through two tiers:
+  - a small per-process LRU that absorbs bursts of identical requests, and
+  - the shared `extensions.cache` backend (SQLiteCache / Redis), so every
+    worker process sees the same value.
+
+Shared entries are served fresh for `ttl` seconds and then, for another
+`stale_ttl` seconds, served stale while exactly one caller (across all
+processes) recomputes them. A single-flight lock stored in the shared backend
+also keeps a cold miss from starting one recomputation per worker.
+
+`invalidate` gives the key a new generation in the shared backend. Entries are
+stamped with the generation they were computed under, so a recompute that
+started before an invalidation can neither store nor serve its (possibly
+stale) result afterwards.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from extensions import cache
+
+LOCK_TIMEOUT = 30  # seconds a recompute may hold the single-flight lock
+MISS_WAIT = 5  # seconds a caller waits for another worker to fill a cold miss
+GENERATION_TTL = 24 * 3600  # seconds a key's generation outlives its last invalidation
+
+
+class LocalLRU:
+    """Thread-safe LRU of (value, expires_at) pairs for one process."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRU()
+
+# Per-process counters: local_hit, shared_hit, stale_hit, miss, invalidation, dropped
+stats = Counter()
+
+
+def _acquire(key):
+    """Take the cross-process recompute lock for `key`; returns a token or None."""
+    token = uuid.uuid4().hex
+    if cache.add(f'lock:{key}', token, timeout=LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    if cache.get(f'lock:{key}') == token:
+        cache.delete(f'lock:{key}')
+
+
+def _generation(key):
+    return cache.get(f'gen:{key}')
+
+
+def _lookup(key):
+    """The shared entry for `key` and the key's generation; entries from older generations are ignored."""
+    generation = _generation(key)
+    entry = cache.get(key)
+    if entry is not None and entry.get('generation') != generation:
+        entry = None
+    return entry, generation
+
+
+def _store(key, value, generation, ttl, stale_ttl, local_ttl):
+    """Store `value` unless `key` was invalidated since `generation` was read."""
+    if _generation(key) != generation:
+        stats['dropped'] += 1
+        return
+    entry = {'value': value, 'fresh_until': time.time() + ttl, 'generation': generation}
+    cache.set(key, entry, timeout=ttl + stale_ttl)
+    local_cache.set(key, value, min(local_ttl, ttl))
+
+
+def get_or_compute(key, compute, ttl=30, stale_ttl=300, local_ttl=2):
+    """
+    Return the cached value for `key`, calling `compute()` on a miss.
+
+    :param key: Shared cache key; include the period id for period-scoped data.
+    :param compute: Zero-argument callable producing the value.
+    :param ttl: Seconds a shared entry is considered fresh.
+    :param stale_ttl: Extra seconds a stale entry may be served while one
+        caller refreshes it.
+    :param local_ttl: Seconds the per-process LRU may serve the value.
+    """
+    hit = local_cache.get(key)
+    if hit is not None:
+        stats['local_hit'] += 1
+        return hit[0]
+
+    entry, generation = _lookup(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        stats['shared_hit'] += 1
+        local_cache.set(key, entry['value'], min(local_ttl, entry['fresh_until'] - time.time()))
+        return entry['value']
+
+    token = _acquire(key)
+    if token is None:
+        if entry is not None:
+            # Someone else is refreshing; serve the stale value meanwhile
+            stats['stale_hit'] += 1
+            return entry['value']
+        # Cold miss being filled by another worker: wait briefly for it
+        deadline = time.monotonic() + MISS_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry, generation = _lookup(key)
+            if entry is not None:
+                stats['shared_hit'] += 1
+                return entry['value']
+        stats['miss'] += 1
+        value = compute()
+        _store(key, value, generation, ttl, stale_ttl, local_ttl)
+        return value
+
+    stats['miss'] += 1
+    try:
+        value = compute()
+        _store(key, value, generation, ttl, stale_ttl, local_ttl)
+        return value
+    finally:
+        _release(key, token)
+
+
+def invalidate(*keys):
+    """
+    Drop `keys` from both tiers (other processes' LRUs expire within local_ttl)
+    and start a new generation, so results computed before now are discarded.
+    """
+    for key in keys:
+        stats['invalidation'] += 1
+        cache.set(f'gen:{key}', uuid.uuid4().hex, timeout=GENERATION_TTL)
+        cache.delete(key)
+        local_cache.delete(key)
+
+
+def get_stats():
+    """This process's cache counters plus the derived hit ratio."""
+    lookups = stats['local_hit'] + stats['shared_hit'] + stats['stale_hit'] + stats['miss']
+    hits = lookups - stats['miss']
+    return {
+        'pid': os.getpid(),
+        'local_hit': stats['local_hit'],
+        'shared_hit': stats['shared_hit'],
+        'stale_hit': stats['stale_hit'],
+        'miss': stats['miss'],
+        'invalidation': stats['invalidation'],
+        'dropped': stats['dropped'],
+        'hit_ratio': round(hits / lookups, 4) if lookups else None,
+    }
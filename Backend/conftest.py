@@ -0,0 +1,128 @@
+"""
+Shared pytest fixtures.
+
+Tests run against a throwaway SQLite file by default. Set TEST_DATABASE_URL to
+run the same suite against another backend, e.g. a local PostgreSQL:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/chike_test python -m pytest
+
+That database is emptied before and after every test, so never point it at
+real data. Tests that only make sense on SQLite (pragmas, EXPLAIN QUERY PLAN)
+are marked `sqlite_only` and skipped on other backends.
+
+Most tests build their app with the `make_app` factory fixture:
+
+    @pytest.fixture
+    def app(make_app):
+        return make_app((referral_bp, '/referral'), seed=add_users)
+"""
+
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, MetaData
+
+import db_config
+from caching import local_cache
+from extensions import db, cache
+from referral.leaderboard import leaderboard_engine
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'sqlite_only: test relies on SQLite-specific behaviour')
+
+
+def pytest_collection_modifyitems(config, items):
+    if not TEST_DATABASE_URL or TEST_DATABASE_URL.startswith('sqlite'):
+        return
+    skip = pytest.mark.skip(reason='SQLite-only test; TEST_DATABASE_URL is not SQLite')
+    for item in items:
+        if 'sqlite_only' in item.keywords:
+            item.add_marker(skip)
+
+
+def _empty_database(url):
+    """Drop every table (including alembic_version) in the test database."""
+    engine = create_engine(url)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def database_uri():
+    """A database URI with no tables in it, cleaned up after the test."""
+    if TEST_DATABASE_URL:
+        _empty_database(TEST_DATABASE_URL)
+        yield TEST_DATABASE_URL
+        _empty_database(TEST_DATABASE_URL)
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    yield f'sqlite:///{path}'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+@pytest.fixture
+def make_app(database_uri):
+    """
+    Factory for a test app on the empty test database.
+
+    make_app(*blueprints, seed=None, init=None, config=None, configure_db=False):
+      - blueprints: Blueprints, or (blueprint, url_prefix) pairs, to register.
+      - seed: Called inside the app context after create_all; committed after.
+      - init: Called with the app after db/cache are initialised (e.g.
+        db_routing.init_app, serializers.init_app).
+      - config: Extra app.config values.
+      - configure_db: Set the engine up as app.py does (db_config.configure
+        and db_config.init_app: pool options, SQLite pragmas, run_write's
+        BEGIN IMMEDIATE) instead of using the driver defaults.
+
+    The local cache and in-memory leaderboards are reset for every app, and
+    every app's engine is disposed after the test.
+    """
+    apps = []
+
+    def factory(*blueprints, seed=None, init=None, config=None, configure_db=False):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+        if database_uri.startswith('sqlite'):
+            # Threaded tests wait for the write lock instead of failing
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+        app.config['CACHE_TYPE'] = 'SimpleCache'
+        app.config.update(config or {})
+        if configure_db:
+            db_config.configure(app)
+        db.init_app(app)
+        if configure_db:
+            db_config.init_app(app)
+        cache.init_app(app)
+        if init:
+            init(app)
+        for blueprint in blueprints:
+            blueprint, url_prefix = blueprint if isinstance(blueprint, tuple) else (blueprint, None)
+            app.register_blueprint(blueprint, url_prefix=url_prefix)
+        local_cache.clear()
+        with app.app_context():
+            db.create_all()
+            if seed:
+                seed()
+                db.session.commit()
+            leaderboard_engine.rebuild()
+        apps.append(app)
+        return app
+
+    yield factory
+    local_cache.clear()
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
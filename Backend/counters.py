@@ -0,0 +1,44 @@
+"""
+Atomic counter updates for User balances and tallies.
+
+Reading a row, changing it in Python and writing it back loses increments
+when several worker processes touch the same user concurrently. These helpers
+issue a single `UPDATE ... SET col = col + :delta` so the database applies
+the change, and use RETURNING to hand back the new values.
+"""
+
+from extensions import db
+from models import User
+
+
+def increment_user(user_id, guard=None, **deltas):
+    """
+    Add each delta to the matching User column in one UPDATE (no commit).
+
+    :param user_id: The user to update.
+    :param guard: Optional extra WHERE clause, e.g. `User.total_earned >= amount`
+        for a debit that must not overdraw.
+    :param deltas: column name -> amount to add (negative to subtract).
+    :return: Row with the new column values, or None if no row matched
+        (unknown user or guard not satisfied).
+    """
+    columns = [getattr(User, name) for name in deltas]
+    stmt = db.update(User).where(User.id == user_id)
+    if guard is not None:
+        stmt = stmt.where(guard)
+    stmt = stmt.values({
+        column: db.func.coalesce(column, 0) + delta
+        for column, delta in zip(columns, deltas.values())
+    }).returning(*columns)
+    return db.session.execute(stmt).first()
+
+
+def debit_user(user_id, column, amount):
+    """
+    Subtract `amount` from `column` only if the balance covers it.
+
+    :return: The new balance, or None if the user has insufficient funds.
+    """
+    column_attr = getattr(User, column)
+    row = increment_user(user_id, guard=column_attr >= amount, **{column: -amount})
+    return row[0] if row else None
@@ -0,0 +1,32 @@
+from flask import Blueprint, current_app, jsonify, request
+
+from dashboard.utils import build_dashboard, parse_fields
+from db_routing import read_only
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+
+@dashboard_bp.route('/dashboard', methods=['GET'])
+@read_only(user_id=lambda: request.args.get('user_id', type=int))
+def get_dashboard():
+    """
+    Profile, trivia status and leaderboards for the dashboard in one call.
+    Query params: user_id (required), fields (optional, e.g.
+    "profile,leaderboards.daily"; sections: profile, trivia, leaderboards).
+    """
+    user_id = request.args.get('user_id', type=int)
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    try:
+        selected = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    body = build_dashboard(user_id, selected)
+    if body is None:
+        return jsonify({'error': 'User not found'}), 404
+
+    response = current_app.response_class(body, mimetype='application/json')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
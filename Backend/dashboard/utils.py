@@ -0,0 +1,74 @@
+"""
+Builds the `/me/dashboard` payload: what the dashboard page used to fetch
+from `/profile/profile` and the three leaderboard endpoints, in one response.
+
+The user's row and ranks come from one memoized statement
+(profile.utils.get_profile_figures) and leaderboards are embedded as their
+cached encoded bytes (see http_cache.join_json), so a warm dashboard runs no
+SQL and encodes no leaderboard.
+"""
+
+from datetime import datetime
+
+from flask import current_app
+
+from http_cache import join_json
+from profile.utils import build_profile, get_cached_profile_figures, trivia_minutes_left
+from referral.routes import get_encoded_leaderboard
+
+SECTIONS = ('profile', 'trivia', 'leaderboards')
+LEADERBOARD_PERIODS = ('daily', 'weekly', 'all_time')
+
+
+def parse_fields(value):
+    """
+    Parse a `fields=` selector such as "profile,leaderboards.daily" into
+    {section: None (all of it) or a set of leaderboard periods}. No value
+    selects everything. Unknown fields raise ValueError.
+    """
+    if not value:
+        return dict.fromkeys(SECTIONS)
+    selected = {}
+    for field in value.split(','):
+        section, _, part = field.strip().partition('.')
+        if section not in SECTIONS or (part and (section != 'leaderboards' or part not in LEADERBOARD_PERIODS)):
+            raise ValueError(f"Unknown field '{field.strip()}'")
+        if not part:
+            selected[section] = None
+        elif selected.get(section, set()) is not None:
+            selected.setdefault(section, set()).add(part)
+    return selected
+
+
+def build_dashboard(user_id, selected, now=None):
+    """
+    Encoded JSON body with the `selected` sections (see parse_fields) for
+    the user, or None if there is no such user.
+    """
+    now = now or datetime.utcnow()
+    figures = get_cached_profile_figures(user_id)
+    if figures is None:
+        return None
+    dumps = current_app.json.dumps
+    members = {}
+
+    if 'profile' in selected:
+        members['profile'] = dumps(build_profile(figures, now)).encode()
+
+    if 'trivia' in selected:
+        last_attempt = figures['last_trivia_attempt']
+        minutes_left = trivia_minutes_left(last_attempt, now)
+        members['trivia'] = dumps({
+            'available': not minutes_left,
+            'remainingTriviaTime': minutes_left,
+            'lastAttempt': last_attempt.isoformat() if last_attempt else None,
+        }).encode()
+
+    if 'leaderboards' in selected:
+        periods = [p for p in LEADERBOARD_PERIODS if selected['leaderboards'] is None or p in selected['leaderboards']]
+        members['leaderboards'] = join_json({
+            period: get_encoded_leaderboard(period)['body']
+            for period in periods
+        })
+
+    return join_json(members)
@@ -0,0 +1,133 @@
+"""
+Read/write routing between the primary database and a read replica.
+
+Set DATABASE_REPLICA_URL to open a replica engine. Views decorated with
+`@read_only` then run their SELECTs against the replica, so leaderboards,
+profile ranks and admin analytics stop competing with signup and referral
+writes. Everything else - all writes, flushes, SELECT ... FOR UPDATE, and
+every query in views that are not marked - goes to the primary. Without a
+replica the decorator does nothing.
+
+Replicas lag, so a user who has just written (made a referral, played trivia,
+requested a withdrawal...) reads from the primary for
+DB_READ_YOUR_WRITES_SECONDS afterwards. Writes are noted from the domain
+events in events.py, or explicitly with `note_write(user_id)`.
+"""
+
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+
+from events import (
+    referral_created, referral_deleted, user_points_changed, user_updated, winner_created
+)
+
+DEFAULT_READ_YOUR_WRITES_SECONDS = 5
+
+
+def init_app(app, replica_url=None):
+    """
+    Open the replica engine, with the same pool options as the primary.
+
+    It is kept out of SQLALCHEMY_BINDS on purpose: a bind would get its own
+    metadata and create_all() would treat it as a second primary.
+    """
+    app.config.setdefault('DB_READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS)
+    if replica_url:
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        app.extensions['db_replica'] = sa.create_engine(replica_url, **options)
+
+
+def get_replica():
+    """The current app's replica engine, or None if it has none."""
+    return current_app.extensions.get('db_replica')
+
+
+class RoutingSession(Session):
+    """db.session class that sends reads in `@read_only` views to the replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            replica = get_replica()
+            if replica is not None:
+                return replica
+        if bind is None and has_request_context() and not self._is_plain_select(clause):
+            g.db_wrote = True  # later reads in this request must see the write
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    @staticmethod
+    def _is_plain_select(clause):
+        return (
+            clause is not None
+            and getattr(clause, 'is_select', False)
+            and getattr(clause, '_for_update_arg', None) is None
+        )
+
+    def _reads_from_replica(self, clause):
+        return (
+            not self._flushing
+            and self._is_plain_select(clause)
+            and has_request_context()
+            and g.get('db_read_only', False)
+            and not g.get('db_wrote', False)
+        )
+
+
+def _write_key(user_id):
+    return f'db_wrote:{user_id}'
+
+
+def note_write(user_id):
+    """Send `user_id`'s reads to the primary until the replica has caught up."""
+    if user_id is None or not has_app_context() or get_replica() is None:
+        return
+    from extensions import cache  # extensions imports this module for RoutingSession
+    window = current_app.config.get('DB_READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS)
+    cache.set(_write_key(user_id), time.time() + window, timeout=window)
+
+
+def wrote_recently(user_id):
+    from extensions import cache
+    until = cache.get(_write_key(user_id)) if user_id is not None else None
+    return until is not None and until > time.time()
+
+
+def read_only(view=None, *, user_id=None):
+    """
+    Mark a view as read-only so its queries may use the replica.
+
+    :param user_id: Optional callable returning the requesting user's id (from
+        the request), used to honour that user's read-your-writes window.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            uid = user_id() if user_id else None
+            g.db_read_only = not wrote_recently(uid)
+            return view(*args, **kwargs)
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+def use_primary():
+    """Send the rest of this request's reads to the primary (e.g. ?fresh=1)."""
+    g.db_read_only = False
+
+
+@referral_created.connect
+@referral_deleted.connect
+def _note_referrer_write(sender, referrer_id, **_):
+    note_write(referrer_id)
+
+
+@user_updated.connect
+@user_points_changed.connect
+@winner_created.connect
+def _note_user_write(sender, user_id, **_):
+    note_write(user_id)
@@ -0,0 +1,188 @@
+"""
+Transactional email outbox.
+
+Request handlers call `enqueue_email` inside their own transaction, so the
+email row commits (or rolls back) together with the data it describes and the
+response never waits on SMTP. A pool of background threads claims due rows,
+delivers them, and retries failures with exponential backoff until
+MAX_ATTEMPTS, after which the row is parked as 'dead' for inspection.
+
+Drain the queue by hand (e.g. after an outage) with:
+    python email_outbox.py
+"""
+
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import EmailOutbox
+from email_sender import build_welcome_message
+from password_email import build_password_reset_message
+from winner_notifier import build_winner_message
+import mailer
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 30  # seconds; doubled after each failed attempt
+BACKOFF_MAX = 3600
+CLAIM_TIMEOUT = timedelta(minutes=10)  # 'sending' rows older than this are retried
+BATCH_SIZE = 20
+
+# kind -> builder(recipient, **payload) returning a MIME message
+BUILDERS = {
+    'welcome': lambda recipient, **p: build_welcome_message(recipient, p['name'], p['referral_code']),
+    'password_reset': lambda recipient, **p: build_password_reset_message(recipient, p['name'], p['password_token']),
+    'winner': lambda recipient, **p: build_winner_message(recipient, **p),
+}
+
+_wakeup = threading.Event()
+
+
+def enqueue_email(kind, recipient, payload, dedupe_key=None):
+    """
+    Add an email to the outbox in the current transaction (no commit).
+
+    :param kind: One of BUILDERS.
+    :param recipient: Receiver email address.
+    :param payload: Dict of keyword arguments for the builder.
+    :param dedupe_key: At most one email per key is ever queued; defaults to
+        one `kind` email per recipient.
+    :return: The new EmailOutbox row, or None if it was a duplicate.
+    """
+    if kind not in BUILDERS:
+        raise ValueError(f"Unknown email kind: {kind}")
+    dedupe_key = dedupe_key or f"{kind}:{recipient.lower()}"
+    if EmailOutbox.query.filter_by(dedupe_key=dedupe_key).first():
+        return None
+    item = EmailOutbox(
+        kind=kind,
+        recipient=recipient,
+        payload=json.dumps(payload),
+        dedupe_key=dedupe_key
+    )
+    db.session.add(item)
+    return item
+
+
+def notify():
+    """Wake the worker pool after committing new outbox rows."""
+    _wakeup.set()
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """
+    Atomically mark up to `limit` due rows as 'sending' and return their ids.
+    The conditional UPDATE makes each row go to exactly one worker, even
+    across processes.
+    """
+    now = datetime.utcnow()
+    is_due = db.or_(
+        db.and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        db.and_(EmailOutbox.status == 'sending', EmailOutbox.next_attempt_at <= now - CLAIM_TIMEOUT)
+    )
+    due = (
+        db.select(EmailOutbox.id)
+        .where(is_due)
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+    )
+    claimed = []
+    for outbox_id in db.session.scalars(due).all():
+        # Re-check the due condition so a row claimed meanwhile is skipped
+        result = db.session.execute(
+            db.update(EmailOutbox)
+            .where(EmailOutbox.id == outbox_id, is_due)
+            .values(status='sending', next_attempt_at=now)
+        )
+        if result.rowcount == 1:
+            claimed.append(outbox_id)
+    db.session.commit()
+    return claimed
+
+
+def backoff(attempts):
+    """Delay before the next try: exponential with +/-20% jitter, capped."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def deliver_one(outbox_id, send=None):
+    """Render and send one claimed row, recording success or scheduling a retry."""
+    item = db.session.get(EmailOutbox, outbox_id)
+    if item is None or item.status != 'sending':
+        return
+    send = send or mailer.deliver
+    try:
+        message = BUILDERS[item.kind](item.recipient, **json.loads(item.payload))
+        send(message)
+    except Exception as e:
+        item.attempts += 1
+        item.last_error = str(e)[:1000]
+        if item.attempts >= MAX_ATTEMPTS:
+            item.status = 'dead'
+            print(f"Email {item.id} ({item.kind}) to {item.recipient} is dead after {item.attempts} attempts: {e}")
+        else:
+            item.status = 'pending'
+            item.next_attempt_at = datetime.utcnow() + backoff(item.attempts)
+    else:
+        item.attempts += 1
+        item.status = 'sent'
+        item.sent_at = datetime.utcnow()
+    db.session.commit()
+
+
+def drain(send=None):
+    """Deliver everything that is currently due; returns the number processed."""
+    processed = 0
+    while True:
+        batch = claim_batch()
+        if not batch:
+            return processed
+        for outbox_id in batch:
+            deliver_one(outbox_id, send)
+        processed += len(batch)
+
+
+class OutboxWorkerPool:
+    """Background threads that drain the outbox for one app."""
+
+    def __init__(self, app, workers=2, poll_interval=5):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"email-outbox-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    processed = drain()
+            except Exception as e:
+                print(f"Email outbox worker error: {e}")
+                processed = 0
+            if not processed:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+
+
+if __name__ == "__main__":
+    from app import app
+    with app.app_context():
+        print(f"Processed {drain()} outbox emails")
@@ -1,23 +1,148 @@
-from app import app, db  # Import app and db from app.py
+"""
+Re-send every user their referral link.
+
+Users are streamed in keyset-paginated batches (id > last_id), so memory use
+does not grow with the user count. Each batch is rendered and sent
+concurrently over the pooled SMTP connections, then a checkpoint is written;
+a crashed or interrupted run picks up after the last completed batch
+(at-least-once: the batch in flight may be re-sent). The read transaction is
+ended after each batch is fetched, so a campaign that spends hours in SMTP
+never holds a database snapshot open (which would stop SQLite checkpointing
+its WAL, or pin an old snapshot on PostgreSQL).
+
+Addresses that could not be sent to are appended to a log next to the
+checkpoint file (or --failed-log).
+
+Usage (from the Backend directory):
+    python email_resender.py [--batch-size 500] [--workers 4] [--dry-run] [--restart]
+                             [--checkpoint PATH] [--failed-log PATH]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+from extensions import db
 from models import User  # Adjust the import path based on your project structure
-from email_sender import send_email
+from email_sender import build_welcome_message
+from mailer import smtp_pool
+
+CHECKPOINT_FILE = 'email_resender_checkpoint.json'
+FAILED_LOG = 'email_resender_failed.log'
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_checkpoint(path, state):
+    """Write the checkpoint atomically so a crash never leaves a torn file."""
+    state['updated_at'] = datetime.utcnow().isoformat()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file)
+    os.replace(tmp_path, path)
 
-def process_referrals():
-    try:
-        users = User.query.all()
 
-        for user in users:
-            receiver_email = user.email
-            name = user.name
-            referral_code = user.referral_code
+def failed_log_for(checkpoint_path):
+    """Where a run using `checkpoint_path` logs failed addresses: FAILED_LOG beside it."""
+    return os.path.join(os.path.dirname(checkpoint_path), FAILED_LOG)
 
-            send_email(receiver_email, name, referral_code)
 
-            print(f"Email sent to {receiver_email} with referral code {referral_code}")
+def iter_user_batches(after_id, batch_size):
+    """
+    Yield lists of (id, email, name, referral_code) rows in id order. The read
+    transaction is ended before each batch is handed out.
+    """
+    last_id = after_id
+    while True:
+        rows = (
+            db.session.query(User.id, User.email, User.name, User.referral_code)
+            .filter(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+            .all()
+        )
+        db.session.rollback()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def process_referrals(batch_size=500, workers=None, dry_run=False, restart=False,
+                      checkpoint_path=CHECKPOINT_FILE, failed_log_path=None):
+    """Stream users and send each their referral link, resuming from the checkpoint."""
+    failed_log_path = failed_log_path or failed_log_for(checkpoint_path)
+    state = None if restart else load_checkpoint(checkpoint_path)
+    if state:
+        print(f"Resuming after user id {state['last_id']} ({state['sent']} sent so far)")
+    else:
+        state = {'last_id': 0, 'sent': 0, 'failed': 0, 'started_at': datetime.utcnow().isoformat()}
+
+    remaining = db.session.query(db.func.count(User.id)).filter(User.id > state['last_id']).scalar()
+    db.session.rollback()
+    print(f"{remaining} users to process{' (dry run)' if dry_run else ''}")
+
+    started = time.monotonic()
+    done = 0
+    with open(failed_log_path, 'a', encoding='utf-8') as failed_log:
+        def on_error(message, error):
+            failed_log.write(f"{message['To']}\t{error}\n")
+            print(f"Failed to send email to {message['To']}. Error: {error}")
+
+        for rows in iter_user_batches(state['last_id'], batch_size):
+            messages = (
+                build_welcome_message(email, name, referral_code)
+                for _, email, name, referral_code in rows
+            )
+            if dry_run:
+                sent, failed = sum(1 for _ in messages), 0
+            else:
+                report = smtp_pool.send_many(messages, workers=workers, on_error=on_error)
+                sent, failed = report['sent'], report['failed']
+            failed_log.flush()
+
+            state['last_id'] = rows[-1][0]
+            state['sent'] += sent
+            state['failed'] += failed
+            if not dry_run:
+                save_checkpoint(checkpoint_path, state)
+
+            done += len(rows)
+            elapsed = time.monotonic() - started
+            print(
+                f"{done}/{remaining} ({done * 100 // max(remaining, 1)}%) "
+                f"last id {state['last_id']}, {state['sent']} sent, {state['failed']} failed, "
+                f"{done / elapsed:.1f} users/s"
+            )
+
+    if not dry_run and os.path.exists(checkpoint_path):
+        # Completed: the next run starts a fresh campaign
+        os.replace(checkpoint_path, checkpoint_path + '.done')
+    print(f"Finished: {state['sent']} sent, {state['failed']} failed")
+    return state
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-send every user their referral link.")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None, help="concurrent senders (default: SMTP pool size)")
+    parser.add_argument('--dry-run', action='store_true', help="render emails without sending")
+    parser.add_argument('--restart', action='store_true', help="ignore any checkpoint and start over")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE)
+    parser.add_argument('--failed-log', default=None, help=f"default: {FAILED_LOG} beside the checkpoint")
+    args = parser.parse_args()
+
+    # One-off script: don't start the outbox workers when importing the app
+    os.environ.setdefault('EMAIL_OUTBOX_WORKERS', '0')
+    from app import app
+
     with app.app_context():
-        process_referrals()
+        process_referrals(args.batch_size, args.workers, args.dry_run, args.restart,
+                          args.checkpoint, args.failed_log)
@@ -1,16 +1,8 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from mailer import build_message, deliver
 
-# Configuration
-SENDER_EMAIL = "hi@playchike.com"
-PASSWORD = "#cab466GOES601#"
-SMTP_SERVER = "mail.playchike.com"
-SMTP_PORT = 465  # Use 465 for SSL
-
-def send_email(receiver_email, name, referral_code):
+def build_welcome_message(receiver_email, name, referral_code):
     """
-    Sends a plain-text email with a personalized message and referral link.
+    Builds the plain-text welcome email with a personalized message and referral link.
 
     Args:
         receiver_email (str): Recipient's email address.
@@ -42,27 +34,21 @@ The Playchike.com Team
 """
 
     # Create a multipart message (to allow for flexibility if you add HTML later)
-    message = MIMEMultipart("alternative")
-    message["From"] = SENDER_EMAIL
-    message["To"] = receiver_email
-    message["Subject"] = subject
+    return build_message(receiver_email, subject, plain_text_message, "plain")
 
-    # Attach the plain-text content
-    message.attach(MIMEText(plain_text_message, "plain"))
-
-    try:
-        # Connect to the SMTP server over SSL on port 465
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
 
-            # Optional: Enable debug output for troubleshooting
-            # server.set_debuglevel(1)
-
-            # Log in to the server
-            server.login(SENDER_EMAIL, PASSWORD)
-
-            # Send the email
-            server.send_message(message)
+def send_email(receiver_email, name, referral_code):
+    """
+    Sends the welcome email immediately. Request handlers should enqueue it
+    through email_outbox instead so delivery is retried off the request path.
 
+    Args:
+        receiver_email (str): Recipient's email address.
+        name (str): Recipient's name.
+        referral_code (str): Referral code to include in the email.
+    """
+    try:
+        deliver(build_welcome_message(receiver_email, name, referral_code))
         print(f"Email sent successfully to {receiver_email}")
 
     except Exception as e:
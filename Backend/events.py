@@ -0,0 +1,48 @@
+"""
+Domain events published by write paths after their transaction commits.
+
+Caches and in-memory views subscribe with the usual blinker API, e.g.:
+
+    from events import referral_created
+
+    @referral_created.connect
+    def on_referral_created(sender, **payload):
+        ...
+
+Events are in-process only; other worker processes catch up through short
+cache TTLs and the leaderboard engine's referral tailing.
+"""
+
+from blinker import Namespace
+
+_signals = Namespace()
+
+# referrer_id, referral_id, created_at, name, profile_picture
+referral_created = _signals.signal('referral-created')
+# referrer_id, created_at
+referral_deleted = _signals.signal('referral-deleted')
+# user_id
+user_created = _signals.signal('user-created')
+# user_id; name/email/profile picture/referrals_count edited, or user deleted
+user_updated = _signals.signal('user-updated')
+# user_id, earned_delta (change in total_earned, when known);
+# total_points and/or total_earned changed
+user_points_changed = _signals.signal('user-points-changed')
+# user_id, winner_type, amount
+winner_created = _signals.signal('winner-created')
+# user_id, winner_type, amount
+winner_deleted = _signals.signal('winner-deleted')
+
+
+def publish(signal, **payload):
+    """
+    Deliver `payload` to every receiver of `signal`.
+
+    The write has already been committed when this runs, so a failing
+    receiver is logged and skipped instead of failing the request.
+    """
+    for receiver in signal.receivers_for(None):
+        try:
+            receiver(None, **payload)
+        except Exception as e:
+            print(f"Event receiver {getattr(receiver, '__name__', receiver)} failed for {signal.name}: {e}")
@@ -0,0 +1,66 @@
+"""
+Pre-encoded JSON responses for endpoints that clients poll.
+
+`encode_json` turns a value into everything a response needs: the JSON body
+bytes, a gzipped copy and a content hash. Cache that instead of the Python
+value (e.g. as the `compute` result of `caching.get_or_compute`), and
+`json_response` serves it without encoding anything:
+
+  - the hash is sent as a weak ETag, so a client that already has the
+    content gets a bodiless 304 for `If-None-Match`,
+  - clients that accept gzip get the pre-compressed copy,
+  - `Cache-Control: max-age` tells clients when it is worth asking again.
+
+The ETag is weak because the plain and gzipped bodies are the same content.
+"""
+
+import gzip
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+GZIP_MIN_BYTES = 256  # below this gzip saves less than its own headers
+
+
+def encode_json(value):
+    """Body, gzipped body (or None), ETag and build time for `value`."""
+    body = current_app.json.dumps(value).encode() + b'\n'
+    compressed = gzip.compress(body, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+    return {
+        'body': body,
+        'gzip': compressed,
+        'etag': hashlib.blake2b(body, digest_size=16).hexdigest(),
+        'built_at': time.time(),
+    }
+
+
+def json_response(encoded, max_age=0):
+    """
+    Response for an `encode_json` result: 304 when the client's ETag or
+    Last-Modified still matches, the gzipped body when accepted, else the body.
+    """
+    response = current_app.response_class(mimetype='application/json')
+    if encoded['gzip'] is not None and request.accept_encodings['gzip']:
+        response.set_data(encoded['gzip'])
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.set_data(encoded['body'])
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(encoded['etag'], weak=True)
+    response.last_modified = datetime.fromtimestamp(int(encoded['built_at']), timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = max(0, int(max_age))
+    return response.make_conditional(request)
+
+
+def join_json(members):
+    """
+    JSON object bytes from {key: already-encoded JSON value bytes}, so cached
+    encoded bodies can be embedded in a larger response without decoding them.
+    """
+    dumps = current_app.json.dumps
+    return b'{' + b','.join(
+        dumps(key).encode() + b':' + value.rstrip(b'\n') for key, value in members.items()
+    ) + b'}\n'
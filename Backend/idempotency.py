@@ -0,0 +1,167 @@
+"""
+Idempotency keys for POSTs that clients retry.
+
+A client sends `Idempotency-Key: <unique value>` with a request. The first
+request with a key claims it (a row in `idempotency_keys`), runs the view and
+stores the response. Retries with the same key get that stored response back
+without running the view again, so a timed-out withdrawal is not debited
+twice and a retried signup does not hash, refer and email again.
+
+  - A completed key is also kept in the shared cache, so a retry storm costs
+    one cache lookup per request.
+  - A duplicate that arrives while the first request is still running waits
+    (up to IDEMPOTENCY_WAIT seconds) for its response instead of racing it.
+  - Reusing a key with a different request body is refused with 422.
+  - 5xx responses are not stored: the key is released and the retry runs.
+  - Keys expire after IDEMPOTENCY_TTL seconds; `prune_expired_keys` deletes
+    them (scheduled from app.py). A claim whose request died mid-way expires
+    after IDEMPOTENCY_LOCK_SECONDS and can then be claimed again.
+
+Requests without the header behave exactly as before.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, make_response, request, jsonify
+
+from db_config import run_write, upsert_insert
+from extensions import db, cache
+from models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_WAIT = 10
+DEFAULT_LOCK_SECONDS = 60
+POLL_INTERVAL = 0.05
+MAX_KEY_LENGTH = 200
+
+
+def _setting(name, default):
+    return current_app.config.get(name, default)
+
+
+def _cache_key(key):
+    return f'idempotency:{key}'
+
+
+def _replay(stored):
+    response = make_response(stored['body'], stored['status'])
+    response.content_type = stored['content_type']
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _as_stored(row):
+    return {
+        'request_hash': row.request_hash,
+        'status': row.response_status,
+        'body': row.response_body,
+        'content_type': row.content_type,
+    }
+
+
+def _claim(key, request_hash, now, lock_until):
+    """Insert the in-progress row, or take over an expired one. Runs inside run_write."""
+    insert = upsert_insert()
+    values = dict(
+        key=key, request_hash=request_hash, status='in_progress', response_status=None,
+        response_body=None, content_type=None, created_at=now, expires_at=lock_until
+    )
+    stmt = insert(IdempotencyKey).values(values)
+    result = db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['key'],
+        set_={name: stmt.excluded[name] for name in values if name != 'key'},
+        where=IdempotencyKey.expires_at < now
+    ))
+    return result.rowcount == 1
+
+
+def _store(key, status, body, content_type, expires_at):
+    db.session.execute(
+        db.update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(status='done', response_status=status, response_body=body,
+                content_type=content_type, expires_at=expires_at)
+    )
+
+
+def _release(key):
+    db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.key == key))
+
+
+def _wait_for(key):
+    """Poll the claimed row until its response is stored; None if it never is."""
+    deadline = time.monotonic() + _setting('IDEMPOTENCY_WAIT', DEFAULT_WAIT)
+    while True:
+        row = db.session.get(IdempotencyKey, key, populate_existing=True)
+        db.session.commit()  # end the read so the next poll sees new commits
+        if row is None or row.status == 'done' or time.monotonic() >= deadline:
+            return row
+        time.sleep(POLL_INTERVAL)
+
+
+def idempotent(view):
+    """Make a POST view replay its stored response for a repeated Idempotency-Key."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        client_key = request.headers.get(HEADER)
+        if request.method != 'POST' or not client_key:
+            return view(*args, **kwargs)
+        if len(client_key) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        key = f'{request.endpoint}:{client_key}'
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        stored = cache.get(_cache_key(key))
+        if stored is None:
+            now = datetime.utcnow()
+            lock_until = now + timedelta(seconds=_setting('IDEMPOTENCY_LOCK_SECONDS', DEFAULT_LOCK_SECONDS))
+            if not run_write(_claim, key, request_hash, now, lock_until):
+                row = _wait_for(key)
+                if row is None:
+                    # The first request failed and released the key; start over
+                    return wrapper(*args, **kwargs)
+                if row.status != 'done':
+                    return jsonify({"message": "A request with this Idempotency-Key is still in progress"}), 409
+                stored = _as_stored(row)
+
+        if stored is not None:
+            if stored['request_hash'] != request_hash:
+                return jsonify({"message": f"{HEADER} was already used for a different request"}), 422
+            return _replay(stored)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            run_write(_release, key)
+            raise
+        if response.status_code >= 500:
+            run_write(_release, key)
+            return response
+
+        ttl = _setting('IDEMPOTENCY_TTL', DEFAULT_TTL)
+        stored = {
+            'request_hash': request_hash,
+            'status': response.status_code,
+            'body': response.get_data(as_text=True),
+            'content_type': response.content_type,
+        }
+        run_write(_store, key, stored['status'], stored['body'], stored['content_type'],
+                  datetime.utcnow() + timedelta(seconds=ttl))
+        cache.set(_cache_key(key), stored, timeout=ttl)
+        return response
+
+    return wrapper
+
+
+def prune_expired_keys():
+    """Delete expired keys; returns how many were removed."""
+    def prune():
+        return db.session.execute(
+            db.delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+        ).rowcount
+    return run_write(prune)
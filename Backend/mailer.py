@@ -0,0 +1,273 @@
+"""
+SMTP settings and delivery shared by every mailer.
+
+Settings default to the production mailbox and can be overridden through the
+environment (e.g. SMTP_SERVER=localhost SMTP_PORT=8025 SMTP_USE_SSL=0 for a
+local aiosmtpd stand-in).
+
+Messages go through `smtp_pool`, which keeps up to SMTP_POOL_SIZE
+authenticated connections open and reuses each for many messages, so a bulk
+send pays one TLS handshake and AUTH per connection instead of per email.
+"""
+
+import atexit
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+SENDER_EMAIL = os.environ.get('SMTP_SENDER', "hi@playchike.com")
+PASSWORD = os.environ.get('SMTP_PASSWORD', "#cab466GOES601#")
+SMTP_SERVER = os.environ.get('SMTP_SERVER', "mail.playchike.com")
+SMTP_PORT = int(os.environ.get('SMTP_PORT', 465))  # Use 465 for SSL
+SMTP_USE_SSL = os.environ.get('SMTP_USE_SSL', '1') == '1'
+SMTP_TIMEOUT = 30
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))
+SMTP_SEND_RATE = float(os.environ.get('SMTP_SEND_RATE', 0))  # messages/s across the pool; 0 = unlimited
+SMTP_MESSAGES_PER_CONNECTION = 100  # recycle connections before servers start refusing
+SMTP_IDLE_CHECK = 30  # seconds idle after which a pooled connection is NOOP-checked
+
+
+def build_message(receiver_email, subject, body, subtype="plain"):
+    """Create a multipart message with a single plain-text or HTML part."""
+    message = MIMEMultipart("alternative")
+    message["From"] = SENDER_EMAIL
+    message["To"] = receiver_email
+    message["Subject"] = subject
+    message.attach(MIMEText(body, subtype))
+    return message
+
+
+def connect():
+    """Open and (if a password is configured) authenticate an SMTP connection."""
+    smtp_class = smtplib.SMTP_SSL if SMTP_USE_SSL else smtplib.SMTP
+    server = smtp_class(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    if PASSWORD:
+        server.login(SENDER_EMAIL, PASSWORD)
+    return server
+
+
+def _is_transient(error):
+    """4xx replies (421 service closing, 45x temporary failures) and dropped links."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return code is not None and 400 <= code < 500
+
+
+def _connection_lost(error):
+    """
+    Whether `error` leaves the SMTP session unusable. A refused recipient,
+    sender or message body (smtplib has already sent RSET) does not; a 421
+    reply, a dropped link or anything unexpected does.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(code == 421 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return True
+
+
+class RateLimiter:
+    """Token bucket shared by every thread using the pool."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _PooledConnection:
+    def __init__(self, server):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """
+    A bounded pool of authenticated SMTP connections.
+
+    `send` checks out a connection (opening one if fewer than `size` exist,
+    otherwise waiting for a free one), retries on transient 4xx replies or
+    dropped connections, and honours a shared send rate. A connection is only
+    replaced when the session is gone (421 or a disconnect); a message the
+    server refuses leaves it in the pool, so bad addresses in a bulk send do
+    not each cost a new TLS handshake and AUTH.
+    """
+
+    def __init__(self, size=SMTP_POOL_SIZE, rate=SMTP_SEND_RATE, connect_fn=None,
+                 max_messages_per_connection=SMTP_MESSAGES_PER_CONNECTION, retries=3):
+        self.size = size
+        self.connect_fn = connect_fn or connect
+        self.max_messages_per_connection = max_messages_per_connection
+        self.retries = retries
+        self.limiter = RateLimiter(rate)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._stats = {'sent': 0, 'failed': 0, 'connections': 0, 'reconnects': 0}
+
+    def _checkout(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._open < self.size
+                    if can_open:
+                        self._open += 1
+                if can_open:
+                    try:
+                        conn = _PooledConnection(self.connect_fn())
+                    except Exception:
+                        with self._lock:
+                            self._open -= 1
+                        raise
+                    self._count('connections')
+                    return conn
+                try:
+                    # Re-check periodically in case a busy connection was discarded
+                    conn = self._idle.get(timeout=1)
+                except queue.Empty:
+                    continue
+            if time.monotonic() - conn.last_used > SMTP_IDLE_CHECK:
+                try:
+                    if conn.server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except Exception:
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def _checkin(self, conn):
+        conn.last_used = time.monotonic()
+        if conn.sent >= self.max_messages_per_connection:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def _discard(self, conn):
+        conn.close()
+        with self._lock:
+            self._open -= 1
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def send(self, message):
+        """Send one message on a pooled connection. Raises after exhausting retries."""
+        self.limiter.wait()
+        for attempt in range(self.retries + 1):
+            conn = self._checkout()
+            try:
+                conn.server.send_message(message)
+            except Exception as e:
+                lost = _connection_lost(e)
+                if lost:
+                    self._discard(conn)
+                else:
+                    self._checkin(conn)
+                if not _is_transient(e) or attempt == self.retries:
+                    self._count('failed')
+                    raise
+                if lost:
+                    self._count('reconnects')
+                time.sleep(min(2 ** attempt, 10) * 0.5)
+            else:
+                conn.sent += 1
+                self._checkin(conn)
+                self._count('sent')
+                return
+
+    def send_many(self, messages, workers=None, on_error=None):
+        """
+        Send an iterable of messages using up to `workers` threads (default:
+        pool size) and return a throughput report for the run.
+
+        :param on_error: Optional callback(message, exception) for failures.
+        """
+        workers = workers or self.size
+        before = self.stats()
+        pending = queue.Queue(maxsize=workers * 4)
+        start = time.monotonic()
+
+        def worker():
+            while True:
+                message = pending.get()
+                if message is None:
+                    return
+                try:
+                    self.send(message)
+                except Exception as e:
+                    if on_error:
+                        on_error(message, e)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for message in messages:
+            pending.put(message)
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.monotonic() - start
+        after = self.stats()
+        sent = after['sent'] - before['sent']
+        return {
+            'sent': sent,
+            'failed': after['failed'] - before['failed'],
+            'reconnects': after['reconnects'] - before['reconnects'],
+            'connections_opened': after['connections'] - before['connections'],
+            'elapsed_seconds': round(elapsed, 3),
+            'messages_per_second': round(sent / elapsed, 2) if elapsed else None,
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, open_connections=self._open)
+
+    def close(self):
+        """Close every idle connection (in-use ones close when checked in)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+smtp_pool = SMTPPool()
+atexit.register(smtp_pool.close)
+
+
+def deliver(message):
+    """Send one message through the shared pool. Raises on any SMTP error."""
+    smtp_pool.send(message)
@@ -0,0 +1,51 @@
+"""add hot query indexes
+
+Revision ID: 8d2e4b6a1f93
+Revises: 3c1f7a9e2b40
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b6a1f93'
+down_revision = '3c1f7a9e2b40'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns); also declared in models.py
+INDEXES = [
+    # Leaderboards / profile counts and the admin referral filters
+    ('ix_referrals_referrer_id_created_at', 'referrals', ['referrer_id', 'created_at']),
+    ('ix_referrals_created_at', 'referrals', ['created_at']),
+    # Duplicate-referral check in process_referral
+    ('ix_referrals_referred_email', 'referrals', ['referred_email']),
+    # set-password and the signup token uniqueness loop
+    ('ix_users_pass_token', 'users', ['pass_token']),
+    # All-time leaderboard, total rank, admin top referrers / earners
+    ('ix_users_referrals_count', 'users', ['referrals_count']),
+    ('ix_users_total_earned', 'users', ['total_earned']),
+    # Daily/weekly rank and ranking reads from the rollup
+    ('ix_referral_period_counts_ranking', 'referral_period_counts',
+     ['period_type', 'period_start', 'count']),
+    # "Winner already processed for this period" checks
+    ('ix_winners_type_date', 'winners', ['type', 'date']),
+    # Admin withdrawal listing (by status, by user, or all, newest first)
+    ('ix_withdrawals_status_created_at', 'withdrawals', ['status', 'created_at']),
+    ('ix_withdrawals_user_id_created_at', 'withdrawals', ['user_id', 'created_at']),
+    ('ix_withdrawals_created_at', 'withdrawals', ['created_at']),
+]
+
+
+def upgrade():
+    # if_not_exists: db.create_all() may already have built them on new installs
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
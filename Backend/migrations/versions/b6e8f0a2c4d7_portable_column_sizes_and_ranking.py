@@ -0,0 +1,43 @@
+"""widen password columns and make period ranking order deterministic
+
+Revision ID: b6e8f0a2c4d7
+Revises: 5a7b9c1d3e25
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e8f0a2c4d7'
+down_revision = '5a7b9c1d3e25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite ignores VARCHAR lengths; PostgreSQL rejects werkzeug password hashes
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=100),
+                              type_=sa.String(length=255), existing_nullable=False)
+    with op.batch_alter_table('admins') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=128),
+                              type_=sa.String(length=255), existing_nullable=False)
+
+    op.drop_index('ix_referral_period_counts_ranking', table_name='referral_period_counts')
+    op.create_index('ix_referral_period_counts_ranking', 'referral_period_counts',
+                    ['period_type', 'period_start', sa.text('count DESC'), 'referrer_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_referral_period_counts_ranking', table_name='referral_period_counts')
+    op.create_index('ix_referral_period_counts_ranking', 'referral_period_counts',
+                    ['period_type', 'period_start', 'count'], unique=False)
+
+    with op.batch_alter_table('admins') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=255),
+                              type_=sa.String(length=128), existing_nullable=False)
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=255),
+                              type_=sa.String(length=100), existing_nullable=False)
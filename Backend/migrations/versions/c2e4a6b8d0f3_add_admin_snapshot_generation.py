@@ -0,0 +1,26 @@
+"""add admin snapshot generation
+
+Revision ID: c2e4a6b8d0f3
+Revises: a7c9e1f3b5d8
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e4a6b8d0f3'
+down_revision = 'a7c9e1f3b5d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('admin_stats_snapshot') as batch_op:
+        batch_op.add_column(sa.Column('generation', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('admin_stats_snapshot') as batch_op:
+        batch_op.drop_column('generation')
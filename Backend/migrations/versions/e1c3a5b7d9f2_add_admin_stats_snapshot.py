@@ -0,0 +1,36 @@
+"""add admin stats snapshot
+
+Revision ID: e1c3a5b7d9f2
+Revises: b6e8f0a2c4d7
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1c3a5b7d9f2'
+down_revision = 'b6e8f0a2c4d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('admin_stats_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_users', sa.Integer(), nullable=False),
+    sa.Column('total_referrals', sa.Integer(), nullable=False),
+    sa.Column('total_winners', sa.Integer(), nullable=False),
+    sa.Column('total_earned', sa.Float(), nullable=False),
+    sa.Column('top_referrers', sa.Text(), nullable=False),
+    sa.Column('top_earners', sa.Text(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('admin_stats_snapshot')
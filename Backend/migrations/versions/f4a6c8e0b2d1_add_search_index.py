@@ -0,0 +1,99 @@
+"""add search index
+
+Revision ID: f4a6c8e0b2d1
+Revises: e1c3a5b7d9f2
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a6c8e0b2d1'
+down_revision = 'e1c3a5b7d9f2'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+        name, email, content='users', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_search(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_search(users_search, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF name, email ON users BEGIN
+        INSERT INTO users_search(users_search, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO users_search(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    "INSERT INTO users_search(users_search) VALUES ('rebuild')",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS referrals_search USING fts5(
+        referred_email, content='referrals', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS referrals_search_ai AFTER INSERT ON referrals BEGIN
+        INSERT INTO referrals_search(rowid, referred_email) VALUES (new.id, new.referred_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS referrals_search_ad AFTER DELETE ON referrals BEGIN
+        INSERT INTO referrals_search(referrals_search, rowid, referred_email)
+        VALUES ('delete', old.id, old.referred_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS referrals_search_au AFTER UPDATE OF referred_email ON referrals BEGIN
+        INSERT INTO referrals_search(referrals_search, rowid, referred_email)
+        VALUES ('delete', old.id, old.referred_email);
+        INSERT INTO referrals_search(rowid, referred_email) VALUES (new.id, new.referred_email);
+    END""",
+    "INSERT INTO referrals_search(referrals_search) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS users_search_ai",
+    "DROP TRIGGER IF EXISTS users_search_ad",
+    "DROP TRIGGER IF EXISTS users_search_au",
+    "DROP TABLE IF EXISTS users_search",
+    "DROP TRIGGER IF EXISTS referrals_search_ai",
+    "DROP TRIGGER IF EXISTS referrals_search_ad",
+    "DROP TRIGGER IF EXISTS referrals_search_au",
+    "DROP TABLE IF EXISTS referrals_search",
+)
+
+# ILIKE '%term%' can use these on PostgreSQL
+POSTGRES_TRGM_INDEXES = {
+    'ix_users_name_trgm': ('users', 'name'),
+    'ix_users_email_trgm': ('users', 'email'),
+    'ix_referrals_referred_email_trgm': ('referrals', 'referred_email'),
+}
+
+
+def _has_pg_trgm(bind):
+    return bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).first() is not None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql' and _has_pg_trgm(bind):
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, (table, column) in POSTGRES_TRGM_INDEXES.items():
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        for name in POSTGRES_TRGM_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
@@ -8,26 +8,50 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    password = db.Column(db.String(100), nullable=False)
+    password = db.Column(db.String(255), nullable=False)  # werkzeug hashes are ~160 chars
     referral_code = db.Column(db.String(10), unique=True, nullable=False)
     referrals_count = db.Column(db.Integer, default=0)
     profile_picture = db.Column(db.String(255), default='')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    pass_token = db.Column(db.String(255), nullable=True, default=None)
+    pass_token = db.Column(db.String(255), nullable=True, default=None, index=True)
     referrals = db.relationship('Referral', backref='referrer', lazy=True)
     total_earned = db.Column(db.Float, nullable=False, default=0.0)
     total_points = db.Column(db.Float, nullable=False, default=0.0)
     last_trivia_attempt = db.Column(db.DateTime, nullable=True, default=None)
     withdrawals = db.relationship('Withdrawal', backref='user', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_users_referrals_count', 'referrals_count'),
+        db.Index('ix_users_total_earned', 'total_earned'),
+    )
+
 
 class Referral(db.Model):
     __tablename__ = 'referrals'
 
     id = db.Column(db.Integer, primary_key=True)
     referrer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    referred_email = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    referred_email = db.Column(db.String(100), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_referrals_referrer_id_created_at', 'referrer_id', 'created_at'),
+    )
+
+
+class ReferralPeriodCount(db.Model):
+    """Referrals per referrer per US/Eastern day/week, kept in step with `referrals`."""
+    __tablename__ = 'referral_period_counts'
+
+    period_type = db.Column(db.String(10), primary_key=True)  # 'daily' or 'weekly'
+    period_start = db.Column(db.DateTime, primary_key=True)  # US/Eastern midnight
+    referrer_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Ranking within a period: ORDER BY count DESC, referrer_id / COUNT(count > :score)
+        db.Index('ix_referral_period_counts_ranking', period_type, period_start, count.desc(), referrer_id),
+    )
 
 
 class Winner(db.Model):
@@ -39,6 +63,10 @@ class Winner(db.Model):
     type = db.Column(db.String(50), nullable=False)
     amount = db.Column(db.Float, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_winners_type_date', 'type', 'date'),
+    )
+
 
 class Admin(db.Model):
     __tablename__ = 'admins'
@@ -46,7 +74,7 @@ class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), unique=True, nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    password = db.Column(db.String(128), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Withdrawal(db.Model):
@@ -65,4 +93,67 @@ class Withdrawal(db.Model):
     # Optional: Track updates automatically
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    
\ No newline at end of file
+    __table_args__ = (
+        db.Index('ix_withdrawals_status_created_at', 'status', 'created_at'),
+        db.Index('ix_withdrawals_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_withdrawals_created_at', 'created_at'),
+    )
+
+
+class EmailOutbox(db.Model):
+    """Emails waiting to be delivered by the email_outbox worker pool."""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # 'welcome', 'password_reset', 'winner'
+    recipient = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON arguments for the message builder
+    dedupe_key = db.Column(db.String(255), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'dead'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+
+class AdminStatsSnapshot(db.Model):
+    """
+    Single-row materialization of the admin dashboard/stats aggregates.
+    Rebuilt on a schedule; the counters are also bumped from buffered domain
+    event deltas of the same generation.
+    """
+    __tablename__ = 'admin_stats_snapshot'
+
+    id = db.Column(db.Integer, primary_key=True)  # always 1
+    total_users = db.Column(db.Integer, nullable=False, default=0)
+    total_referrals = db.Column(db.Integer, nullable=False, default=0)
+    total_winners = db.Column(db.Integer, nullable=False, default=0)
+    total_earned = db.Column(db.Float, nullable=False, default=0.0)
+    top_referrers = db.Column(db.Text, nullable=False, default='[]')  # JSON
+    top_earners = db.Column(db.Text, nullable=False, default='[]')  # JSON
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # last full rebuild
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # last change of any kind
+    generation = db.Column(db.Integer, nullable=False, default=0)  # bumped by every rebuild
+
+
+class IdempotencyKey(db.Model):
+    """Stored response for a client's Idempotency-Key, replayed on retries until it expires."""
+    __tablename__ = 'idempotency_keys'
+
+    key = db.Column(db.String(255), primary_key=True)  # '<endpoint>:<header value>'
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # 'in_progress', 'done'
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
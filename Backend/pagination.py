@@ -0,0 +1,114 @@
+"""
+Cursor (keyset) pagination for the admin list endpoints.
+
+`query.paginate()` runs OFFSET/LIMIT plus a COUNT(*) for every page, so deep
+pages get slower and rows shift between pages while users sign up. Here a
+page is instead "the next `limit` rows after (sort key, id)", which is an
+index range scan however deep the admin pages, and stays stable under
+concurrent inserts.
+
+Clients opt in with `cursor`: pass an empty `cursor=` for the first page,
+then the opaque `next_cursor` / `prev_cursor` from each response. `total` is
+only computed when `with_total=1` is passed, and then comes from a short-lived
+shared cache. Without `cursor` the old `page`/`limit` behaviour (exact total
+and pages) is unchanged.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import request
+
+from caching import get_or_compute
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 500
+TOTAL_TTL = 30  # seconds a cursor-mode total may be reused
+
+
+class InvalidCursor(ValueError):
+    """The `cursor` parameter was not produced by this module."""
+
+
+def _encode_cursor(direction, values):
+    raw = json.dumps([direction] + [
+        value.isoformat() if isinstance(value, datetime) else value for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, *values = json.loads(raw)
+        if direction not in ('n', 'p') or len(values) != len(columns):
+            raise ValueError(cursor)
+        return direction, [
+            datetime.fromisoformat(value) if isinstance(column.type, sa.DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def _cached_total(query):
+    statement = query.order_by(None).statement.compile()
+    digest = hashlib.sha1(
+        (str(statement) + repr(sorted(statement.params.items()))).encode()
+    ).hexdigest()
+    return get_or_compute(f'admin_total:{digest}', query.order_by(None).count, ttl=TOTAL_TTL)
+
+
+def paginate(query, *columns, descending=False):
+    """
+    Page through `query` ordered by `columns`, the last of which must be unique
+    (normally the primary key). Reads `cursor`, `page`, `limit` and
+    `with_total` from the request.
+
+    :return: (items, meta) where meta holds the pagination keys for the response.
+    """
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    cursor = request.args.get('cursor')
+    if cursor is None:
+        order = [column.desc() if descending else column.asc() for column in columns]
+        pagination = query.order_by(*order).paginate(
+            page=request.args.get('page', 1, type=int), per_page=limit, error_out=False
+        )
+        return pagination.items, {
+            "total": pagination.total,
+            "pages": pagination.pages,
+            "current_page": pagination.page
+        }
+
+    limit = min(max(limit, 1), MAX_LIMIT)
+    direction, values = _decode_cursor(cursor, columns) if cursor else ('n', None)
+    # Walking backwards means flipping the order, then reversing the page
+    reverse = descending != (direction == 'p')
+    keyed = query.order_by(None).order_by(
+        *[column.desc() if reverse else column.asc() for column in columns]
+    )
+    if values is not None:
+        row = sa.tuple_(*columns)
+        keyed = keyed.filter(row < tuple(values) if reverse else row > tuple(values))
+
+    items = keyed.limit(limit + 1).all()
+    more = len(items) > limit
+    items = items[:limit]
+    if direction == 'p':
+        items.reverse()
+
+    def key(item):
+        return [getattr(item, column.key) for column in columns]
+
+    has_next = more if direction == 'n' else values is not None
+    has_prev = values is not None if direction == 'n' else more
+    meta = {
+        "next_cursor": _encode_cursor('n', key(items[-1])) if items and has_next else None,
+        "prev_cursor": _encode_cursor('p', key(items[0])) if items and has_prev else None,
+        "limit": limit,
+        "total": _cached_total(query) if request.args.get('with_total') in ('1', 'true') else None
+    }
+    return items, meta
@@ -1,16 +1,8 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from mailer import build_message, deliver
 
-# Configuration
-SENDER_EMAIL = "hi@playchike.com"
-PASSWORD = "#cab466GOES601#"
-SMTP_SERVER = "mail.playchike.com"
-SMTP_PORT = 465  # Use 465 for SSL
-
-def send_password_reset_email(receiver_email, name, password_token):
+def build_password_reset_message(receiver_email, name, password_token):
     """
-    Sends a plain-text email with a link to reset the password using a password token.
+    Builds the plain-text email with a link to reset the password using a password token.
 
     Args:
         receiver_email (str): Recipient's email address.
@@ -44,27 +36,21 @@ The Playchike.com Team
 """
 
     # Create a multipart message
-    message = MIMEMultipart("alternative")
-    message["From"] = SENDER_EMAIL
-    message["To"] = receiver_email
-    message["Subject"] = subject
+    return build_message(receiver_email, subject, plain_text_message, "plain")
 
-    # Attach the plain-text content
-    message.attach(MIMEText(plain_text_message, "plain"))
-
-    try:
-        # Connect to the SMTP server over SSL
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
 
-            # Optional: Enable debug output for troubleshooting
-            # server.set_debuglevel(1)
-
-            # Log in to the SMTP server
-            server.login(SENDER_EMAIL, PASSWORD)
-
-            # Send the email
-            server.send_message(message)
+def send_password_reset_email(receiver_email, name, password_token):
+    """
+    Sends the password reset email immediately. Request handlers should
+    enqueue it through email_outbox instead.
 
+    Args:
+        receiver_email (str): Recipient's email address.
+        name (str): Recipient's name.
+        password_token (str): Unique password reset token.
+    """
+    try:
+        deliver(build_password_reset_message(receiver_email, name, password_token))
         print(f"Password reset email sent successfully to {receiver_email}")
 
     except Exception as e:
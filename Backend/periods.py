@@ -0,0 +1,87 @@
+"""
+US/Eastern day and week (Sunday to Sunday) boundaries.
+
+Every leaderboard, rank, winner and cache key agrees on what "today" and
+"this week" are by going through this module. A `Period` carries its
+boundaries in both forms the code needs:
+
+  - `start` / `end`: naive US/Eastern midnights. `start` is the key stored in
+    referral_period_counts.period_start (and Winner dates are derived from it).
+  - `start_utc` / `end_utc`: the same instants as naive UTC, for comparing
+    with the UTC `created_at` columns.
+  - `id`: e.g. 'daily:2026-01-04', for cache keys.
+
+`current()` keeps the current day and week and only recomputes them once the
+boundary has passed, so hot paths pay one utcnow() instead of a timezone
+conversion. `period_of()` maps a UTC timestamp to its period; US/Eastern
+offsets only change on the hour, so results are memoized per UTC hour.
+"""
+
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+import pytz
+
+EASTERN = pytz.timezone('US/Eastern')
+PERIOD_TYPES = ('daily', 'weekly')
+
+Period = namedtuple('Period', 'type start end start_utc end_utc id')
+
+_current = {}
+
+
+def _to_utc(local_midnight):
+    # Midnight is never skipped or repeated by US/Eastern DST changes (2am)
+    return EASTERN.localize(local_midnight).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def _period_at(period_type, local):
+    """The period containing the aware US/Eastern datetime `local`."""
+    if period_type not in PERIOD_TYPES:
+        raise ValueError(f"Unknown period type: {period_type}")
+    day = local.date()
+    if period_type == 'weekly':
+        day -= timedelta(days=(local.weekday() + 1) % 7)  # back to Sunday
+    start = datetime.combine(day, time())
+    end = start + timedelta(days=7 if period_type == 'weekly' else 1)
+    return Period(period_type, start, end, _to_utc(start), _to_utc(end), f'{period_type}:{day:%Y-%m-%d}')
+
+
+@lru_cache(maxsize=4096)
+def _period_for_hour(period_type, hour):
+    return _period_at(period_type, pytz.utc.localize(hour).astimezone(EASTERN))
+
+
+def now_eastern():
+    """The current time as an aware US/Eastern datetime."""
+    return datetime.now(EASTERN)
+
+
+def current(period_type):
+    """The current day or week, cached until it ends."""
+    period = _current.get(period_type)
+    if period is None or datetime.utcnow() >= period.end_utc:
+        period = _current[period_type] = _period_at(period_type, now_eastern())
+    return period
+
+
+def period_of(period_type, moment=None):
+    """
+    The day or week containing `moment`.
+
+    :param moment: Naive UTC datetime (e.g. Referral.created_at); defaults to now.
+    """
+    if moment is None:
+        return current(period_type)
+    return _period_for_hour(period_type, moment.replace(minute=0, second=0, microsecond=0))
+
+
+def start_of(period_type, moment=None):
+    """Naive US/Eastern midnight starting the period: the referral_period_counts key."""
+    return period_of(period_type, moment).start
+
+
+def seconds_until_end(period_type):
+    """Seconds from now until the current day or week rolls over."""
+    return max(0.0, (current(period_type).end_utc - datetime.utcnow()).total_seconds())
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+
+from caching import get_or_compute, invalidate
+from events import referral_created, referral_deleted, user_points_changed, user_updated
+from extensions import db
+from models import User, ReferralPeriodCount
+from periods import current
+
+# Ranks also move when *other* users refer, so keep the TTL short
+PROFILE_TTL = 15
+
+RANK_KEYS = ('daily_referrals', 'weekly_referrals', 'daily_rank', 'weekly_rank', 'total_rank')
+
+
+def _period_score(user_id, period_type, period_start):
+    """Scalar subquery: the user's referral count for the period (0 if none)."""
+    return db.func.coalesce(
+        db.select(ReferralPeriodCount.count)
+        .where(
+            ReferralPeriodCount.period_type == period_type,
+            ReferralPeriodCount.period_start == period_start,
+            ReferralPeriodCount.referrer_id == user_id
+        )
+        .scalar_subquery(),
+        0
+    )
+
+
+def _rank_above(period_type, period_start, score):
+    """
+    Scalar subquery: how many referrers have a higher score in the period.
+    Rollup rows of deleted users are left behind, so only existing users count.
+    """
+    return (
+        db.select(db.func.count())
+        .select_from(ReferralPeriodCount)
+        .join(User, User.id == ReferralPeriodCount.referrer_id)
+        .where(
+            ReferralPeriodCount.period_type == period_type,
+            ReferralPeriodCount.period_start == period_start,
+            ReferralPeriodCount.count > score
+        )
+        .scalar_subquery()
+    )
+
+
+def profile_query(user_id, start_of_day, start_of_week):
+    """
+    One SELECT for everything the profile shows: the user's columns, their
+    daily/weekly referral counts and their daily, weekly and all-time ranks.
+
+    CTEs read the user row (`me`) and the two period scores (`scores`, primary
+    key lookups) once; the rank subqueries then compare against those instead
+    of re-evaluating them. A rank is 1 plus the number of referrers with a
+    strictly higher score, counted on the ranking indexes, so the cost grows
+    with the number of active referrers rather than hydrating ranked rows.
+    Returns no row if the user does not exist.
+    """
+    me = (
+        db.select(
+            User.id, User.name, User.email, User.referral_code, User.referrals_count,
+            User.total_earned, User.total_points, User.last_trivia_attempt
+        )
+        .where(User.id == user_id)
+        .cte('me')
+    )
+    scores = db.select(
+        _period_score(user_id, 'daily', start_of_day).label('daily'),
+        _period_score(user_id, 'weekly', start_of_week).label('weekly'),
+    ).cte('scores')
+    total_above = (
+        db.select(db.func.count(User.id))
+        .where(User.referrals_count > me.c.referrals_count)
+        .scalar_subquery()
+    )
+    return (
+        db.select(
+            me,
+            scores.c.daily,
+            scores.c.weekly,
+            _rank_above('daily', start_of_day, scores.c.daily).label('daily_above'),
+            _rank_above('weekly', start_of_week, scores.c.weekly).label('weekly_above'),
+            total_above.label('total_above'),
+        )
+        .select_from(me)
+        .join(scores, db.true())
+    )
+
+
+def get_profile_figures(user_id, start_of_day, start_of_week):
+    """
+    The user's profile columns plus RANK_KEYS as a dict, in a single
+    statement (see profile_query); None if the user does not exist.
+    Daily/weekly ranks are None when the user has no referrals in that period
+    (they are not on that leaderboard).
+    """
+    row = db.session.execute(profile_query(user_id, start_of_day, start_of_week)).first()
+    if row is None:
+        return None
+    figures = {
+        key: value for key, value in row._mapping.items()
+        if key not in ('daily', 'weekly', 'daily_above', 'weekly_above', 'total_above')
+    }
+    figures.update(
+        daily_referrals=row.daily,
+        weekly_referrals=row.weekly,
+        daily_rank=row.daily_above + 1 if row.daily else None,
+        weekly_rank=row.weekly_above + 1 if row.weekly else None,
+        total_rank=row.total_above + 1,
+    )
+    return figures
+
+
+def get_user_ranks(user_id, start_of_day, start_of_week):
+    """Just the RANK_KEYS of get_profile_figures; None if the user does not exist."""
+    figures = get_profile_figures(user_id, start_of_day, start_of_week)
+    return {key: figures[key] for key in RANK_KEYS} if figures else None
+
+
+def profile_key(user_id):
+    """Memo key for the user's figures in the current day and week."""
+    return f"profile:{user_id}:{current('daily').id}:{current('weekly').id}"
+
+
+def get_cached_profile_figures(user_id):
+    """
+    get_profile_figures for the current periods, memoized per user in the
+    per-process LRU and the shared cache (see caching.py). The user's own
+    referrals, points and edits drop the entry; other users' referrals move
+    ranks within PROFILE_TTL. Expired entries are never served stale, so a
+    rank is at most PROFILE_TTL old.
+    """
+    key = profile_key(user_id)
+    figures = get_or_compute(
+        key, lambda: get_profile_figures(user_id, current('daily').start, current('weekly').start),
+        ttl=PROFILE_TTL, stale_ttl=0
+    )
+    if figures is None:
+        invalidate(key)  # don't remember a user who may be about to sign up
+    return figures
+
+
+def trivia_minutes_left(last_trivia_attempt, now=None):
+    """Minutes until a user who last played at `last_trivia_attempt` may play again (0 = now)."""
+    now = now or datetime.utcnow()
+    if last_trivia_attempt and now - last_trivia_attempt < timedelta(minutes=1):
+        remaining_time = timedelta(hours=1) - (now - last_trivia_attempt)
+        return remaining_time.total_seconds() // 60
+    return 0
+
+
+def build_profile(figures, now=None):
+    """The /profile/profile payload from get_profile_figures."""
+    return {
+        'id': figures['id'],
+        'name': figures['name'],
+        'email': figures['email'],
+        'totalReferrals': figures['referrals_count'],
+        'dailyReferrals': figures['daily_referrals'],
+        'weeklyReferrals': figures['weekly_referrals'],
+        'totalRank': figures['total_rank'],
+        'dailyRank': figures['daily_rank'] or "N/A",
+        'weeklyRank': figures['weekly_rank'] or "N/A",
+        'remainingTriviaTime': trivia_minutes_left(figures['last_trivia_attempt'], now),
+        'referralLink': f"https://playchike.com/signup?ref={figures['referral_code']}",
+        'total_earned' : figures['total_earned'],
+        'total_points' : figures['total_points'],
+    }
+
+
+@referral_created.connect
+@referral_deleted.connect
+def _invalidate_referrer_profile(sender, referrer_id, **_):
+    invalidate(profile_key(referrer_id))
+
+
+@user_updated.connect
+@user_points_changed.connect
+def _invalidate_user_profile(sender, user_id, **_):
+    invalidate(profile_key(user_id))
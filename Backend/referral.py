@@ -1,4 +1,5 @@
-from models import db, User
+from models import db
+from counters import increment_user
 
 import random
 import string
@@ -7,8 +8,6 @@ def generate_referral_code(length=8):
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
 def increment_referrals_count(referrer_id):
-    referrer = User.query.filter_by(id=referrer_id).first()
-    if referrer:
-        referrer.referrals_count += 1
+    if increment_user(referrer_id, referrals_count=1):
         db.session.commit()
     
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+In-memory daily/weekly leaderboards.
+
+Each period keeps its scores in a SortedList ordered by (-score, user_id), so
+an increment, a rank lookup and a top-N/around-me slice are all O(log n)
+without touching the referrals table. A rank is always the user's position in
+that order (ties broken by id, as in the SQL leaderboards), so `rank_of`,
+`top` and `around` agree with each other. The engine is rebuilt from the database
+on startup and then tails new referrals by primary key, which also picks up
+referrals inserted by other worker processes.
+
+Only that tail advances the high-water mark (`last_referral_id`). Referrals
+this process applied early from a `referral_created` event are remembered
+in `applied` and skipped when the tail reaches them. Otherwise a lower id
+committed by another worker would fall behind the mark and never be counted.
+Reads also compare the boards with the rollup every VERIFY_INTERVAL, so any
+drift is repaired even where no scheduler runs (e.g. under Passenger).
+"""
+
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+from events import referral_created, referral_deleted, user_updated
+from extensions import db
+from models import User, Referral, ReferralPeriodCount
+from periods import PERIOD_TYPES, current, start_of
+
+# How often (seconds) reads pull referrals written by other processes
+SYNC_INTERVAL = 5
+# How often (seconds) reads check the boards against the rollup
+VERIFY_INTERVAL = 600
+# Event-applied ids remembered before a sync is forced to catch up
+MAX_APPLIED = 1000
+
+
+class PeriodBoard:
+    """Scores for a single leaderboard period (one day or one week)."""
+
+    def __init__(self, period_start):
+        self.period_start = period_start
+        self.scores = {}
+        self.order = SortedList()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def increment(self, user_id, delta=1):
+        old = self.scores.get(user_id, 0)
+        new = old + delta
+        if old:
+            self.order.remove((-old, user_id))
+        if new > 0:
+            self.scores[user_id] = new
+            self.order.add((-new, user_id))
+        else:
+            self.scores.pop(user_id, None)
+
+    def score_of(self, user_id):
+        return self.scores.get(user_id, 0)
+
+    def rank_of(self, user_id):
+        """The user's 1-based position on the board, or None if absent."""
+        score = self.scores.get(user_id)
+        if not score:
+            return None
+        return self.order.index((-score, user_id)) + 1
+
+    def top(self, n=None):
+        entries = self.order if n is None else self.order[:n]
+        return [(user_id, -neg_score) for neg_score, user_id in entries]
+
+    def around(self, user_id, radius=3):
+        """Entries within `radius` positions of the user, as (position, user_id, score)."""
+        score = self.scores.get(user_id)
+        if not score:
+            return []
+        index = self.order.index((-score, user_id))
+        lo = max(0, index - radius)
+        return [
+            (lo + offset + 1, uid, -neg_score)
+            for offset, (neg_score, uid) in enumerate(self.order[lo:index + radius + 1])
+        ]
+
+
+class LeaderboardEngine:
+    """Daily and weekly PeriodBoards plus the display data needed to render them."""
+
+    PERIODS = PERIOD_TYPES
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.boards = {}
+        self.profiles = {}
+        self.version = 0  # bumped on every change to a board
+        self.last_referral_id = 0
+        self.applied = set()
+        self.last_sync = 0.0
+        self.last_verify = 0.0
+
+    # ---------- Loading ----------
+
+    def rebuild(self):
+        """Reload every period from the database."""
+        with self._lock:
+            self.boards = {}
+            self.profiles = {}
+            for period in self.PERIODS:
+                start = current(period).start
+                board = PeriodBoard(start)
+                for user_id, name, picture, score in self._period_scores(period, start):
+                    board.increment(user_id, score)
+                    self.profiles[user_id] = (name, picture)
+                self.boards[period] = board
+            self.last_referral_id = db.session.query(db.func.max(Referral.id)).scalar() or 0
+            self.applied = set()
+            self.version += 1
+            self.last_sync = self.last_verify = time.monotonic()
+
+    @staticmethod
+    def _period_scores(period, start):
+        return (
+            db.session.query(
+                User.id, User.name, User.profile_picture, ReferralPeriodCount.count
+            )
+            .join(ReferralPeriodCount, User.id == ReferralPeriodCount.referrer_id)
+            .filter(
+                ReferralPeriodCount.period_type == period,
+                ReferralPeriodCount.period_start == start,
+                ReferralPeriodCount.count > 0
+            )
+            .all()
+        )
+
+    def sync(self, force=False):
+        """Apply referrals inserted since the last seen id (by any process)."""
+        with self._lock:
+            if not self.boards:
+                self.rebuild()
+                return
+            if not force and time.monotonic() - self.last_sync < SYNC_INTERVAL:
+                return
+            rows = (
+                db.session.query(
+                    Referral.id, Referral.referrer_id, Referral.created_at,
+                    User.name, User.profile_picture
+                )
+                .join(User, User.id == Referral.referrer_id)
+                .filter(Referral.id > self.last_referral_id)
+                .order_by(Referral.id)
+                .all()
+            )
+            for referral_id, user_id, created_at, name, picture in rows:
+                if referral_id in self.applied:
+                    self.applied.discard(referral_id)  # already counted from its event
+                else:
+                    self._apply(user_id, created_at, name, picture)
+            if rows:
+                self.last_referral_id = rows[-1][0]
+            self.applied = {i for i in self.applied if i > self.last_referral_id}
+            self.last_sync = time.monotonic()
+
+    # ---------- Writes ----------
+
+    def record_referral(self, user_id, created_at, referral_id=None, name=None, picture=None):
+        """
+        Count one referral towards every period it falls in, ahead of the next
+        sync. The id is remembered so the sync does not count it twice.
+        """
+        with self._lock:
+            if not self.boards:
+                return
+            if referral_id is not None:
+                if referral_id <= self.last_referral_id or referral_id in self.applied:
+                    return
+                self.applied.add(referral_id)
+            self._apply(user_id, created_at, name, picture)
+            if len(self.applied) > MAX_APPLIED:
+                self.sync(force=True)
+
+    def _apply(self, user_id, created_at, name=None, picture=None):
+        """Add the referral to the current boards; the caller holds the lock."""
+        self._rollover()
+        for period, board in self.boards.items():
+            if start_of(period, created_at) == board.period_start:
+                board.increment(user_id)
+                self.version += 1
+        if name is not None:
+            self.profiles[user_id] = (name, picture)
+
+    def remove_referral(self, user_id, created_at):
+        """Undo one referral (e.g. deleted by an admin) in the periods it counted for."""
+        with self._lock:
+            if not self.boards:
+                return
+            self._rollover()
+            for period, board in self.boards.items():
+                if start_of(period, created_at) == board.period_start:
+                    board.increment(user_id, -1)
+                    self.version += 1
+
+    def update_user(self, user_id, name=None, picture=None, deleted=False):
+        """Refresh a user's display data, or drop them from every board."""
+        with self._lock:
+            if deleted:
+                for board in self.boards.values():
+                    board.increment(user_id, -board.score_of(user_id))
+                self.profiles.pop(user_id, None)
+                self.version += 1
+            elif name is not None:
+                self.profiles[user_id] = (name, picture)
+
+    def _rollover(self):
+        """Start a fresh board when the US/Eastern day or week has changed."""
+        for period in self.PERIODS:
+            start = current(period).start
+            if self.boards[period].period_start != start:
+                self.boards[period] = PeriodBoard(start)
+                self.version += 1
+
+    # ---------- Reads ----------
+
+    def _board(self, period):
+        if not self.boards:
+            self.rebuild()  # not warmed at startup (the schema was still being migrated)
+        self.sync()
+        if time.monotonic() - self.last_verify >= VERIFY_INTERVAL:
+            self.verify()
+        with self._lock:
+            self._rollover()
+            return self.boards[period]
+
+    def _entry(self, rank, user_id, score):
+        name, picture = self.profiles.get(user_id, ('', ''))
+        return {
+            "rank": rank,
+            "name": name,
+            "profilePicture": picture,
+            "score": score
+        }
+
+    def leaderboard(self, period, limit=None):
+        """Top `limit` entries (all by default) in the get_*_leaderboard format."""
+        board = self._board(period)
+        with self._lock:
+            return [
+                self._entry(index + 1, user_id, score)
+                for index, (user_id, score) in enumerate(board.top(limit))
+            ]
+
+    def rank_of(self, period, user_id):
+        board = self._board(period)
+        with self._lock:
+            return board.rank_of(user_id), board.score_of(user_id)
+
+    def around(self, period, user_id, radius=3):
+        board = self._board(period)
+        with self._lock:
+            return [
+                self._entry(rank, uid, score)
+                for rank, uid, score in board.around(user_id, radius)
+            ]
+
+    # ---------- Consistency ----------
+
+    def verify(self, repair=True):
+        """
+        Compare every period against the referral_period_counts rollup.
+        Returns {period: [(user_id, memory_score, db_score), ...]} for mismatches
+        and rebuilds the engine if any were found (unless repair=False).
+        """
+        self.sync(force=True)
+        mismatches = {}
+        with self._lock:
+            self.last_verify = time.monotonic()
+            for period, board in self.boards.items():
+                expected = {
+                    user_id: score
+                    for user_id, _, _, score in self._period_scores(period, board.period_start)
+                }
+                diff = [
+                    (user_id, board.score_of(user_id), expected.get(user_id, 0))
+                    for user_id in set(expected) | set(board.scores)
+                    if board.score_of(user_id) != expected.get(user_id, 0)
+                ]
+                if diff:
+                    mismatches[period] = diff
+            if mismatches and repair:
+                print(f"Leaderboard drift detected, rebuilding: {mismatches}")
+                self.rebuild()
+        return mismatches
+
+
+leaderboard_engine = LeaderboardEngine()
+
+
+@referral_created.connect
+def _on_referral_created(sender, referrer_id, referral_id, created_at, name=None, profile_picture=None, **_):
+    leaderboard_engine.record_referral(referrer_id, created_at, referral_id, name, profile_picture)
+
+
+@referral_deleted.connect
+def _on_referral_deleted(sender, referrer_id, created_at, **_):
+    leaderboard_engine.remove_referral(referrer_id, created_at)
+
+
+@user_updated.connect
+def _on_user_updated(sender, user_id, name=None, profile_picture=None, deleted=False, **_):
+    leaderboard_engine.update_user(user_id, name, profile_picture, deleted)
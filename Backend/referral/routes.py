@@ -1,8 +1,22 @@
-from flask import Blueprint, request, jsonify, render_template
-from extensions import db, cache
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
+from extensions import db
 from models import User, Referral
-from referral.utils import increment_referrals_count
-from referral.utils import get_daily_leaderboard, get_weekly_leaderboard
+from referral.utils import record_period_referral
+from referral.leaderboard import leaderboard_engine
+from referral.stream import LeaderboardHub, STREAM_TOP
+from caching import get_or_compute, invalidate
+from http_cache import encode_json, json_response
+from counters import increment_user
+from db_config import run_write
+from db_routing import read_only
+import periods
+from events import publish, referral_created, referral_deleted, user_updated
+
+# Shared-cache freshness (seconds) for leaderboard payloads
+LEADERBOARD_TTL = 10
+LEADERBOARD_STALE_TTL = 120
 
 referral_bp = Blueprint('referral', __name__)
 
@@ -32,27 +46,59 @@ def process_referral(data):
     if existing_referral:
         return jsonify({'error': 'This email has already been referred'}), 400
 
+    referrer_id = referrer.id
+    referral_id, created_at = run_write(insert_referral, referrer_id, referred_email)
+
+    publish(
+        referral_created,
+        referrer_id=referrer_id,
+        referral_id=referral_id,
+        created_at=created_at,
+        name=referrer.name,
+        profile_picture=referrer.profile_picture
+    )
+
+    return jsonify({'message': 'Referral processed successfully'}), 200
+
+
+def insert_referral(referrer_id, referred_email):
+    """Write half of process_referral; runs inside run_write. Returns (id, created_at)."""
     # Add a referral record
-    referral = Referral(referrer_id=referrer.id, referred_email=referred_email)
+    referral = Referral(referrer_id=referrer_id, referred_email=referred_email)
     db.session.add(referral)
 
-    # Increment the referrer’s referral count
-    referrer.referrals_count += 1
-    db.session.add(referrer)
-    db.session.commit()
+    # Count it towards today's and this week's rollup in the same transaction
+    record_period_referral(referrer_id)
 
-    return jsonify({'message': 'Referral processed successfully'}), 200
+    # Increment the referrer’s referral count in SQL so concurrent signups can't lose one
+    increment_user(referrer_id, referrals_count=1)
+    db.session.flush()
+    return referral.id, referral.created_at
 
 
 
-@referral_bp.route('/leaderboard', methods=['GET'])
-def get_leaderboard():
-    """Fetches and returns the leaderboard data as JSON."""
-    # Fetch top 7 users by referrals_count in descending order
-    users = User.query.order_by(User.referrals_count.desc()).limit(7).all()
+def leaderboard_cache_key(period):
+    """Shared cache key for a period's leaderboard, scoped to the current day or week."""
+    if period == 'all_time':
+        return 'leaderboard:all_time'
+    return f"leaderboard:{periods.current(period).id}"
+
+
+@referral_created.connect
+@referral_deleted.connect
+@user_updated.connect
+def invalidate_leaderboards(sender, **payload):
+    """Any referral or leaderboard-visible user change makes the cached boards stale."""
+    invalidate(*(leaderboard_cache_key(period) for period in ('all_time', 'daily', 'weekly')))
+    leaderboard_hub.notify()
+
+
+def build_all_time_leaderboard():
+    """Top 7 users by referrals_count in descending order (ties by id, so the ETag is stable)."""
+    users = User.query.order_by(User.referrals_count.desc(), User.id).limit(7).all()
 
     # Format the leaderboard data
-    leaderboard = [
+    return [
         {
             "rank": index + 1,
             "name": user.name,
@@ -61,24 +107,105 @@ def get_leaderboard():
         }
         for index, user in enumerate(users)
     ]
-    return jsonify(leaderboard)
 
-from extensions import cache
+
+# Pushes live board updates to /leaderboard/stream clients (see referral/stream.py)
+leaderboard_hub = LeaderboardHub({
+    'all_time': build_all_time_leaderboard,
+    'daily': lambda: leaderboard_engine.leaderboard('daily', STREAM_TOP),
+    'weekly': lambda: leaderboard_engine.leaderboard('weekly', STREAM_TOP),
+})
+
+
+LEADERBOARD_BUILDERS = {
+    'all_time': build_all_time_leaderboard,
+    'daily': lambda: leaderboard_engine.leaderboard('daily'),
+    'weekly': lambda: leaderboard_engine.leaderboard('weekly'),
+}
+
+
+def get_encoded_leaderboard(period):
+    """A period's leaderboard as cached, pre-encoded bytes (see http_cache.py)."""
+    return get_or_compute(
+        leaderboard_cache_key(period), lambda: encode_json(LEADERBOARD_BUILDERS[period]()),
+        ttl=LEADERBOARD_TTL, stale_ttl=LEADERBOARD_STALE_TTL
+    )
+
+
+def leaderboard_response(period):
+    """
+    Serve a leaderboard from its cached, pre-encoded bytes.
+
+    Clients are told to come back when the shared entry goes stale, or at the
+    period rollover if that is sooner, and get a 304 if nothing changed.
+    """
+    encoded = get_encoded_leaderboard(period)
+    max_age = encoded['built_at'] + LEADERBOARD_TTL - time.time()
+    if period != 'all_time':
+        max_age = min(max_age, periods.seconds_until_end(period))
+    return json_response(encoded, max_age)
+
+
+@referral_bp.route('/leaderboard', methods=['GET'])
+@read_only
+def get_leaderboard():
+    """Fetches and returns the leaderboard data as JSON."""
+    return leaderboard_response('all_time')
 
 @referral_bp.route('/leaderboard/daily', methods=['GET'])
+@read_only
 def daily_leaderboard():
-    """Fetch the cached daily leaderboard."""
-    leaderboard = cache.get('daily_leaderboard')
-    if leaderboard is None:
-        leaderboard = get_daily_leaderboard()  # Fallback if cache is empty
-        cache.set('daily_leaderboard', leaderboard, timeout=86400)
-    return jsonify(leaderboard)
+    """Fetch the daily leaderboard (shared cache in front of the in-memory engine)."""
+    return leaderboard_response('daily')
 
 @referral_bp.route('/leaderboard/weekly', methods=['GET'])
+@read_only
 def weekly_leaderboard():
-    """Fetch the cached weekly leaderboard."""
-    leaderboard = cache.get('weekly_leaderboard')
-    if leaderboard is None:
-        leaderboard = get_weekly_leaderboard()  # Fallback if cache is empty
-        cache.set('weekly_leaderboard', leaderboard, timeout=604800)
-    return jsonify(leaderboard)
+    """Fetch the weekly leaderboard (shared cache in front of the in-memory engine)."""
+    return leaderboard_response('weekly')
+
+@referral_bp.route('/leaderboard/stream', methods=['GET'])
+def leaderboard_stream():
+    """
+    Server-Sent Events stream of leaderboard snapshots and diffs; off unless
+    LEADERBOARD_STREAMS is set (see referral/stream.py).
+    Query params: periods (comma-separated, default all_time,daily,weekly),
+    user_id (optional; adds that user's rank events).
+    """
+    limit = current_app.config.get('LEADERBOARD_STREAMS', 0)
+    if not limit:
+        return jsonify({'error': 'Live leaderboard stream is disabled; poll the leaderboard instead'}), 404
+
+    selected = request.args.get('periods', ','.join(leaderboard_hub.builders)).split(',')
+    if not selected or any(period not in leaderboard_hub.builders for period in selected):
+        return jsonify({'error': 'Unknown leaderboard period'}), 400
+
+    subscription = leaderboard_hub.subscribe(selected, request.args.get('user_id', type=int), limit)
+    if subscription is None:
+        return jsonify({'error': 'Too many live connections; poll the leaderboard instead'}), 503, {'Retry-After': '30'}
+    return Response(leaderboard_hub.stream(*subscription), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # proxies must not hold events back
+    })
+
+@referral_bp.route('/leaderboard/<period>/around', methods=['GET'])
+@read_only(user_id=lambda: request.args.get('user_id', type=int))
+def leaderboard_around(period):
+    """
+    Returns the user's rank and the entries just above and below them.
+    Query params: user_id (required), radius (default 3).
+    """
+    if period not in leaderboard_engine.PERIODS:
+        return jsonify({'error': 'Unknown leaderboard period'}), 404
+
+    user_id = request.args.get('user_id', type=int)
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    radius = min(request.args.get('radius', 3, type=int), 50)
+
+    rank, score = leaderboard_engine.rank_of(period, user_id)
+    return jsonify({
+        'rank': rank or "N/A",
+        'score': score,
+        'entries': leaderboard_engine.around(period, user_id, radius)
+    })
@@ -0,0 +1,279 @@
+"""
+Live leaderboard updates over Server-Sent Events.
+
+Instead of every open page polling the leaderboard endpoints, clients hold
+one `GET /referral/leaderboard/stream` connection. A single background thread
+per process (the hub) rebuilds the boards when referrals land - woken by the
+events in events.py, and every SYNC_INTERVAL seconds to pick up referrals
+written by other processes - and, for each board that changed, encodes one
+diff event and hands the same bytes to every subscriber. Subscribers that
+passed `user_id` also get their own rank whenever it moves, including when
+they are ranked below the live top entries.
+
+Events (`data` is JSON):
+  - `snapshot` {"period", "entries"}: the whole board; sent on connect and
+    after a resync.
+  - `diff` {"period", "size", "changes"}: entries whose position changed
+    (each carries its rank); the board is then `size` entries long.
+  - `rank` {"period", "rank", "score"}: the subscriber's own standing.
+
+Each subscriber has a small bounded queue and the hub never waits on it. A
+client that falls MAX_PENDING events behind has its backlog dropped and gets
+a fresh snapshot when it next reads, so one slow connection costs neither the
+hub nor the other clients anything.
+
+Every open stream holds its request worker for as long as the client stays
+connected, and Passenger's Python workers serve one request at a time. The
+endpoint is therefore off unless LEADERBOARD_STREAMS is set, and at most that
+many streams are open across all processes sharing the cache backend. Each
+stream holds a slot in the shared cache. The slot is renewed while the stream
+is open, and expires SLOT_TTL seconds after a worker dies without closing
+it. Only enable streams on workers that can spare the connections, e.g. a
+separate pool of gevent workers behind the same cache.
+"""
+
+import queue
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from extensions import cache
+from referral.leaderboard import leaderboard_engine, SYNC_INTERVAL
+
+STREAM_TOP = 50  # entries per board kept live
+MAX_PENDING = 16  # events a subscriber may fall behind before it is resynced
+COALESCE_SECONDS = 0.5  # batch bursts of referrals into one update
+HEARTBEAT_SECONDS = 15  # keeps proxies from closing idle streams
+RETRY_MS = 3000  # client reconnect delay
+SLOT_TTL = 4 * HEARTBEAT_SECONDS  # seconds a dead worker's stream slot stays taken
+
+RESYNC = object()
+
+
+class Subscriber:
+    """One open stream: the periods it follows and its pending events."""
+
+    def __init__(self, periods, user_id=None, slot=None):
+        self.periods = tuple(periods)
+        self.user_id = user_id
+        self.slot = slot
+        self.ranks = {}
+        self.queue = queue.Queue(maxsize=MAX_PENDING)
+        self.lagging = False
+
+    def push(self, message):
+        """Queue an event without ever blocking. Called with the hub lock held."""
+        if self.lagging:
+            return  # a resync is already pending and will cover this
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Too far behind: drop what it hasn't read and resync it instead
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.lagging = True
+            self.queue.put_nowait(RESYNC)
+
+
+class LeaderboardHub:
+    """Computes leaderboard updates once per process and fans them out."""
+
+    def __init__(self, builders, top=STREAM_TOP):
+        """
+        :param builders: {period: zero-argument callable returning the board
+            entries}, called in an app context.
+        :param top: Entries per board kept live.
+        """
+        self.builders = builders
+        self.top = top
+        self.version = 0
+        self._engine_version = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._boards = {}
+        self._snapshots = {}
+        self._thread = None
+        self._app = None
+
+    def notify(self):
+        """A referral or user change happened; refresh soon."""
+        self._wake.set()
+
+    def clear(self):
+        """Forget the current boards (they are rebuilt on the next subscribe)."""
+        with self._lock:
+            self._boards = {}
+            self._snapshots = {}
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    # ---------- Subscribing ----------
+
+    def subscribe(self, periods, user_id=None, limit=None):
+        """
+        Register a stream; call in a request. Returns (subscriber, first
+        events), or None when `limit` streams are already open across all
+        processes (no cap when `limit` is None).
+        """
+        self._app = current_app._get_current_object()
+        slot = None
+        if limit is not None:
+            slot = _claim_slot(limit)
+            if slot is None:
+                return None
+        if not self._boards:
+            self.refresh()
+        with self._lock:
+            subscriber = Subscriber(periods, user_id, slot)
+            self._subscribers.add(subscriber)
+            initial = self._resync(subscriber)
+        self._start()
+        return subscriber, initial
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        if subscriber.slot is not None:
+            with self._app.app_context():
+                _release_slot(subscriber.slot)
+            subscriber.slot = None
+
+    def stream(self, subscriber, initial):
+        """The response body for one subscriber: its first events, then updates as they come."""
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode() + b''.join(initial)
+            renewed = time.monotonic()
+            while True:
+                if subscriber.slot is not None and time.monotonic() - renewed >= HEARTBEAT_SECONDS:
+                    with self._app.app_context():
+                        _renew_slot(subscriber.slot)
+                    renewed = time.monotonic()
+                try:
+                    message = subscriber.queue.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield b': keepalive\n\n'
+                    continue
+                if message is RESYNC:
+                    with self._app.app_context(), self._lock:
+                        subscriber.lagging = False
+                        message = b''.join(self._resync(subscriber))
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _resync(self, subscriber):
+        """Snapshots (and rank) for every period the subscriber follows. Hold the lock."""
+        messages = [self._snapshots[period] for period in subscriber.periods]
+        subscriber.ranks = {}
+        messages.extend(self._rank_events(subscriber, subscriber.periods))
+        return messages
+
+    # ---------- Updating ----------
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='leaderboard-stream', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(timeout=SYNC_INTERVAL)
+            if not self._subscribers:
+                self._wake.clear()
+                continue
+            time.sleep(COALESCE_SECONDS)
+            self._wake.clear()
+            try:
+                with self._app.app_context():
+                    self.refresh()
+            except Exception as e:
+                print(f"Leaderboard stream refresh failed: {e}")
+
+    def refresh(self):
+        """
+        Rebuild every board and send a diff for each one that changed, then
+        rank events for subscribers whose standing moved. Needs an app context.
+        """
+        boards = {period: build()[:self.top] for period, build in self.builders.items()}
+        dumps = current_app.json.dumps
+        with self._lock:
+            for period, entries in boards.items():
+                old = self._boards.get(period)
+                if old == entries:
+                    continue
+                self.version += 1
+                self._boards[period] = entries
+                self._snapshots[period] = _event(
+                    'snapshot', dumps({'period': period, 'entries': entries}), self.version
+                )
+                if old is None:
+                    continue
+                changes = [entry for index, entry in enumerate(entries)
+                           if index >= len(old) or old[index] != entry]
+                message = _event(
+                    'diff', dumps({'period': period, 'size': len(entries), 'changes': changes}), self.version
+                )
+                for subscriber in self._subscribers:
+                    if period in subscriber.periods:
+                        subscriber.push(message)
+
+            # Ranks below the top entries move without any board diff, so
+            # check them on every engine change rather than per changed board
+            if leaderboard_engine.version != self._engine_version:
+                self._engine_version = leaderboard_engine.version
+                for subscriber in self._subscribers:
+                    for message in self._rank_events(subscriber, leaderboard_engine.PERIODS):
+                        subscriber.push(message)
+
+    def _rank_events(self, subscriber, periods):
+        """`rank` events for the subscriber's user where their standing moved. Hold the lock."""
+        if subscriber.user_id is None:
+            return []
+        messages = []
+        for period in periods:
+            if period not in subscriber.periods or period not in leaderboard_engine.PERIODS:
+                continue
+            rank, score = leaderboard_engine.rank_of(period, subscriber.user_id)
+            if subscriber.ranks.get(period) == (rank, score):
+                continue
+            subscriber.ranks[period] = (rank, score)
+            self.version += 1
+            messages.append(_event('rank', current_app.json.dumps(
+                {'period': period, 'rank': rank, 'score': score}
+            ), self.version))
+        return messages
+
+
+def _claim_slot(limit):
+    """Take one of `limit` stream slots shared by every process; returns (key, token) or None."""
+    token = uuid.uuid4().hex
+    for index in range(limit):
+        key = f'stream_slot:{index}'
+        if cache.add(key, token, timeout=SLOT_TTL):
+            return key, token
+    return None
+
+
+def _renew_slot(slot):
+    key, token = slot
+    if cache.get(key) == token:
+        cache.set(key, token, timeout=SLOT_TTL)
+
+
+def _release_slot(slot):
+    key, token = slot
+    if cache.get(key) == token:
+        cache.delete(key)
+
+
+def _event(name, data, event_id):
+    return f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'.encode()
@@ -1,10 +1,13 @@
 import random
 import string
 from extensions import db
-from models import User, Referral, Winner
-from datetime import datetime, timedelta
-import pytz
-from winner_notifier import send_winner_email
+from models import User, Referral, Winner, ReferralPeriodCount
+from datetime import timedelta
+from counters import increment_user
+from db_config import upsert_insert
+from email_outbox import enqueue_email, notify as notify_outbox
+from events import publish, user_points_changed, winner_created
+from periods import PERIOD_TYPES, current, start_of
 
 
 def generate_referral_code(length=8):
@@ -14,29 +17,75 @@ def generate_referral_code(length=8):
 
 def increment_referrals_count(referrer_id):
     """Increments the referrals count for the specified user."""
-    referrer = User.query.filter_by(id=referrer_id).first()
-    if referrer:
-        referrer.referrals_count += 1
+    if increment_user(referrer_id, referrals_count=1):
         db.session.commit()
 
 
-def get_us_time():
-    """Get the current time in US timezone (e.g., EST)."""
-    us_timezone = pytz.timezone('US/Eastern')
-    return datetime.now(us_timezone)
+def add_period_counts(rows):
+    """
+    Upsert rollup rows, adding each row's count to any existing value.
 
+    :param rows: Dicts with period_type, period_start, referrer_id and count.
+    """
+    insert = upsert_insert()
+    stmt = insert(ReferralPeriodCount)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['period_type', 'period_start', 'referrer_id'],
+            set_={'count': ReferralPeriodCount.count + stmt.excluded.count}
+        ),
+        rows
+    )
 
-def get_start_of_day():
-    """Get the start of the current day in US timezone."""
-    now = get_us_time()
-    return datetime(now.year, now.month, now.day, 0, 0, 0)
 
+def record_period_referral(referrer_id, moment=None, delta=1):
+    """
+    Add `delta` to the referrer's daily and weekly rollup rows for the periods
+    containing `moment`. Runs in the caller's transaction (no commit), so it
+    commits or rolls back together with the referral insert/delete.
+    """
+    if delta > 0:
+        add_period_counts([
+            {
+                'period_type': period_type,
+                'period_start': start_of(period_type, moment),
+                'referrer_id': referrer_id,
+                'count': delta
+            }
+            for period_type in PERIOD_TYPES
+        ])
+        return
+    for period_type in PERIOD_TYPES:
+        db.session.execute(
+            db.update(ReferralPeriodCount)
+            .where(
+                ReferralPeriodCount.period_type == period_type,
+                ReferralPeriodCount.period_start == start_of(period_type, moment),
+                ReferralPeriodCount.referrer_id == referrer_id
+            )
+            .values(count=ReferralPeriodCount.count + delta)
+        )
 
-def get_start_of_week():
-    """Get the start of the current week (Sunday) in US timezone."""
-    now = get_us_time()
-    start_of_week = now - timedelta(days=(now.weekday() + 1) % 7)
-    return datetime(start_of_week.year, start_of_week.month, start_of_week.day, 0, 0, 0)
+
+def get_period_ranking(period_type, period_start=None):
+    """
+    (User, referral_count) pairs for a period, highest count first, read
+    from the referral_period_counts rollup.
+    """
+    period_start = period_start or current(period_type).start
+    return (
+        db.session.query(User, ReferralPeriodCount.count)
+        .join(ReferralPeriodCount, User.id == ReferralPeriodCount.referrer_id)
+        .filter(
+            ReferralPeriodCount.period_type == period_type,
+            ReferralPeriodCount.period_start == period_start,
+            ReferralPeriodCount.count > 0
+        )
+        # Ties go to the earlier referrer, as in the in-memory leaderboards;
+        # without a tie-breaker PostgreSQL may return ties in any order
+        .order_by(ReferralPeriodCount.count.desc(), ReferralPeriodCount.referrer_id)
+        .all()
+    )
 
 
 def process_winner(user, referral_count, prize, winner_type, end_date, earned_amount):
@@ -44,7 +93,7 @@ def process_winner(user, referral_count, prize, winner_type, end_date, earned_am
     Process a winner by:
       - Saving their details to the Winner table.
       - Incrementing the user's total_earned.
-      - Sending a notification email.
+      - Queueing a notification email.
     
     :param user: The winning User object.
     :param referral_count: Number of referrals.
@@ -62,22 +111,28 @@ def process_winner(user, referral_count, prize, winner_type, end_date, earned_am
     )
     db.session.add(new_winner)
 
-    # Update the user's total earned amount
-    user.total_earned += earned_amount
+    # Update the user's total earned amount atomically
+    increment_user(user.id, total_earned=earned_amount)
+
+    # Queue the winner notification email with the same commit
+    enqueue_email(
+        'winner', user.email,
+        {
+            'name': user.name,
+            'referral_count': referral_count,
+            'prize': prize,
+            'timeframe': winner_type,
+            'date': end_date.strftime("%B %d, %Y"),
+            'referral_code': user.referral_code
+        },
+        dedupe_key=f"winner:{winner_type}:{end_date:%Y-%m-%d}:{user.id}"
+    )
 
     # Commit changes to the database
     db.session.commit()
-
-    # Send winner notification email
-    send_winner_email(
-        receiver_email=user.email,
-        name=user.name,
-        referral_count=referral_count,
-        prize=prize,
-        timeframe=winner_type,
-        date=end_date.strftime("%B %d, %Y"),
-        referral_code=user.referral_code
-    )
+    notify_outbox()
+    publish(winner_created, user_id=user.id, winner_type=winner_type, amount=earned_amount)
+    publish(user_points_changed, user_id=user.id, earned_delta=earned_amount)
 
     print(f"{winner_type.capitalize()} winner processed: {user.name} with {referral_count} referrals.")
 
@@ -86,15 +141,7 @@ def get_daily_leaderboard():
     """
     Return the daily leaderboard data without processing the daily winner.
     """
-    start_of_day = get_start_of_day()
-    referrals = (
-        db.session.query(User, db.func.count(Referral.id).label('referrals_count'))
-        .join(Referral, User.id == Referral.referrer_id)
-        .filter(Referral.created_at >= start_of_day)
-        .group_by(User.id)
-        .order_by(db.desc('referrals_count'))
-        .all()
-    )
+    referrals = get_period_ranking('daily')
     leaderboard = [
         {
             "rank": index + 1,
@@ -113,8 +160,9 @@ def handle_daily_winner():
     A daily winner must have at least 20 referrals.
     Winner duplicate-checking is now done via the Winner table.
     """
-    start_of_day = get_start_of_day()
-    end_of_day = start_of_day + timedelta(days=1) - timedelta(seconds=1)
+    today = current('daily')
+    start_of_day = today.start
+    end_of_day = today.end - timedelta(seconds=1)
 
     # Check if a daily winner already exists for today
     existing_daily_winner = Winner.query.filter(
@@ -127,14 +175,7 @@ def handle_daily_winner():
         return
 
     # Retrieve daily referrals for leaderboard
-    referrals = (
-        db.session.query(User, db.func.count(Referral.id).label('referrals_count'))
-        .join(Referral, User.id == Referral.referrer_id)
-        .filter(Referral.created_at >= start_of_day)
-        .group_by(User.id)
-        .order_by(db.desc('referrals_count'))
-        .all()
-    )
+    referrals = get_period_ranking('daily', start_of_day)
 
     # Choose the winner: first user with at least 20 referrals
     winner = next((user for user in referrals if user[1] >= 20), None)
@@ -156,15 +197,7 @@ def get_weekly_leaderboard():
     """
     Return the weekly leaderboard data.
     """
-    start_of_week = get_start_of_week()
-    referrals = (
-        db.session.query(User, db.func.count(Referral.id).label('referrals_count'))
-        .join(Referral, User.id == Referral.referrer_id)
-        .filter(Referral.created_at >= start_of_week)
-        .group_by(User.id)
-        .order_by(db.desc('referrals_count'))
-        .all()
-    )
+    referrals = get_period_ranking('weekly')
     leaderboard = [
         {
             "rank": index + 1,
@@ -183,8 +216,9 @@ def handle_weekly_winner():
     A weekly winner must have at least 100 referrals.
     Winner duplicate-checking is now done via the Winner table.
     """
-    start_of_week = get_start_of_week()
-    end_of_week = start_of_week + timedelta(days=6, hours=23, minutes=59, seconds=59)
+    this_week = current('weekly')
+    start_of_week = this_week.start
+    end_of_week = this_week.end - timedelta(seconds=1)
 
     # Check if a weekly winner already exists for this week
     existing_weekly_winner = Winner.query.filter(
@@ -197,14 +231,7 @@ def handle_weekly_winner():
         return
 
     # Retrieve weekly referrals for leaderboard
-    referrals = (
-        db.session.query(User, db.func.count(Referral.id).label('referrals_count'))
-        .join(Referral, User.id == Referral.referrer_id)
-        .filter(Referral.created_at >= start_of_week)
-        .group_by(User.id)
-        .order_by(db.desc('referrals_count'))
-        .all()
-    )
+    referrals = get_period_ranking('weekly', start_of_week)
 
     # Choose the winner: first user with at least 100 referrals
     winner = next((user for user in referrals if user[1] >= 100), None)
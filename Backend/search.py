@@ -0,0 +1,130 @@
+"""
+Substring search over user names/emails and referred emails.
+
+`ilike('%term%')` cannot use a B-tree index, so every admin search used to
+scan the whole table. On SQLite the searchable columns are mirrored into
+FTS5 tables with the trigram tokenizer (`users_search`, `referrals_search`),
+kept in sync by triggers, so any substring of three or more characters is an
+index lookup. Results are ordered prefix matches first, then by bm25.
+
+Terms shorter than three characters cannot be split into trigrams and other
+backends have no FTS5; both fall back to ILIKE (on PostgreSQL the migration
+adds pg_trgm GIN indexes that serve those ILIKEs where the extension exists).
+
+The FTS tables are not part of db.metadata. They are created alongside
+`users`/`referrals` by create_all() (see the after_create hooks below) and by
+the add_search_index migration, and migrations/env.py keeps them (and their
+FTS5 shadow tables) out of autogenerate.
+"""
+
+import sqlalchemy as sa
+
+from extensions import db
+from models import Referral, User
+
+MIN_TERM_LENGTH = 3  # trigram tokenizer
+SEARCH_TABLES = ('users_search', 'referrals_search')
+
+USERS_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+        name, email, content='users', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_search(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_search(users_search, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF name, email ON users BEGIN
+        INSERT INTO users_search(users_search, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO users_search(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+)
+
+REFERRALS_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS referrals_search USING fts5(
+        referred_email, content='referrals', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS referrals_search_ai AFTER INSERT ON referrals BEGIN
+        INSERT INTO referrals_search(rowid, referred_email) VALUES (new.id, new.referred_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS referrals_search_ad AFTER DELETE ON referrals BEGIN
+        INSERT INTO referrals_search(referrals_search, rowid, referred_email)
+        VALUES ('delete', old.id, old.referred_email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS referrals_search_au AFTER UPDATE OF referred_email ON referrals BEGIN
+        INSERT INTO referrals_search(referrals_search, rowid, referred_email)
+        VALUES ('delete', old.id, old.referred_email);
+        INSERT INTO referrals_search(rowid, referred_email) VALUES (new.id, new.referred_email);
+    END""",
+)
+
+for _table, _ddl in ((User.__table__, USERS_SEARCH_DDL), (Referral.__table__, REFERRALS_SEARCH_DDL)):
+    for _statement in _ddl:
+        sa.event.listen(_table, 'after_create', sa.DDL(_statement).execute_if(dialect='sqlite'))
+
+
+def rebuild_search_index():
+    """Re-index every existing row (after a bulk load that bypassed the triggers)."""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    db.session.execute(sa.text("INSERT INTO users_search(users_search) VALUES ('rebuild')"))
+    db.session.execute(sa.text("INSERT INTO referrals_search(referrals_search) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def _fts_query(columns, term):
+    """An FTS5 query matching `term` as a literal substring of any of `columns`."""
+    return '{%s}: "%s"' % (' '.join(columns), term.replace('"', '""'))
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _uses_fts(term):
+    return db.engine.dialect.name == 'sqlite' and len(term) >= MIN_TERM_LENGTH
+
+
+def _matches(fts_table, model, columns, term):
+    """(id, rank) of rows of `model` whose `columns` contain `term`."""
+    if _uses_fts(term):
+        fts = sa.table(fts_table, sa.column('rowid'), sa.column('rank'))
+        return (
+            sa.select(fts.c.rowid.label('id'), fts.c.rank.label('rank'))
+            .where(sa.literal_column(fts_table).op('MATCH')(_fts_query(columns, term)))
+        )
+    pattern = f'%{_escape_like(term)}%'
+    return (
+        sa.select(model.id.label('id'), sa.literal(0.0).label('rank'))
+        .where(sa.or_(*(getattr(model, c).ilike(pattern, escape='\\') for c in columns)))
+    )
+
+
+def search_users(query, term, columns=('name', 'email')):
+    """
+    Restrict a User query to users whose `columns` contain `term`
+    (case-insensitive), best matches first.
+    """
+    matches = _matches('users_search', User, columns, term).subquery()
+    prefix = f'{_escape_like(term)}%'
+    is_prefix = sa.or_(*(getattr(User, c).ilike(prefix, escape='\\') for c in columns))
+    return (
+        query.join(matches, matches.c.id == User.id)
+        .order_by(sa.case((is_prefix, 0), else_=1), matches.c.rank, User.id)
+    )
+
+
+def search_referrals(query, term):
+    """Restrict a Referral query to referred emails containing `term`, best matches first."""
+    matches = _matches('referrals_search', Referral, ('referred_email',), term).subquery()
+    prefix = f'{_escape_like(term)}%'
+    return (
+        query.join(matches, matches.c.id == Referral.id)
+        .order_by(
+            sa.case((Referral.referred_email.ilike(prefix, escape='\\'), 0), else_=1),
+            matches.c.rank, Referral.id
+        )
+    )
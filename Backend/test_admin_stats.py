@@ -0,0 +1,179 @@
+"""
+test_admin_stats.py
+
+Checks that /admin/dashboard and /admin/stats serve the admin_stats_snapshot
+row, that write events keep its counters current, and that ?fresh=1 and a
+full refresh agree with the live tables.
+
+    python -m pytest test_admin_stats.py
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+from admin_pannel import utils as admin_utils
+from admin_pannel.routes import admin_bp
+from admin_pannel.utils import refresh_admin_snapshot
+from auth.routes import auth_bp
+from extensions import db
+from models import AdminStatsSnapshot, Referral, User
+from referral.routes import referral_bp
+from referral.utils import handle_daily_winner
+
+
+def add_users():
+    db.session.add_all([
+        User(name='Ann', email='ann@example.com', password='x', referral_code='ANN'),
+        User(name='Ben', email='ben@example.com', password='x', referral_code='BEN'),
+    ])
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    # Fresh per-process delta buffer; flushes only happen on snapshot reads
+    monkeypatch.setattr(admin_utils, '_pending', defaultdict(Counter))
+    monkeypatch.setattr(admin_utils, '_generation', None)
+    monkeypatch.setattr(admin_utils, 'FLUSH_INTERVAL', 3600)
+    return make_app((auth_bp, '/auth'), (referral_bp, '/referral'), (admin_bp, '/admin'), seed=add_users)
+
+
+def refer(client, n, code='ANN'):
+    response = client.post('/referral/process_referral', json={
+        'email': f'friend{n}@example.com', 'referrer_code': code
+    })
+    assert response.status_code == 200
+
+
+def test_snapshot_is_built_on_first_read(app):
+    client = app.test_client()
+    dashboard = client.get('/admin/dashboard').get_json()
+    assert dashboard['source'] == 'snapshot'
+    assert dashboard['total_users'] == 2 and dashboard['total_referrals'] == 0
+    assert dashboard['as_of']
+    with app.app_context():
+        assert db.session.get(AdminStatsSnapshot, 1) is not None
+
+
+def test_events_keep_counters_current(app):
+    client = app.test_client()
+    client.get('/admin/dashboard')
+
+    for n in range(20):  # enough for a daily winner
+        refer(client, n)
+    response = client.post('/auth/signup', json={'name': 'Cat', 'email': 'cat@example.com'})
+    assert response.status_code == 201
+    with app.app_context():
+        handle_daily_winner()
+
+    stats = client.get('/admin/stats').get_json()
+    assert stats['source'] == 'snapshot'
+    assert stats['total_users'] == 3
+    assert stats['total_referrals'] == 20
+    assert stats['total_earned_sum'] == 1.0
+    assert client.get('/admin/dashboard').get_json()['total_winners'] == 1
+
+    with app.app_context():
+        referral_id = db.session.execute(db.select(Referral.id).limit(1)).scalar_one()
+        ben_id = db.session.execute(db.select(User.id).where(User.name == 'Ben')).scalar_one()
+    assert client.delete(f'/admin/referrals/{referral_id}').status_code == 200
+    assert client.delete(f'/admin/users/{ben_id}').status_code == 200
+
+    dashboard = client.get('/admin/dashboard').get_json()
+    assert dashboard['total_referrals'] == 19
+    assert dashboard['total_users'] == 2
+
+
+def test_fresh_bypasses_the_snapshot(app):
+    client = app.test_client()
+    client.get('/admin/dashboard')
+    with app.app_context():
+        db.session.add(User(name='Dan', email='dan@example.com', password='x', referral_code='DAN'))
+        db.session.commit()  # no event, so the snapshot does not see it
+
+    assert client.get('/admin/dashboard').get_json()['total_users'] == 2
+    live = client.get('/admin/dashboard?fresh=1').get_json()
+    assert live['source'] == 'live' and live['total_users'] == 3
+
+
+def test_refresh_corrects_drift_and_top_lists(app):
+    client = app.test_client()
+    client.get('/admin/stats')
+    refer(client, 0, 'BEN')
+    refer(client, 1, 'BEN')
+    assert client.get('/admin/dashboard').get_json()['top_referrers'][0]['name'] == 'Ann'
+
+    with app.app_context():
+        db.session.execute(db.update(AdminStatsSnapshot).values(total_users=99))
+        db.session.commit()
+        refresh_admin_snapshot()
+
+    dashboard = client.get('/admin/dashboard').get_json()
+    live = client.get('/admin/dashboard?fresh=1').get_json()
+    assert dashboard['total_users'] == 2
+    assert dashboard['top_referrers'][0] == {'id': 2, 'name': 'Ben', 'referrals_count': 2}
+    for key in ('total_users', 'total_referrals', 'total_winners', 'total_earned', 'top_referrers'):
+        assert dashboard[key] == live[key]
+
+
+def test_old_snapshot_is_rebuilt_on_read(app):
+    # No scheduler (as under Passenger): reads rebuild a snapshot past REFRESH_INTERVAL
+    client = app.test_client()
+    client.get('/admin/dashboard')
+    refer(client, 0, 'BEN')
+    with app.app_context():
+        db.session.execute(db.update(AdminStatsSnapshot).values(total_users=99))
+        db.session.commit()
+
+    dashboard = client.get('/admin/dashboard').get_json()
+    assert dashboard['total_users'] == 99  # still fresh
+    assert dashboard['top_referrers'][0]['name'] == 'Ann'
+
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(seconds=admin_utils.REFRESH_INTERVAL)
+        db.session.execute(db.update(AdminStatsSnapshot).values(refreshed_at=old))
+        db.session.commit()
+    dashboard = client.get('/admin/dashboard').get_json()
+    assert dashboard['total_users'] == 2
+    assert dashboard['top_referrers'][0] == {'id': 2, 'name': 'Ben', 'referrals_count': 1}
+
+
+def test_requests_only_buffer_deltas(app):
+    client = app.test_client()
+    client.get('/admin/dashboard')
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            refer(client, 0)
+            assert client.post('/auth/signup', json={'name': 'Cat', 'email': 'cat@example.com'}).status_code == 201
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', capture)
+    assert not [s for s in statements if 'admin_stats_snapshot' in s and not s.startswith('SELECT')]
+
+    # The next snapshot read writes both deltas in one flush
+    dashboard = client.get('/admin/dashboard').get_json()
+    assert (dashboard['total_users'], dashboard['total_referrals']) == (3, 1)
+
+
+def test_rebuild_and_deltas_never_double_count(app):
+    client = app.test_client()
+    client.get('/admin/dashboard')
+    refer(client, 0)  # buffered, not yet flushed
+
+    with app.app_context():
+        before = admin_utils._generation
+        refresh_admin_snapshot()  # counts the referral and drops the buffered delta
+        assert db.session.get(AdminStatsSnapshot, 1).generation == before + 1
+        # Another worker's delta from before the rebuild arrives late
+        admin_utils._pending[before]['total_referrals'] += 1
+        admin_utils.flush_admin_deltas()
+
+    assert client.get('/admin/dashboard').get_json()['total_referrals'] == 1
+    refer(client, 1)
+    assert client.get('/admin/dashboard').get_json()['total_referrals'] == 2
@@ -0,0 +1,123 @@
+"""
+test_atomic_counters.py
+
+Concurrency checks for the SQL-side counter updates: many threads hit the
+referral, trivia and withdrawal endpoints for the same user at once, and the
+stored counters must account for every successful request (no lost updates,
+no overdrawn balance). Each test runs on the driver's default engine setup and
+on the one app.py uses (db_config.configure/init_app).
+
+    python -m pytest test_atomic_counters.py
+"""
+
+import threading
+
+import pytest
+
+from counters import increment_user, debit_user
+from extensions import db
+from models import User, Referral, Withdrawal
+from referral.routes import referral_bp
+from trivia.routes import trivia_bp, question_map
+from withdrawal.routes import user_withdrawals_bp
+
+THREADS = 8
+REQUESTS_PER_THREAD = 10
+
+
+def add_user():
+    db.session.add(User(
+        name='Counter', email='counter@example.com', password='x',
+        referral_code='COUNTER1', pass_token='tok',
+        total_earned=100.0, total_points=0, referrals_count=0
+    ))
+
+
+@pytest.fixture(params=[False, True], ids=['default-engine', 'app-engine'])
+def app(make_app, request):
+    return make_app(referral_bp, trivia_bp, user_withdrawals_bp, seed=add_user, configure_db=request.param)
+
+
+def hammer(app, make_request):
+    """Run make_request(client, thread_index, n) from THREADS threads; return responses."""
+    responses = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(index):
+        client = app.test_client()
+        barrier.wait()
+        for n in range(REQUESTS_PER_THREAD):
+            response = make_request(client, index, n)
+            with lock:
+                responses.append(response)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def get_user(app):
+    with app.app_context():
+        return db.session.execute(db.select(User)).scalar_one()
+
+
+def test_increment_user_returns_new_values(app):
+    with app.app_context():
+        user = db.session.execute(db.select(User)).scalar_one()
+        row = increment_user(user.id, total_points=30, referrals_count=2)
+        db.session.commit()
+        assert tuple(row) == (30, 2)
+        assert increment_user(user.id + 1, total_points=1) is None
+
+
+def test_debit_user_refuses_to_overdraw(app):
+    with app.app_context():
+        user = db.session.execute(db.select(User)).scalar_one()
+        assert debit_user(user.id, 'total_earned', 60.0) == 40.0
+        assert debit_user(user.id, 'total_earned', 60.0) is None
+        db.session.commit()
+        assert db.session.get(User, user.id).total_earned == 40.0
+
+
+def test_concurrent_referrals_are_all_counted(app):
+    responses = hammer(app, lambda client, i, n: client.post(
+        '/process_referral',
+        json={'email': f'friend-{i}-{n}@example.com', 'referrer_code': 'COUNTER1'}
+    ))
+    ok = sum(r.status_code == 200 for r in responses)
+    assert ok == THREADS * REQUESTS_PER_THREAD
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Referral.id))) == ok
+    assert get_user(app).referrals_count == ok
+
+
+def test_concurrent_trivia_points_are_all_counted(app):
+    question_id, question = next(iter(question_map.items()))
+    user_id = get_user(app).id
+    responses = hammer(app, lambda client, i, n: client.post(
+        '/check_results',
+        json={'user_id': user_id, 'answers': {question_id: question['correct_answer']}}
+    ))
+    earned = sum(r.get_json()['points_earned'] for r in responses if r.status_code == 200)
+    assert earned == THREADS * REQUESTS_PER_THREAD * 10
+    assert get_user(app).total_points == earned
+
+
+def test_concurrent_withdrawals_never_overdraw(app):
+    user_id = get_user(app).id
+    # 80 requests of 10.0 against a balance of 100.0: exactly 10 may succeed
+    responses = hammer(app, lambda client, i, n: client.post(
+        '/withdrawals', json={'user_id': user_id, 'amount': 10.0, 'payment_info': 'paypal'}
+    ))
+    created = [r for r in responses if r.status_code == 201]
+    refused = [r for r in responses if r.status_code == 400]
+    assert len(created) == 10
+    assert len(created) + len(refused) == len(responses)
+    assert all(r.get_json()['message'] == 'Insufficient balance' for r in refused)
+    assert get_user(app).total_earned == 0.0
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Withdrawal.id))) == 10
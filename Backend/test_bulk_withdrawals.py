@@ -0,0 +1,87 @@
+"""
+test_bulk_withdrawals.py
+
+Checks PUT /admin/withdrawals/bulk/<action>: guarded status transitions,
+per-id outcomes, and grouped refunds for bulk rejects.
+
+    python -m pytest test_bulk_withdrawals.py
+"""
+
+import pytest
+
+from admin_pannel.routes import admin_bp
+from extensions import db
+from models import Admin, User, Withdrawal
+
+
+def add_withdrawals():
+    db.session.add(Admin(username='admin', email='admin@example.com', password='x'))
+    db.session.add_all([
+        User(name='Ann', email='ann@example.com', password='x', referral_code='ANN', total_earned=0.0),
+        User(name='Ben', email='ben@example.com', password='x', referral_code='BEN', total_earned=1.0),
+    ])
+    db.session.flush()
+    # ids 1-3 belong to Ann, 4 to Ben; 4 is already processing
+    for user_id, amount, status in [(1, 5.0, 'pending'), (1, 2.5, 'pending'), (1, 1.0, 'pending'),
+                                    (2, 7.0, 'processing')]:
+        db.session.add(Withdrawal(user_id=user_id, amount=amount, user_payment_info='{}', status=status))
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app((admin_bp, '/admin'), seed=add_withdrawals)
+
+
+def bulk(client, action, ids, admin_id=1):
+    return client.put(f'/admin/withdrawals/bulk/{action}', query_string={'admin_id': admin_id},
+                      json={'ids': ids})
+
+
+def statuses(app):
+    with app.app_context():
+        return dict(db.session.execute(db.select(Withdrawal.id, Withdrawal.status)).all())
+
+
+def balance(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).total_earned
+
+
+def test_bulk_accept_reports_each_id(app):
+    response = bulk(app.test_client(), 'accept', [1, 2, 4, 99, 2])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['updated'], body['failed']) == (2, 2)
+    assert body['results'] == [
+        {'id': 1, 'status': 'processing'},
+        {'id': 2, 'status': 'processing'},
+        {'id': 4, 'error': "Cannot accept a withdrawal with status 'processing'"},
+        {'id': 99, 'error': 'Withdrawal not found'},
+    ]
+    assert statuses(app) == {1: 'processing', 2: 'processing', 3: 'pending', 4: 'processing'}
+
+    body = bulk(app.test_client(), 'complete', [1, 2, 3, 4]).get_json()
+    assert body['updated'] == 3
+    assert statuses(app) == {1: 'completed', 2: 'completed', 3: 'pending', 4: 'completed'}
+
+
+def test_bulk_reject_refunds_once_per_user(app):
+    client = app.test_client()
+    body = bulk(client, 'reject', [1, 2, 3, 4]).get_json()
+    assert body['updated'] == 3 and body['refunded'] == 8.5
+    assert balance(app, 1) == 8.5
+    assert balance(app, 2) == 1.0
+
+    # Replaying the request changes nothing
+    body = bulk(client, 'reject', [1, 2, 3]).get_json()
+    assert body['updated'] == 0 and body['refunded'] == 0
+    assert balance(app, 1) == 8.5
+
+
+def test_bulk_validation(app):
+    client = app.test_client()
+    assert bulk(client, 'accept', [1], admin_id=42).status_code == 403
+    assert bulk(client, 'explode', [1]).status_code == 404
+    assert bulk(client, 'accept', []).status_code == 400
+    assert bulk(client, 'accept', ['1']).status_code == 400
+    assert statuses(app)[1] == 'pending'
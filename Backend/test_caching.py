@@ -0,0 +1,127 @@
+"""
+test_caching.py
+
+Checks the read-through cache (caching.py) on both the in-process SimpleCache
+and the cross-process SQLiteCache: concurrent misses compute once, stale
+entries are served while another caller refreshes them, and invalidation
+discards results computed before it.
+
+    python -m pytest test_caching.py
+"""
+
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import caching
+from cache_backends import SQLiteCache
+from caching import get_or_compute, invalidate, local_cache
+
+
+@pytest.fixture(params=['SimpleCache', 'cache_backends.SQLiteCache'])
+def app(request, make_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(caching, 'stats', Counter())
+    app = make_app(config={'CACHE_TYPE': request.param, 'CACHE_SQLITE_PATH': str(tmp_path / 'cache.db')})
+    with app.app_context():
+        yield app
+
+
+class Compute:
+    """A compute() callable that counts its calls and can run a hook mid-way."""
+
+    def __init__(self, delay=0, during=None):
+        self.calls = 0
+        self.delay = delay
+        self.during = during
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.during:
+            self.during()
+        return f'value {self.calls}'
+
+
+def test_concurrent_misses_compute_once(app):
+    compute = Compute(delay=0.3)
+    start = threading.Barrier(8)
+    results = []
+
+    def request():
+        with app.app_context():
+            start.wait()
+            results.append(get_or_compute('board', compute))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert compute.calls == 1
+    assert results == ['value 1'] * 8
+
+
+def test_stale_entry_served_while_another_caller_refreshes(app):
+    compute = Compute()
+    assert get_or_compute('board', compute, ttl=0, stale_ttl=60) == 'value 1'
+    local_cache.clear()
+
+    # Another worker holds the recompute lock: serve the stale value meanwhile
+    token = caching._acquire('board')
+    assert get_or_compute('board', compute, ttl=0, stale_ttl=60) == 'value 1'
+    assert compute.calls == 1 and caching.stats['stale_hit'] == 1
+
+    # Nobody refreshing: this caller recomputes
+    caching._release('board', token)
+    assert get_or_compute('board', compute, ttl=0, stale_ttl=60) == 'value 2'
+
+
+def test_invalidate_drops_the_cached_value(app):
+    compute = Compute()
+    assert get_or_compute('board', compute) == 'value 1'
+    assert get_or_compute('board', compute) == 'value 1'
+    invalidate('board')
+    assert get_or_compute('board', compute) == 'value 2'
+
+
+def test_result_computed_before_an_invalidation_is_not_stored(app):
+    # A write lands (and invalidates) while the value is being computed
+    compute = Compute(during=lambda: invalidate('board'))
+    assert get_or_compute('board', compute) == 'value 1'
+    assert caching.stats['dropped'] == 1
+    compute.during = None
+    assert get_or_compute('board', compute) == 'value 2'
+    assert get_or_compute('board', compute) == 'value 2'
+
+
+def test_entry_from_an_older_generation_is_ignored(app):
+    compute = Compute()
+    get_or_compute('board', compute)
+    # A recompute that passed its generation check just before an invalidation
+    stale = caching.cache.get('board')
+    invalidate('board')
+    caching.cache.set('board', stale)
+
+    assert get_or_compute('board', compute) == 'value 2'
+
+
+def test_sqlite_cache_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    shared = SQLiteCache(path)
+    shared.set('board', 'from parent')
+    assert shared.add('lock:board', 'parent', timeout=30)
+
+    other_process = (
+        "import sys; from cache_backends import SQLiteCache; cache = SQLiteCache(sys.argv[1]); "
+        "print(cache.get('board'), cache.add('lock:board', 'child', timeout=30)); "
+        "cache.set('reply', 'from child')"
+    )
+    output = subprocess.run([sys.executable, '-c', other_process, path],
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['from', 'parent', 'False']
+    assert shared.get('reply') == 'from child'
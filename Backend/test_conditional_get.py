@@ -0,0 +1,72 @@
+"""
+test_conditional_get.py
+
+Checks that the leaderboard endpoints serve cached, pre-encoded bytes with an
+ETag, answer 304 for an unchanged If-None-Match, gzip on request, and change
+ETag once a referral changes the board.
+
+    python -m pytest test_conditional_get.py
+"""
+
+import gzip
+import json
+
+import pytest
+
+from caching import local_cache
+from extensions import db
+from models import User
+from referral.routes import LEADERBOARD_TTL, referral_bp
+
+PATHS = ('/referral/leaderboard', '/referral/leaderboard/daily', '/referral/leaderboard/weekly')
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, 8)
+    ])
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app((referral_bp, '/referral'), seed=add_users)
+    client = app.test_client()
+    for i in range(1, 8):
+        client.post('/referral/process_referral',
+                    json={'email': f'friend{i}@example.com', 'referrer_code': f'CODE{i}'})
+    return app
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_unchanged_board_is_a_304(app, path):
+    client = app.test_client()
+    first = client.get(path)
+    assert first.status_code == 200 and len(first.get_json()) == 7
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert first.headers['Vary'] == 'Accept-Encoding'
+    assert first.cache_control.public and 0 <= first.cache_control.max_age <= LEADERBOARD_TTL
+
+    again = client.get(path, headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert again.headers['ETag'] == etag
+
+    zipped = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert zipped.headers['ETag'] == etag
+    assert json.loads(gzip.decompress(zipped.data)) == first.get_json()
+    assert client.get(path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_new_referral_changes_the_etag(app, path):
+    client = app.test_client()
+    etag = client.get(path).headers['ETag']
+    client.post('/referral/process_referral', json={'email': 'another@example.com', 'referrer_code': 'CODE7'})
+    local_cache.clear()  # as other workers' LRUs would expire
+
+    changed = client.get(path, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    top = changed.get_json()[0]
+    assert (top['rank'], top['name'], top['score']) == (1, 'user7', 2)
@@ -0,0 +1,96 @@
+"""
+test_dashboard.py
+
+Checks GET /me/dashboard against the four endpoints it replaces, the
+`fields=` selector, and how many queries a warm call costs.
+
+    python -m pytest test_dashboard.py
+"""
+
+import pytest
+
+from dashboard.routes import dashboard_bp
+from events import publish, user_points_changed
+from extensions import db
+from models import User
+from profile.routes import profile_bp
+from referral.routes import referral_bp
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, 4)
+    ])
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app((referral_bp, '/referral'), (profile_bp, '/profile'), (dashboard_bp, '/me'), seed=add_users)
+    client = app.test_client()
+    for i, code in enumerate(['CODE1', 'CODE2', 'CODE2']):
+        client.post('/referral/process_referral', json={'email': f'friend{i}@example.com', 'referrer_code': code})
+    return app
+
+
+def test_dashboard_matches_the_separate_endpoints(app):
+    client = app.test_client()
+    response = client.get('/me/dashboard?user_id=2')
+    assert response.status_code == 200
+    body = response.get_json()
+
+    assert body['profile'] == client.post('/profile/profile', json={'userID': 2}).get_json()
+    assert body['profile']['dailyRank'] == 1 and body['profile']['dailyReferrals'] == 2
+    assert body['leaderboards'] == {
+        'daily': client.get('/referral/leaderboard/daily').get_json(),
+        'weekly': client.get('/referral/leaderboard/weekly').get_json(),
+        'all_time': client.get('/referral/leaderboard').get_json(),
+    }
+    assert body['trivia'] == {'available': True, 'remainingTriviaTime': 0, 'lastAttempt': None}
+
+
+def test_fields_selector(app):
+    client = app.test_client()
+    body = client.get('/me/dashboard?user_id=1&fields=profile,leaderboards.daily').get_json()
+    assert set(body) == {'profile', 'leaderboards'}
+    assert set(body['leaderboards']) == {'daily'}
+
+    body = client.get('/me/dashboard?user_id=1&fields=leaderboards.weekly,leaderboards').get_json()
+    assert set(body['leaderboards']) == {'daily', 'weekly', 'all_time'}
+
+    assert client.get('/me/dashboard?user_id=1&fields=profile,wallet').status_code == 400
+    assert client.get('/me/dashboard?user_id=1&fields=trivia.score').status_code == 400
+    assert client.get('/me/dashboard').status_code == 400
+    assert client.get('/me/dashboard?user_id=99').status_code == 404
+
+
+def test_warm_dashboard_runs_no_sql(app):
+    client = app.test_client()
+    client.get('/me/dashboard?user_id=2')
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            assert client.get('/me/dashboard?user_id=2').status_code == 200
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', capture)
+    assert statements == []
+
+
+def test_memoized_profile_follows_the_users_writes(app):
+    client = app.test_client()
+    assert client.post('/profile/profile', json={'userID': '1'}).get_json()['totalReferrals'] == 1
+
+    client.post('/referral/process_referral', json={'email': 'more@example.com', 'referrer_code': 'CODE1'})
+    profile = client.post('/profile/profile', json={'userID': 1}).get_json()
+    assert (profile['totalReferrals'], profile['dailyReferrals']) == (2, 2)
+
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == 1).values(total_points=30))
+        db.session.commit()
+        publish(user_points_changed, user_id=1)
+    assert client.get('/me/dashboard?user_id=1&fields=profile').get_json()['profile']['total_points'] == 30
@@ -0,0 +1,177 @@
+"""
+test_db_config.py
+
+Checks that db_config applies the SQLite pragmas, that run_write commits or
+rolls back as a unit, that read-then-write requests outside run_write wait for
+the write lock instead of failing, and that the single-writer thread
+group-commits concurrent referrals without losing any or letting one failure
+spoil a batch.
+
+    python -m pytest test_db_config.py
+"""
+
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import db_config
+from admin_pannel import utils as admin_utils
+from db_config import run_write
+from extensions import db, cache
+from models import User, Referral
+from referral.routes import referral_bp
+from trivia.routes import trivia_bp, question_map
+from withdrawal.routes import user_withdrawals_bp
+
+
+def make_app(database_uri, single_writer):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['CACHE_TYPE'] = 'SimpleCache'
+    app.config['DB_SINGLE_WRITER'] = single_writer
+    db_config.configure(app)
+    db.init_app(app)
+    db_config.init_app(app)
+    cache.init_app(app)
+    app.register_blueprint(referral_bp)
+    app.register_blueprint(trivia_bp)
+    app.register_blueprint(user_withdrawals_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(
+            name='Writer', email='writer@example.com', password='x', referral_code='WRITER01',
+            total_earned=1000.0, total_points=0
+        ))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def app(database_uri):
+    app = make_app(database_uri, single_writer=False)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def writer_app(database_uri, monkeypatch):
+    # Referral events also buffer admin snapshot deltas, whose flush is one
+    # more run_write job; keep it out of the writer's counts
+    monkeypatch.setattr(admin_utils, '_last_flush', time.monotonic())
+    monkeypatch.setattr(admin_utils, 'FLUSH_INTERVAL', 3600)
+    app = make_app(database_uri, single_writer=True)
+    yield app
+    app.extensions['db_writer'].stop()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def add_user(email):
+    db.session.add(User(name=email, email=email, password='x', referral_code=email[:10]))
+    db.session.flush()
+
+
+def count_users():
+    return db.session.scalar(db.select(db.func.count(User.id)))
+
+
+@pytest.mark.sqlite_only
+def test_pragmas_are_applied(app):
+    with app.app_context():
+        conn = db.session.connection()
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] == 10
+
+
+def test_run_write_commits_and_rolls_back(app):
+    with app.app_context():
+        run_write(add_user, 'a@example.com')
+
+        def fails():
+            add_user('b@example.com')
+            raise ValueError('boom')
+
+        with pytest.raises(ValueError):
+            run_write(fails)
+        assert count_users() == 2
+
+
+def run_threads(n_threads, per_thread, request):
+    """Call request(index, n) from n_threads threads at once; return the status codes."""
+    barrier = threading.Barrier(n_threads)
+    statuses = []
+
+    def worker(index):
+        barrier.wait()
+        for n in range(per_thread):
+            statuses.append(request(index, n))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def test_concurrent_writes_outside_run_write_wait_for_the_lock(app):
+    # Trivia and withdrawals read the user, then write on the request session
+    question_id, question = next(iter(question_map.items()))
+    def request(index, n):
+        if (index + n) % 2:
+            return app.test_client().post('/check_results', json={
+                'user_id': 1, 'answers': {question_id: question['correct_answer']}
+            }).status_code
+        return app.test_client().post('/withdrawals', json={
+            'user_id': 1, 'amount': 10.0, 'payment_info': 'paypal'
+        }).status_code
+
+    statuses = run_threads(8, 10, request)
+    assert sorted(statuses) == [200] * 40 + [201] * 40
+    with app.app_context():
+        user = db.session.get(User, 1)
+        assert (user.total_points, user.total_earned) == (400, 600.0)
+
+
+def test_single_writer_group_commits_concurrent_referrals(writer_app):
+    n_threads, per_thread = 8, 10
+
+    def request(index, n):
+        return writer_app.test_client().post('/process_referral', json={
+            'email': f'friend-{index}-{n}@example.com', 'referrer_code': 'WRITER01'
+        }).status_code
+
+    statuses = run_threads(n_threads, per_thread, request)
+
+    assert statuses == [200] * n_threads * per_thread
+    with writer_app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Referral.id))) == len(statuses)
+        assert db.session.scalar(db.select(User.referrals_count)) == len(statuses)
+    stats = writer_app.extensions['db_writer'].stats
+    assert stats['jobs'] == len(statuses)
+    assert stats['commits'] <= stats['jobs']
+
+
+def test_single_writer_isolates_failing_job(writer_app):
+    writer = writer_app.extensions['db_writer']
+
+    def fails():
+        add_user('bad@example.com')
+        raise ValueError('boom')
+
+    with writer_app.app_context():
+        futures = [
+            writer.submit(add_user, 'ok1@example.com'),
+            writer.submit(fails),
+            writer.submit(add_user, 'ok2@example.com'),
+        ]
+        assert futures[0].result() is None
+        with pytest.raises(ValueError):
+            futures[1].result()
+        assert futures[2].result() is None
+        assert count_users() == 3
@@ -0,0 +1,107 @@
+"""
+test_email_outbox.py
+
+End-to-end checks for the email outbox: signup only enqueues, the workers
+deliver to a local aiosmtpd server, duplicates are dropped, and failures back
+off until the row is dead-lettered.
+
+    python -m pytest test_email_outbox.py
+"""
+
+import socket
+import time
+from datetime import datetime
+
+import pytest
+
+import email_outbox
+import mailer
+from auth.routes import auth_bp
+from extensions import db
+from models import EmailOutbox
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app((auth_bp, '/auth'))
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+    received = []
+
+    class Recorder:
+        async def handle_DATA(self, server, session, envelope):
+            received.append(envelope)
+            return '250 OK'
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    controller = controller_module.Controller(Recorder(), hostname='127.0.0.1', port=port)
+    controller.start()
+    monkeypatch.setattr(mailer, 'SMTP_SERVER', '127.0.0.1')
+    monkeypatch.setattr(mailer, 'SMTP_PORT', port)
+    monkeypatch.setattr(mailer, 'SMTP_USE_SSL', False)
+    monkeypatch.setattr(mailer, 'PASSWORD', '')
+    yield received
+    controller.stop()
+
+
+def test_signup_enqueues_and_workers_deliver(app, smtp_server):
+    client = app.test_client()
+    response = client.post('/auth/signup', json={'name': 'Ann', 'email': 'ann@example.com'})
+    assert response.status_code == 201
+
+    with app.app_context():
+        kinds = sorted(item.kind for item in EmailOutbox.query.all())
+        assert kinds == ['password_reset', 'welcome']
+
+    pool = email_outbox.OutboxWorkerPool(app, workers=2, poll_interval=0.1)
+    pool.start()
+    try:
+        deadline = time.time() + 10
+        while len(smtp_server) < 2 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        pool.stop()
+
+    assert sorted(env.rcpt_tos[0] for env in smtp_server) == ['ann@example.com'] * 2
+    with app.app_context():
+        assert {item.status for item in EmailOutbox.query.all()} == {'sent'}
+
+
+def test_duplicate_recipient_is_enqueued_once(app):
+    with app.app_context():
+        payload = {'name': 'Ann', 'referral_code': 'ABC'}
+        assert email_outbox.enqueue_email('welcome', 'ann@example.com', payload) is not None
+        db.session.commit()
+        assert email_outbox.enqueue_email('welcome', 'ANN@example.com', payload) is None
+        assert EmailOutbox.query.count() == 1
+
+
+def test_failures_back_off_then_dead_letter(app, monkeypatch):
+    def broken(message):
+        raise OSError("connection refused")
+
+    with app.app_context():
+        email_outbox.enqueue_email('welcome', 'bob@example.com', {'name': 'Bob', 'referral_code': 'X'})
+        db.session.commit()
+
+        assert email_outbox.drain(send=broken) == 1
+        item = EmailOutbox.query.one()
+        assert item.status == 'pending' and item.attempts == 1
+        assert item.next_attempt_at > datetime.utcnow()
+        # Not due yet: nothing to claim
+        assert email_outbox.drain(send=broken) == 0
+
+        for _ in range(email_outbox.MAX_ATTEMPTS - 1):
+            item.next_attempt_at = datetime.utcnow()
+            db.session.commit()
+            email_outbox.drain(send=broken)
+
+        db.session.refresh(item)
+        assert item.status == 'dead'
+        assert item.attempts == email_outbox.MAX_ATTEMPTS
+        assert 'connection refused' in item.last_error
@@ -0,0 +1,106 @@
+"""
+test_email_resender.py
+
+Checks the bulk referral-link mailer (email_resender.py) with a fake SMTP
+pool: resuming from the checkpoint after a crash, dry runs, the failed-address
+log beside the checkpoint, and that no read transaction is held while sending.
+
+    python -m pytest test_email_resender.py
+"""
+
+import json
+
+import pytest
+
+import email_resender
+from extensions import db
+from models import User
+
+N_USERS = 7
+
+
+class FakePool:
+    """Stands in for mailer.smtp_pool; can crash on a given batch or fail an address."""
+
+    def __init__(self, crash_on_batch=None, fail_to=()):
+        self.crash_on_batch = crash_on_batch
+        self.fail_to = set(fail_to)
+        self.batches = []
+        self.open_transactions = []
+
+    def send_many(self, messages, workers=None, on_error=None):
+        self.open_transactions.append(db.session().in_transaction())
+        if len(self.batches) == self.crash_on_batch:
+            raise ConnectionError('SMTP server went away')
+        sent, failed = [], 0
+        for message in messages:
+            if message['To'] in self.fail_to:
+                on_error(message, 'mailbox unavailable')
+                failed += 1
+            else:
+                sent.append(message['To'])
+        self.batches.append(sent)
+        return {'sent': len(sent), 'failed': failed}
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, N_USERS + 1)
+    ])
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed=add_users)
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / 'checkpoint.json')
+
+
+def run(app, pool, monkeypatch, checkpoint, **kwargs):
+    monkeypatch.setattr(email_resender, 'smtp_pool', pool)
+    with app.app_context():
+        return email_resender.process_referrals(batch_size=3, checkpoint_path=checkpoint, **kwargs)
+
+
+def test_crashed_run_resumes_after_the_last_batch(app, monkeypatch, checkpoint, tmp_path):
+    crashing = FakePool(crash_on_batch=1, fail_to={'user2@example.com'})
+    with pytest.raises(ConnectionError):
+        run(app, crashing, monkeypatch, checkpoint)
+    with open(checkpoint) as file:
+        saved = json.load(file)
+    assert (saved['last_id'], saved['sent'], saved['failed']) == (3, 2, 1)
+    # Failed addresses are logged beside the checkpoint
+    assert (tmp_path / email_resender.FAILED_LOG).read_text().startswith('user2@example.com\t')
+
+    resumed = FakePool()
+    state = run(app, resumed, monkeypatch, checkpoint)
+    assert resumed.batches == [[f'user{i}@example.com' for i in (4, 5, 6)], ['user7@example.com']]
+    assert (state['last_id'], state['sent'], state['failed']) == (N_USERS, 6, 1)
+    # Finished: the next run starts over
+    assert not (tmp_path / 'checkpoint.json').exists()
+    assert (tmp_path / 'checkpoint.json.done').exists()
+
+
+def test_no_read_transaction_is_held_while_sending(app, monkeypatch, checkpoint):
+    pool = FakePool()
+    run(app, pool, monkeypatch, checkpoint)
+    assert pool.open_transactions == [False, False, False]
+
+
+def test_dry_run_sends_and_saves_nothing(app, monkeypatch, checkpoint, tmp_path):
+    pool = FakePool()
+    state = run(app, pool, monkeypatch, checkpoint, dry_run=True)
+    assert pool.batches == []
+    assert state['sent'] == N_USERS
+    assert not (tmp_path / 'checkpoint.json').exists()
+
+
+def test_failed_log_can_be_moved(app, monkeypatch, checkpoint, tmp_path):
+    log = tmp_path / 'elsewhere.log'
+    run(app, FakePool(fail_to={'user1@example.com'}), monkeypatch, checkpoint, failed_log_path=str(log))
+    assert log.read_text().startswith('user1@example.com\t')
+    assert not (tmp_path / email_resender.FAILED_LOG).exists()
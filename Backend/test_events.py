@@ -0,0 +1,161 @@
+"""
+test_events.py
+
+Publishes each domain event in events.py and checks its subscribers: cached
+leaderboards and profiles are dropped, the in-memory leaderboards and the
+buffered admin counters follow, and a failing receiver neither fails the
+request nor stops the other receivers.
+
+    python -m pytest test_events.py
+"""
+
+import time
+from collections import Counter, defaultdict
+
+import pytest
+
+from admin_pannel import utils as admin_utils
+from caching import get_or_compute, local_cache
+from events import (
+    publish, referral_created, referral_deleted, user_created, user_points_changed, user_updated,
+    winner_created, winner_deleted
+)
+from extensions import cache, db
+from models import Referral, User
+from profile.utils import profile_key
+from referral.leaderboard import leaderboard_engine
+from referral.routes import insert_referral, leaderboard_cache_key, referral_bp
+
+LEADERBOARD_PERIODS = ('all_time', 'daily', 'weekly')
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, 3)
+    ])
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    # Keep admin deltas in the buffer so the tests can read them
+    monkeypatch.setattr(admin_utils, '_pending', defaultdict(Counter))
+    monkeypatch.setattr(admin_utils, '_generation', None)
+    monkeypatch.setattr(admin_utils, '_last_flush', time.monotonic())
+    monkeypatch.setattr(admin_utils, 'FLUSH_INTERVAL', 3600)
+    app = make_app((referral_bp, '/referral'), seed=add_users)
+    with app.app_context():
+        yield app
+
+
+def warm(*keys):
+    for key in keys:
+        get_or_compute(key, lambda: 'cached')
+
+
+def is_cached(key):
+    return local_cache.get(key) is not None or cache.get(key) is not None
+
+
+def leaderboard_keys():
+    return [leaderboard_cache_key(period) for period in LEADERBOARD_PERIODS]
+
+
+def admin_deltas():
+    total = Counter()
+    for deltas in admin_utils._pending.values():
+        total.update(deltas)
+    return {key: value for key, value in total.items() if value}
+
+
+def scores(period='daily'):
+    return [(entry['name'], entry['score']) for entry in leaderboard_engine.leaderboard(period)]
+
+
+def add_referral(referrer_id, email):
+    referral_id, _ = insert_referral(referrer_id, email)
+    db.session.commit()
+    return db.session.get(Referral, referral_id)
+
+
+def test_referral_created(app):
+    warm(*leaderboard_keys(), profile_key(1), profile_key(2))
+    referral = add_referral(1, 'friend@example.com')
+    publish(referral_created, referrer_id=1, referral_id=referral.id, created_at=referral.created_at,
+            name='user1', profile_picture=None)
+
+    assert not any(is_cached(key) for key in leaderboard_keys())
+    assert not is_cached(profile_key(1))
+    assert is_cached(profile_key(2))
+    assert scores() == [('user1', 1)] and scores('weekly') == [('user1', 1)]
+    assert admin_deltas() == {'total_referrals': 1}
+
+
+def test_referral_deleted(app):
+    referral = add_referral(1, 'friend@example.com')
+    publish(referral_created, referrer_id=1, referral_id=referral.id, created_at=referral.created_at)
+    warm(*leaderboard_keys(), profile_key(1))
+
+    db.session.delete(referral)
+    db.session.commit()
+    publish(referral_deleted, referrer_id=1, created_at=referral.created_at)
+
+    assert not any(is_cached(key) for key in leaderboard_keys())
+    assert not is_cached(profile_key(1))
+    assert scores() == []
+    assert admin_deltas() == {}
+
+
+def test_user_updated_and_deleted(app):
+    referral = add_referral(2, 'friend@example.com')
+    publish(referral_created, referrer_id=2, referral_id=referral.id, created_at=referral.created_at)
+    warm(*leaderboard_keys(), profile_key(2))
+
+    publish(user_updated, user_id=2, name='Renamed', profile_picture='pic.png')
+    assert not any(is_cached(key) for key in leaderboard_keys())
+    assert not is_cached(profile_key(2))
+    assert scores() == [('Renamed', 1)]
+
+    warm(*leaderboard_keys())
+    publish(user_updated, user_id=2, deleted=True)
+    assert not any(is_cached(key) for key in leaderboard_keys())
+    assert scores() == []
+    assert admin_deltas() == {'total_referrals': 1, 'total_users': -1}
+
+
+def test_points_changed_only_drops_the_users_profile(app):
+    warm(*leaderboard_keys(), profile_key(1), profile_key(2))
+    publish(user_points_changed, user_id=1, earned_delta=0.5)
+
+    assert not is_cached(profile_key(1))
+    assert is_cached(profile_key(2))
+    assert all(is_cached(key) for key in leaderboard_keys())
+    assert admin_deltas() == {'total_earned': 0.5}
+
+
+def test_user_and_winner_counters(app):
+    publish(user_created, user_id=3)
+    publish(winner_created, user_id=1, winner_type='daily', amount=1.0)
+    publish(winner_created, user_id=2, winner_type='weekly', amount=5.0)
+    publish(winner_deleted, user_id=2, winner_type='weekly', amount=5.0)
+    assert admin_deltas() == {'total_users': 1, 'total_winners': 1}
+
+
+def broken_receiver(sender, **payload):
+    raise RuntimeError('receiver bug')
+
+
+def test_failing_receiver_does_not_break_the_request(app):
+    warm(*leaderboard_keys())
+    referral_created.connect(broken_receiver, weak=False)
+    try:
+        response = app.test_client().post('/referral/process_referral',
+                                          json={'email': 'friend@example.com', 'referrer_code': 'CODE1'})
+    finally:
+        referral_created.disconnect(broken_receiver)
+
+    assert response.status_code == 200
+    assert db.session.query(Referral).count() == 1
+    assert scores() == [('user1', 1)]
+    assert not any(is_cached(key) for key in leaderboard_keys())
+    assert admin_deltas() == {'total_referrals': 1}
@@ -0,0 +1,128 @@
+"""
+test_idempotency.py
+
+Checks the Idempotency-Key layer (idempotency.py) on the withdrawal and signup
+POSTs, and on a small counting view: replays, concurrent duplicates, failed
+requests, key reuse and expiry.
+
+    python -m pytest test_idempotency.py
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Blueprint, jsonify
+
+from auth.routes import auth_bp
+from extensions import db, cache
+from idempotency import idempotent, prune_expired_keys
+from models import IdempotencyKey, User, Withdrawal
+from withdrawal.routes import user_withdrawals_bp
+
+calls = []
+fail_first = threading.Event()
+test_bp = Blueprint('idempotency_test', __name__)
+
+
+@test_bp.route('/count', methods=['POST'])
+@idempotent
+def count():
+    calls.append(1)
+    time.sleep(0.2)  # long enough for duplicates to arrive mid-request
+    if len(calls) == 1 and fail_first.is_set():
+        return jsonify({"message": "boom"}), 500
+    return jsonify({"calls": len(calls)}), 201
+
+
+def add_user():
+    db.session.add(User(name='Ann', email='ann@example.com', password='x',
+                        referral_code='ANN', total_earned=100.0))
+
+
+@pytest.fixture
+def app(make_app):
+    calls.clear()
+    fail_first.clear()
+    return make_app((auth_bp, '/auth'), (user_withdrawals_bp, '/withdrawal'), test_bp, seed=add_user)
+
+
+def withdraw(client, key, amount=10.0):
+    return client.post('/withdrawal/withdrawals', headers={'Idempotency-Key': key},
+                       json={'user_id': 1, 'amount': amount, 'payment_info': 'paypal'})
+
+
+def test_retry_replays_the_stored_response(app):
+    client = app.test_client()
+    first = withdraw(client, 'w-1')
+    retry = withdraw(client, 'w-1')
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+
+    # The shared cache is only a fast path; the table alone also replays
+    with app.app_context():
+        cache.clear()
+    assert withdraw(client, 'w-1').headers['Idempotent-Replayed'] == 'true'
+
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Withdrawal.id))) == 1
+        assert db.session.get(User, 1).total_earned == 90.0
+
+    assert withdraw(client, 'w-2').status_code == 201  # a new key is a new request
+    assert withdraw(client, 'w-1', amount=20.0).status_code == 422
+
+
+def test_signup_retry_creates_one_user(app):
+    client = app.test_client()
+    body = {'name': 'Ben', 'email': 'ben@example.com'}
+    first = client.post('/auth/signup', json=body, headers={'Idempotency-Key': 's-1'})
+    retry = client.post('/auth/signup', json=body, headers={'Idempotency-Key': 's-1'})
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json()['referral_code'] == first.get_json()['referral_code']
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(User.id))) == 2
+
+
+def test_concurrent_duplicates_wait_for_the_first(app):
+    responses = []
+    barrier = threading.Barrier(6)
+
+    def worker():
+        client = app.test_client()
+        barrier.wait()
+        responses.append(client.post('/count', headers={'Idempotency-Key': 'c-1'}, json={}))
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [201] * 6
+    assert {r.get_json()['calls'] for r in responses} == {1}
+
+
+def test_server_errors_are_not_stored(app):
+    client = app.test_client()
+    fail_first.set()
+    assert client.post('/count', headers={'Idempotency-Key': 'e-1'}, json={}).status_code == 500
+    retry = client.post('/count', headers={'Idempotency-Key': 'e-1'}, json={})
+    assert retry.status_code == 201 and len(calls) == 2
+
+
+def test_expired_keys_are_pruned_and_reusable(app):
+    client = app.test_client()
+    client.post('/count', headers={'Idempotency-Key': 'x-1'}, json={})
+    with app.app_context():
+        db.session.execute(db.update(IdempotencyKey).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        cache.clear()
+    assert client.post('/count', headers={'Idempotency-Key': 'x-1'}, json={}).get_json()['calls'] == 2
+
+    with app.app_context():
+        db.session.execute(db.update(IdempotencyKey).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        assert prune_expired_keys() == 1
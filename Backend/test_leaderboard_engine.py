@@ -0,0 +1,116 @@
+"""
+test_leaderboard_engine.py
+
+Checks the in-memory leaderboards (referral/leaderboard.py): tailing
+referrals written by other worker processes alongside this process's own
+events, day/week rollover, verify() finding and repairing drift, and one
+ranking rule for ranks, the top list and the around-me slice.
+
+    python -m pytest test_leaderboard_engine.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import periods
+from extensions import db
+from models import Referral, User
+from referral import leaderboard
+from referral.leaderboard import leaderboard_engine
+from referral.routes import insert_referral, referral_bp
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, 4)
+    ])
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setattr(leaderboard, 'SYNC_INTERVAL', 0)
+    return make_app((referral_bp, '/referral'), seed=add_users)
+
+
+def refer(app, code, email):
+    response = app.test_client().post('/referral/process_referral', json={'email': email, 'referrer_code': code})
+    assert response.status_code == 200
+
+
+def refer_from_another_process(app, referrer_id, email):
+    """Commit a referral without publishing its event, as another worker would."""
+    with app.app_context():
+        insert_referral(referrer_id, email)
+        db.session.commit()
+
+
+def scores(period):
+    return [(entry['name'], entry['score']) for entry in leaderboard_engine.leaderboard(period)]
+
+
+def test_tails_other_processes_around_own_events(app):
+    refer_from_another_process(app, 2, 'a@example.com')
+    refer_from_another_process(app, 2, 'b@example.com')
+    # This worker's event carries a higher id than the two it has not synced yet
+    refer(app, 'CODE1', 'c@example.com')
+
+    with app.app_context():
+        assert scores('daily') == [('user2', 2), ('user1', 1)]
+        assert leaderboard_engine.applied == set()
+        assert leaderboard_engine.verify(repair=False) == {}
+
+        # Replaying the event after the sync does not count it again
+        referral = db.session.execute(db.select(Referral).where(Referral.referred_email == 'c@example.com')).scalar_one()
+        leaderboard_engine.record_referral(1, referral.created_at, referral.id)
+        assert scores('weekly') == [('user2', 2), ('user1', 1)]
+
+
+def test_rank_top_and_around_agree_on_ties(app):
+    for code, count in (('CODE1', 5), ('CODE2', 5), ('CODE3', 4)):
+        for n in range(count):
+            refer(app, code, f'{code.lower()}-{n}@example.com')
+
+    with app.app_context():
+        top = [(entry['rank'], entry['name']) for entry in leaderboard_engine.leaderboard('daily')]
+        assert top == [(1, 'user1'), (2, 'user2'), (3, 'user3')]
+        ranks = [leaderboard_engine.rank_of('daily', user_id) for user_id in (1, 2, 3)]
+        assert ranks == [(1, 5), (2, 5), (3, 4)]
+
+    around = app.test_client().get('/referral/leaderboard/daily/around?user_id=2&radius=1').get_json()
+    assert around['rank'] == 2
+    assert [(entry['rank'], entry['name']) for entry in around['entries']] == top
+
+
+def test_rollover_starts_fresh_boards(app, monkeypatch):
+    refer(app, 'CODE1', 'a@example.com')
+    next_week = datetime.utcnow() + timedelta(days=7)
+    monkeypatch.setattr(leaderboard, 'current', lambda period: periods.period_of(period, next_week))
+
+    with app.app_context():
+        assert scores('daily') == [] and scores('weekly') == []
+        leaderboard_engine.record_referral(2, next_week, name='user2', picture='')
+        assert scores('daily') == [('user2', 1)]
+        # A referral from the previous period no longer counts
+        leaderboard_engine.record_referral(1, datetime.utcnow())
+        assert scores('weekly') == [('user2', 1)]
+
+
+def test_verify_reports_and_repairs_drift(app):
+    refer(app, 'CODE1', 'a@example.com')
+    with app.app_context():
+        leaderboard_engine.boards['daily'].increment(3, 4)
+        assert leaderboard_engine.verify(repair=False) == {'daily': [(3, 4, 0)]}
+        assert leaderboard_engine.verify() == {'daily': [(3, 4, 0)]}
+        assert leaderboard_engine.verify() == {}
+        assert scores('daily') == [('user1', 1)]
+
+
+def test_reads_verify_periodically(app):
+    refer(app, 'CODE1', 'a@example.com')
+    with app.app_context():
+        leaderboard_engine.boards['weekly'].increment(1, 9)
+        assert scores('weekly') == [('user1', 10)]  # checked recently; not yet
+        leaderboard_engine.last_verify -= leaderboard.VERIFY_INTERVAL
+        assert scores('weekly') == [('user1', 1)]
@@ -0,0 +1,154 @@
+"""
+test_leaderboard_stream.py
+
+Checks the live leaderboard stream (referral/stream.py): the snapshot sent on
+connect, one shared diff per change fanned out to every subscriber, rank
+events, resyncing a subscriber that fell behind, and the endpoint being off
+by default and capped across processes when on.
+
+    python -m pytest test_leaderboard_stream.py
+"""
+
+import json
+
+import pytest
+
+from extensions import db
+from models import User
+from referral import stream
+from referral.routes import leaderboard_hub, referral_bp
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, 4)
+    ])
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    # The tests call refresh() themselves; keep the hub thread out of the way
+    monkeypatch.setattr(stream, 'COALESCE_SECONDS', 3600)
+    app = make_app((referral_bp, '/referral'), seed=add_users, config={'LEADERBOARD_STREAMS': 2})
+    leaderboard_hub.clear()
+    return app
+
+
+def refer(app, code, email):
+    response = app.test_client().post('/referral/process_referral', json={'email': email, 'referrer_code': code})
+    assert response.status_code == 200
+
+
+def events(chunk):
+    """[(event, data), ...] parsed from an SSE chunk."""
+    parsed = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            parsed.append((fields['event'], json.loads(fields['data'])))
+    return parsed
+
+
+def test_stream_sends_snapshot_then_shared_diffs(app):
+    refer(app, 'CODE1', 'a@example.com')
+    client = app.test_client()
+    response = client.get('/referral/leaderboard/stream?periods=daily&user_id=2', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    body = iter(response.response)
+
+    first = next(body)
+    assert first.startswith(b'retry: ')
+    (kind, snapshot), (rank_kind, rank) = events(first)
+    assert kind == 'snapshot' and [e['name'] for e in snapshot['entries']] == ['user1']
+    assert rank_kind == 'rank' and rank == {'period': 'daily', 'rank': None, 'score': 0}
+
+    with app.test_request_context():
+        other, _ = leaderboard_hub.subscribe(['daily', 'weekly'])
+    refer(app, 'CODE2', 'b@example.com')
+    refer(app, 'CODE2', 'c@example.com')
+    with app.app_context():
+        leaderboard_hub.refresh()
+
+    diff = next(body)
+    assert events(diff) == [('diff', {'period': 'daily', 'size': 2, 'changes': [
+        {'rank': 1, 'name': 'user2', 'profilePicture': '', 'score': 2},
+        {'rank': 2, 'name': 'user1', 'profilePicture': '', 'score': 1},
+    ]})]
+    assert events(next(body)) == [('rank', {'period': 'daily', 'rank': 1, 'score': 2})]
+
+    # Every subscriber of a period gets the same encoded bytes
+    assert other.queue.get_nowait() is diff
+    assert events(other.queue.get_nowait())[0][1]['period'] == 'weekly'
+
+    with app.app_context():
+        leaderboard_hub.refresh()  # nothing changed: nothing sent
+    assert other.queue.empty()
+    leaderboard_hub.unsubscribe(other)
+    response.close()
+    assert leaderboard_hub.subscriber_count == 0
+
+
+def test_rank_events_below_the_live_top(app):
+    hub = stream.LeaderboardHub(leaderboard_hub.builders, top=1)
+    refer(app, 'CODE1', 'a@example.com')
+    refer(app, 'CODE1', 'b@example.com')
+    with app.test_request_context():
+        subscriber, initial = hub.subscribe(['daily'], user_id=2)
+    assert events(initial[-1]) == [('rank', {'period': 'daily', 'rank': None, 'score': 0})]
+
+    # user2 enters the board at rank 2: the top-1 board is unchanged
+    refer(app, 'CODE2', 'c@example.com')
+    with app.app_context():
+        hub.refresh()
+    assert events(subscriber.queue.get_nowait()) == [('rank', {'period': 'daily', 'rank': 2, 'score': 1})]
+    assert subscriber.queue.empty()
+    hub.unsubscribe(subscriber)
+
+
+def test_slow_subscriber_is_resynced(app):
+    with app.test_request_context():
+        subscriber, initial = leaderboard_hub.subscribe(['daily'])
+    for _ in range(stream.MAX_PENDING + 5):
+        subscriber.push(b'event: diff\ndata: {}\n\n')
+    assert subscriber.lagging and subscriber.queue.qsize() == 1
+
+    refer(app, 'CODE3', 'd@example.com')
+    with app.app_context():
+        leaderboard_hub.refresh()
+    body = leaderboard_hub.stream(subscriber, initial)
+    next(body)
+    # The backlog is dropped; the subscriber gets the current board instead
+    kind, snapshot = events(next(body))[0]
+    assert kind == 'snapshot' and snapshot['entries'][0]['name'] == 'user3'
+    assert not subscriber.lagging
+    body.close()
+    assert leaderboard_hub.subscriber_count == 0
+
+
+def test_unknown_period(app):
+    assert app.test_client().get('/referral/leaderboard/stream?periods=daily,yearly').status_code == 400
+
+
+def test_stream_is_off_by_default(make_app):
+    app = make_app((referral_bp, '/referral'), seed=add_users)
+    assert app.test_client().get('/referral/leaderboard/stream').status_code == 404
+
+
+def test_open_streams_are_capped_across_processes(app):
+    client = app.test_client()
+    first = client.get('/referral/leaderboard/stream?periods=daily', buffered=False)
+    with app.app_context():
+        # A stream open in another worker, holding the second slot
+        other_worker = stream._claim_slot(2)
+    assert other_worker is not None
+
+    refused = client.get('/referral/leaderboard/stream?periods=daily', buffered=False)
+    assert refused.status_code == 503 and refused.headers['Retry-After'] == '30'
+
+    first.close()  # frees its slot
+    second = client.get('/referral/leaderboard/stream?periods=daily', buffered=False)
+    assert second.status_code == 200
+    second.close()
+    assert leaderboard_hub.subscriber_count == 0
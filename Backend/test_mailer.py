@@ -0,0 +1,129 @@
+"""
+test_mailer.py
+
+Unit checks for the pooled SMTP transport using in-memory fake servers.
+
+    python -m pytest test_mailer.py
+"""
+
+import smtplib
+import threading
+import time
+
+import pytest
+
+from mailer import SMTPPool, build_message
+
+
+class FakeServer:
+    """Records messages; optionally fails the next send with a given error."""
+
+    opened = 0
+    lock = threading.Lock()
+
+    def __init__(self, fail_with=None):
+        with FakeServer.lock:
+            FakeServer.opened += 1
+        self.fail_with = fail_with
+        self.sent = []
+
+    def send_message(self, message):
+        if self.fail_with:
+            error, self.fail_with = self.fail_with, None
+            raise error
+        self.sent.append(message['To'])
+
+    def noop(self):
+        return (250, b'OK')
+
+    def quit(self):
+        pass
+
+
+class RefusingServer(FakeServer):
+    """Refuses the given recipients, as a server does for unknown mailboxes."""
+
+    def __init__(self, refuse, code=550):
+        super().__init__()
+        self.refuse = refuse
+        self.code = code
+
+    def send_message(self, message):
+        if message['To'] in self.refuse:
+            raise smtplib.SMTPRecipientsRefused({message['To']: (self.code, b'no such user')})
+        super().send_message(message)
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    FakeServer.opened = 0
+
+
+def messages(n):
+    return [build_message(f"user{i}@example.com", "Hi", "Hello") for i in range(n)]
+
+
+def test_connections_are_reused():
+    pool = SMTPPool(size=2, connect_fn=FakeServer)
+    report = pool.send_many(messages(50), workers=2)
+    assert report['sent'] == 50 and report['failed'] == 0
+    assert FakeServer.opened <= 2
+    assert report['messages_per_second'] > 0
+
+
+def test_reconnects_on_421():
+    servers = iter([
+        FakeServer(fail_with=smtplib.SMTPResponseException(421, b'closing')),
+        FakeServer(),
+    ])
+    pool = SMTPPool(size=1, connect_fn=lambda: next(servers))
+    pool.send(messages(1)[0])
+    stats = pool.stats()
+    assert stats['sent'] == 1 and stats['reconnects'] == 1 and stats['connections'] == 2
+
+
+def test_permanent_errors_are_raised():
+    pool = SMTPPool(size=1, connect_fn=lambda: FakeServer(
+        fail_with=smtplib.SMTPResponseException(550, b'no such user')
+    ))
+    with pytest.raises(smtplib.SMTPResponseException):
+        pool.send(messages(1)[0])
+    assert pool.stats()['failed'] == 1
+
+
+def test_refused_recipients_keep_the_connection():
+    bad = {'user1@example.com', 'user4@example.com', 'user7@example.com'}
+    failed = []
+    pool = SMTPPool(size=1, connect_fn=lambda: RefusingServer(bad))
+    report = pool.send_many(messages(10), workers=1, on_error=lambda message, e: failed.append(message['To']))
+    assert (report['sent'], report['failed']) == (7, 3)
+    assert sorted(failed) == sorted(bad)
+    assert report['connections_opened'] == 1 and report['reconnects'] == 0
+
+
+def test_rejected_message_data_keeps_the_connection():
+    pool = SMTPPool(size=1, connect_fn=lambda: FakeServer(
+        fail_with=smtplib.SMTPDataError(554, b'message rejected')
+    ))
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send(messages(1)[0])
+    pool.send(messages(1)[0])
+    assert FakeServer.opened == 1
+
+
+def test_disconnect_replaces_the_connection():
+    servers = iter([
+        FakeServer(fail_with=smtplib.SMTPServerDisconnected('gone')),
+        FakeServer(),
+    ])
+    pool = SMTPPool(size=1, connect_fn=lambda: next(servers))
+    pool.send(messages(1)[0])
+    stats = pool.stats()
+    assert stats['sent'] == 1 and stats['reconnects'] == 1 and stats['connections'] == 2
+
+
+def test_send_rate_is_respected():
+    pool = SMTPPool(size=2, rate=50, connect_fn=FakeServer)
+    start = time.monotonic()
+    pool.send_many(messages(11), workers=2)
+    assert time.monotonic() - start >= 0.19  # 10 intervals at 50 msg/s
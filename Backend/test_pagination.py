@@ -0,0 +1,98 @@
+"""
+test_pagination.py
+
+Checks cursor pagination on the admin list endpoints (pagination.py):
+walking forwards and backwards, stability under concurrent inserts, the
+descending (created_at, id) key used by withdrawals, and that `page` still
+behaves as before.
+
+    python -m pytest test_pagination.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from admin_pannel.routes import admin_bp
+from extensions import db
+from models import Admin, User, Withdrawal
+
+N_USERS = 23
+
+
+def add_rows():
+    base = datetime(2026, 1, 1)
+    db.session.add(Admin(username='admin', email='admin@example.com', password='x'))
+    for i in range(1, N_USERS + 1):
+        db.session.add(User(
+            name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'U{i}'
+        ))
+    db.session.flush()
+    # Pairs of withdrawals share a timestamp, so the id tiebreak matters
+    for i in range(1, 11):
+        db.session.add(Withdrawal(
+            user_id=i, amount=1.0, user_payment_info='{}', status='pending',
+            created_at=base + timedelta(minutes=i // 2)
+        ))
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app((admin_bp, '/admin'), seed=add_rows)
+
+
+def walk(client, url, key, **params):
+    """Follow next_cursor from the first page; return the ids seen and the last response."""
+    ids, cursor, response = [], '', None
+    while cursor is not None:
+        response = client.get(url, query_string=dict(params, cursor=cursor)).get_json()
+        ids += [item['id'] for item in response[key]]
+        cursor = response['next_cursor']
+    return ids, response
+
+
+def test_walk_forwards_and_back(app):
+    client = app.test_client()
+    ids, last = walk(client, '/admin/users', 'users', limit=5)
+    assert ids == list(range(1, N_USERS + 1))
+    assert [u['id'] for u in last['users']] == [21, 22, 23]
+
+    back = client.get('/admin/users', query_string={'cursor': last['prev_cursor'], 'limit': 5}).get_json()
+    assert [u['id'] for u in back['users']] == [16, 17, 18, 19, 20]
+    assert back['next_cursor'] and back['prev_cursor']
+
+    first = client.get('/admin/users', query_string={'cursor': '', 'limit': 5}).get_json()
+    assert first['prev_cursor'] is None and first['total'] is None
+
+
+def test_inserts_do_not_shift_pages(app):
+    client = app.test_client()
+    page = client.get('/admin/users', query_string={'cursor': '', 'limit': 10}).get_json()
+    with app.app_context():
+        db.session.add(User(name='late', email='late@example.com', password='x', referral_code='LATE'))
+        db.session.commit()
+    following = client.get('/admin/users', query_string={'cursor': page['next_cursor'], 'limit': 10}).get_json()
+    assert [u['id'] for u in following['users']] == list(range(11, 21))
+
+
+def test_descending_compound_key(app):
+    client = app.test_client()
+    ids, _ = walk(client, '/admin/withdrawals', 'withdrawals', admin_id=1, limit=3)
+    legacy = client.get('/admin/withdrawals', query_string={'admin_id': 1, 'limit': 100}).get_json()
+    assert ids == [w['id'] for w in legacy['withdrawals']]
+    assert ids == [10, 9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_page_mode_and_totals(app):
+    client = app.test_client()
+    legacy = client.get('/admin/users', query_string={'page': 2, 'limit': 10}).get_json()
+    assert [u['id'] for u in legacy['users']] == list(range(11, 21))
+    assert (legacy['total'], legacy['pages'], legacy['current_page']) == (N_USERS, 3, 2)
+
+    counted = client.get('/admin/users', query_string={'cursor': '', 'with_total': 1}).get_json()
+    assert counted['total'] == N_USERS
+
+
+def test_invalid_cursor(app):
+    response = app.test_client().get('/admin/referrals', query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
@@ -0,0 +1,98 @@
+"""
+test_period_counts.py
+
+Checks the referral_period_counts rollup: process_referral and referral
+deletes keep it in step, and backfill_period_counts.py repairs drift without
+emptying the live table or losing referrals made while it runs.
+
+    python -m pytest test_period_counts.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from admin_pannel.routes import admin_bp
+from backfill_period_counts import backfill, count_referrals, write_counts
+from extensions import db
+from models import Referral, ReferralPeriodCount, User
+from periods import start_of
+from referral.routes import referral_bp
+
+
+def add_users():
+    db.session.add_all([
+        User(name=f'user{i}', email=f'user{i}@example.com', password='x', referral_code=f'CODE{i}')
+        for i in range(1, 4)
+    ])
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app((referral_bp, '/referral'), (admin_bp, '/admin'), seed=add_users)
+
+
+def refer(app, code, email):
+    response = app.test_client().post('/referral/process_referral', json={'email': email, 'referrer_code': code})
+    assert response.status_code == 200
+
+
+def rollup():
+    """{(period_type, referrer_id): count} for the current day and week."""
+    rows = db.session.execute(db.select(
+        ReferralPeriodCount.period_type, ReferralPeriodCount.period_start,
+        ReferralPeriodCount.referrer_id, ReferralPeriodCount.count
+    )).all()
+    return {
+        (period_type, referrer_id): count
+        for period_type, period_start, referrer_id, count in rows
+        if period_start == start_of(period_type) and count
+    }
+
+
+def test_referrals_and_deletes_update_the_rollup(app):
+    refer(app, 'CODE1', 'a@example.com')
+    refer(app, 'CODE1', 'b@example.com')
+    refer(app, 'CODE2', 'c@example.com')
+    with app.app_context():
+        assert rollup() == {('daily', 1): 2, ('weekly', 1): 2, ('daily', 2): 1, ('weekly', 2): 1}
+        referral_id = db.session.execute(
+            db.select(Referral.id).where(Referral.referred_email == 'a@example.com')
+        ).scalar_one()
+
+    assert app.test_client().delete(f'/admin/referrals/{referral_id}').status_code == 200
+    with app.app_context():
+        assert rollup() == {('daily', 1): 1, ('weekly', 1): 1, ('daily', 2): 1, ('weekly', 2): 1}
+
+
+def test_backfill_repairs_drift(app):
+    refer(app, 'CODE1', 'a@example.com')
+    refer(app, 'CODE2', 'b@example.com')
+    last_month = datetime.utcnow() - timedelta(days=30)
+    with app.app_context():
+        # A referral the rollup never saw, a wrong count and a row with nothing behind it
+        db.session.add(Referral(referrer_id=3, referred_email='old@example.com', created_at=last_month))
+        db.session.execute(db.update(ReferralPeriodCount).where(ReferralPeriodCount.referrer_id == 1).values(count=9))
+        db.session.add(ReferralPeriodCount(period_type='daily', period_start=start_of('daily'),
+                                           referrer_id=3, count=4))
+        db.session.commit()
+
+        backfill(batch_size=2)
+        assert rollup() == {('daily', 1): 1, ('weekly', 1): 1, ('daily', 2): 1, ('weekly', 2): 1}
+        old_daily = db.session.get(ReferralPeriodCount, ('daily', start_of('daily', last_month), 3))
+        assert old_daily.count == 1
+
+
+def test_referrals_during_the_backfill_are_kept(app):
+    refer(app, 'CODE1', 'a@example.com')
+    with app.app_context():
+        max_id = db.session.query(db.func.max(Referral.id)).scalar()
+        totals = count_referrals(max_id)
+
+    # Counted live while the backfill is between its read and write phases
+    refer(app, 'CODE1', 'b@example.com')
+    refer(app, 'CODE2', 'c@example.com')
+
+    with app.app_context():
+        write_counts(totals, max_id, batch_size=1)
+        assert rollup() == {('daily', 1): 2, ('weekly', 1): 2, ('daily', 2): 1, ('weekly', 2): 1}
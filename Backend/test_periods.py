@@ -0,0 +1,71 @@
+"""
+test_periods.py
+
+Checks the US/Eastern day/week boundaries in periods.py: Sunday week starts,
+UTC instants across DST changes, period ids, and that the current periods are
+cached until they end.
+
+    python -m pytest test_periods.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import periods
+
+
+def test_day_and_week_containing_a_utc_moment():
+    # Saturday 2026-01-10 23:30 US/Eastern (EST, UTC-5)
+    moment = datetime(2026, 1, 11, 4, 30)
+    day = periods.period_of('daily', moment)
+    assert (day.start, day.end) == (datetime(2026, 1, 10), datetime(2026, 1, 11))
+    assert (day.start_utc, day.end_utc) == (datetime(2026, 1, 10, 5), datetime(2026, 1, 11, 5))
+    assert day.id == 'daily:2026-01-10'
+
+    week = periods.period_of('weekly', moment)
+    assert (week.start, week.end) == (datetime(2026, 1, 4), datetime(2026, 1, 11))
+    assert week.id == 'weekly:2026-01-04'
+
+    # Half an hour later it is Sunday in New York: a new day and a new week
+    sunday = datetime(2026, 1, 11, 5, 0)
+    assert periods.start_of('daily', sunday) == datetime(2026, 1, 11)
+    assert periods.start_of('weekly', sunday) == datetime(2026, 1, 11)
+
+
+def test_utc_instants_follow_dst():
+    # DST starts 2026-03-08: that day is 23 hours long
+    day = periods.period_of('daily', datetime(2026, 3, 8, 12))
+    assert day.start_utc == datetime(2026, 3, 8, 5)
+    assert day.end_utc == datetime(2026, 3, 9, 4)
+
+    week = periods.period_of('weekly', datetime(2026, 3, 10, 12))
+    assert (week.start_utc, week.end_utc) == (datetime(2026, 3, 8, 5), datetime(2026, 3, 15, 4))
+
+    # DST ends 2026-11-01: that day is 25 hours long
+    day = periods.period_of('daily', datetime(2026, 11, 1, 12))
+    assert (day.start_utc, day.end_utc) == (datetime(2026, 11, 1, 4), datetime(2026, 11, 2, 5))
+
+
+def test_every_moment_falls_inside_its_period():
+    for hour in range(0, 24 * 400, 7):
+        moment = datetime(2026, 1, 1) + timedelta(hours=hour)
+        for period_type in periods.PERIOD_TYPES:
+            period = periods.period_of(period_type, moment)
+            assert period.start_utc <= moment < period.end_utc
+
+
+def test_current_period_is_cached_until_it_ends(monkeypatch):
+    today = periods.current('daily')
+    assert periods.current('daily') is today
+    assert today.start_utc <= datetime.utcnow() < today.end_utc
+    assert 0 < periods.seconds_until_end('daily') <= 25 * 3600
+
+    # Once the stored period is over it is recomputed
+    monkeypatch.setitem(periods._current, 'daily', periods.period_of('daily', datetime(2020, 1, 1)))
+    assert periods.current('daily') == today
+
+
+def test_unknown_period_type():
+    with pytest.raises(ValueError):
+        periods.period_of('monthly', datetime(2026, 1, 1))
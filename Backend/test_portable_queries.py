@@ -0,0 +1,122 @@
+"""
+test_portable_queries.py
+
+Runs the hot read paths (period leaderboards, profile ranks, winner selection,
+admin analytics) end to end so they can be checked on every backend:
+
+    python -m pytest test_portable_queries.py
+    TEST_DATABASE_URL=postgresql://postgres@localhost/chike_test python -m pytest test_portable_queries.py
+"""
+
+import pytest
+
+from admin_pannel.routes import admin_bp
+from extensions import db
+from models import Referral, User, Winner
+from periods import start_of
+from profile.utils import get_user_ranks
+from referral.leaderboard import leaderboard_engine
+from referral.routes import build_all_time_leaderboard, referral_bp
+from referral.utils import (
+    get_daily_leaderboard, handle_daily_winner
+)
+
+# name -> referrals today; Ann and Ben tie, so order must fall back to id
+REFERRALS = {'Ann': 20, 'Ben': 20, 'Cat': 5, 'Dan': 0}
+
+
+def add_users():
+    for name in REFERRALS:
+        db.session.add(User(
+            name=name, email=f'{name.lower()}@example.com', password='x',
+            referral_code=name.upper()
+        ))
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app((referral_bp, '/referral'), (admin_bp, '/admin'), seed=add_users)
+    client = app.test_client()
+    for name, count in REFERRALS.items():
+        for n in range(count):
+            response = client.post('/referral/process_referral', json={
+                'email': f'{name.lower()}-friend{n}@example.com', 'referrer_code': name.upper()
+            })
+            assert response.status_code == 200
+    return app
+
+
+def user_id(name):
+    return db.session.execute(db.select(User.id).where(User.name == name)).scalar_one()
+
+
+def test_daily_leaderboard_orders_ties_by_id(app):
+    with app.app_context():
+        board = get_daily_leaderboard()
+        assert [(e['rank'], e['name'], e['score']) for e in board] == [
+            (1, 'Ann', 20), (2, 'Ben', 20), (3, 'Cat', 5)
+        ]
+        leaderboard_engine.rebuild()
+        engine_board = leaderboard_engine.leaderboard('daily')
+        assert [(e['name'], e['score']) for e in engine_board] == [
+            (e['name'], e['score']) for e in board
+        ]
+
+
+def test_all_time_leaderboard_orders_ties_by_id(app):
+    with app.app_context():
+        # Rewrite Ann's row so a server database is likely to return Ben's first
+        db.session.execute(db.update(User).where(User.name == 'Ann').values(profile_picture='ann.png'))
+        db.session.commit()
+        board = build_all_time_leaderboard()
+        assert [(e['rank'], e['name'], e['score']) for e in board[:3]] == [
+            (1, 'Ann', 20), (2, 'Ben', 20), (3, 'Cat', 5)
+        ]
+
+
+def test_profile_ranks(app):
+    with app.app_context():
+        sod, sow = start_of('daily'), start_of('weekly')
+        ben = get_user_ranks(user_id('Ben'), sod, sow)
+        assert ben == {
+            'daily_referrals': 20, 'weekly_referrals': 20,
+            'daily_rank': 1, 'weekly_rank': 1, 'total_rank': 1,
+        }
+        dan = get_user_ranks(user_id('Dan'), sod, sow)
+        assert dan['daily_rank'] is None and dan['total_rank'] == 4
+
+
+@pytest.mark.sqlite_only  # PostgreSQL's foreign keys keep the rollup rows from being orphaned
+def test_profile_ranks_skip_deleted_users(app):
+    with app.app_context():
+        ann = user_id('Ann')
+        db.session.execute(db.delete(Referral).where(Referral.referrer_id == ann))
+        db.session.execute(db.delete(User).where(User.id == ann))
+        db.session.commit()
+
+        sod, sow = start_of('daily'), start_of('weekly')
+        cat = get_user_ranks(user_id('Cat'), sod, sow)
+        assert (cat['daily_rank'], cat['weekly_rank'], cat['total_rank']) == (2, 2, 2)
+
+
+def test_daily_winner_is_deterministic(app):
+    with app.app_context():
+        handle_daily_winner()
+        winner = db.session.execute(db.select(Winner)).scalar_one()
+        assert winner.user_id == user_id('Ann')
+        assert db.session.get(User, winner.user_id).total_earned == 1.0
+
+
+def test_admin_analytics(app):
+    client = app.test_client()
+    dashboard = client.get('/admin/dashboard').get_json()
+    assert dashboard['total_users'] == len(REFERRALS)
+    assert dashboard['total_referrals'] == sum(REFERRALS.values())
+    assert [u['referrals_count'] for u in dashboard['top_referrers'][:3]] == [20, 20, 5]
+
+    stats = client.get('/admin/stats').get_json()
+    assert stats['total_referrals'] == sum(REFERRALS.values())
+    assert stats['total_earned_sum'] == 0.0
+
+    all_time = client.get('/referral/leaderboard').get_json()
+    assert [entry['score'] for entry in all_time][:3] == [20, 20, 5]
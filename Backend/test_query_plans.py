@@ -0,0 +1,207 @@
+"""
+test_query_plans.py
+
+Runs EXPLAIN QUERY PLAN on every hot query and fails if SQLite would fall
+back to a full table scan or an unindexed sort. Also checks that the Alembic
+migrations build the same indexes as models.py, that autogenerate finds
+nothing to change after them, and that the documented `flask db upgrade`
+builds an empty server database.
+
+    python -m pytest test_query_plans.py
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from flask_migrate import Migrate, migrate, upgrade
+from sqlalchemy import create_engine, inspect
+
+from extensions import db
+from models import User, Referral, ReferralPeriodCount, Winner, Withdrawal
+from profile.utils import get_user_ranks
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(BACKEND_DIR, 'migrations')
+
+
+@pytest.fixture(scope='module')
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def plan_of(statement):
+    """EXPLAIN QUERY PLAN rows (detail strings) for a SQLAlchemy statement."""
+    compiled = statement.compile(db.engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params)
+        return [row[-1] for row in rows]
+
+
+def assert_indexed(statement):
+    plan = plan_of(statement)
+    full_scans = [d for d in plan if re.match(r'SCAN \w+$', d)]
+    temp_sorts = [d for d in plan if 'USE TEMP B-TREE' in d]
+    assert not full_scans, f"Full table scan in plan: {plan}"
+    assert not temp_sorts, f"Unindexed sort/grouping in plan: {plan}"
+
+
+NOW = datetime(2026, 1, 4, 12, 0, 0)
+START = datetime(2026, 1, 4)
+
+HOT_QUERIES = {
+    # process_referral
+    'referrer_by_code': lambda: db.select(User).where(User.referral_code == 'ABC'),
+    'duplicate_referral': lambda: db.select(Referral).where(Referral.referred_email == 'a@b.c').limit(1),
+    # signup / set-password / login
+    'user_by_email': lambda: db.select(User).where(User.email == 'a@b.c'),
+    'user_by_pass_token': lambda: db.select(User).where(User.pass_token == 'tok'),
+    # leaderboards
+    'all_time_top': lambda: db.select(User).order_by(User.referrals_count.desc()).limit(7),
+    'period_ranking': lambda: (
+        db.select(User, ReferralPeriodCount.count)
+        .join(ReferralPeriodCount, User.id == ReferralPeriodCount.referrer_id)
+        .where(
+            ReferralPeriodCount.period_type == 'daily',
+            ReferralPeriodCount.period_start == START,
+            ReferralPeriodCount.count > 0
+        )
+        .order_by(ReferralPeriodCount.count.desc(), ReferralPeriodCount.referrer_id)
+    ),
+    'leaderboard_tail': lambda: (
+        db.select(Referral.id, Referral.referrer_id, Referral.created_at)
+        .where(Referral.id > 10).order_by(Referral.id)
+    ),
+    # profile
+    'user_referrals_since': lambda: (
+        db.select(db.func.count(Referral.id))
+        .where(Referral.referrer_id == 1, Referral.created_at >= START)
+    ),
+    # winner jobs
+    'winner_exists': lambda: (
+        db.select(Winner)
+        .where(Winner.type == 'daily', Winner.date >= START, Winner.date <= NOW)
+        .limit(1)
+    ),
+    # admin lists / stats
+    'admin_referrals_by_referrer': lambda: (
+        db.select(Referral)
+        .where(Referral.referrer_id == 1, Referral.created_at >= START, Referral.created_at <= NOW)
+    ),
+    'admin_referrals_by_date': lambda: (
+        db.select(Referral).where(Referral.created_at >= START, Referral.created_at <= NOW)
+    ),
+    'top_earners': lambda: db.select(User).order_by(User.total_earned.desc()).limit(5),
+    'withdrawals_by_status': lambda: (
+        db.select(Withdrawal)
+        .where(Withdrawal.status == 'pending')
+        .order_by(Withdrawal.created_at.desc()).limit(10)
+    ),
+    'withdrawals_by_user': lambda: (
+        db.select(Withdrawal)
+        .where(Withdrawal.user_id == 1)
+        .order_by(Withdrawal.created_at.desc()).limit(10)
+    ),
+    'withdrawals_all': lambda: db.select(Withdrawal).order_by(Withdrawal.created_at.desc()).limit(10),
+    # admin list cursors (pagination.py)
+    'users_after_cursor': lambda: db.select(User).where(db.tuple_(User.id) > (100,)).order_by(User.id).limit(11),
+    'withdrawals_after_cursor': lambda: (
+        db.select(Withdrawal)
+        .where(db.tuple_(Withdrawal.created_at, Withdrawal.id) < (NOW, 100))
+        .order_by(Withdrawal.created_at.desc(), Withdrawal.id.desc()).limit(11)
+    ),
+    'pending_withdrawals_after_cursor': lambda: (
+        db.select(Withdrawal)
+        .where(Withdrawal.status == 'pending', db.tuple_(Withdrawal.created_at, Withdrawal.id) < (NOW, 100))
+        .order_by(Withdrawal.created_at.desc(), Withdrawal.id.desc()).limit(11)
+    ),
+}
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+@pytest.mark.sqlite_only
+def test_hot_query_uses_index(app, name):
+    assert_indexed(HOT_QUERIES[name]())
+
+
+@pytest.mark.sqlite_only
+def test_profile_query_uses_index(app):
+    """The profile figures are one statement; only its one-row CTEs are scanned."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    db.event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        get_user_ranks(1, START, START - timedelta(days=3))
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert len(statements) == 1
+    statement, parameters = statements[0]
+    with db.engine.connect() as conn:
+        plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    assert not [d for d in plan if re.match(r'SCAN \w+$', d) and d not in ('SCAN me', 'SCAN scores')], plan
+
+
+def test_migrations_match_models(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    db.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            migrated = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            declared = {ix.name for ix in table.indexes}
+            assert declared <= migrated, f"{table.name}: missing {declared - migrated}"
+        db.engine.dispose()
+
+
+def test_autogenerate_finds_no_changes(database_uri, tmp_path):
+    # The FTS search tables are not in db.metadata; env.py must not drop them
+    directory = str(tmp_path / 'migrations')
+    shutil.copytree(MIGRATIONS_DIR, directory, ignore=shutil.ignore_patterns('__pycache__'))
+    versions = set(os.listdir(os.path.join(directory, 'versions')))
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    db.init_app(app)
+    Migrate(app, db, directory=directory)
+    with app.app_context():
+        upgrade(directory=directory)
+        Migrate(app, db, directory=directory)  # fresh configure_args, as a separate `flask db migrate` gets
+        migrate(directory=directory)
+        db.engine.dispose()
+    assert set(os.listdir(os.path.join(directory, 'versions'))) - {'__pycache__'} == versions
+
+
+def test_flask_db_upgrade_builds_an_empty_server_database(database_uri, tmp_path):
+    if database_uri.startswith('sqlite'):
+        pytest.skip('app.py creates SQLite databases itself; they are stamped, not upgraded')
+    env = dict(
+        os.environ, DATABASE_URL=database_uri, EMAIL_OUTBOX_WORKERS='0',
+        CACHE_SQLITE_PATH=str(tmp_path / 'cache.db')
+    )
+    result = subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+    engine = create_engine(database_uri)
+    tables = set(inspect(engine).get_table_names())
+    engine.dispose()
+    assert {table.name for table in db.metadata.sorted_tables} <= tables
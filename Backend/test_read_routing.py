@@ -0,0 +1,103 @@
+"""
+test_read_routing.py
+
+Checks the primary/replica routing in db_routing.py with a second SQLite file
+standing in for the replica. The "replica" is never synced, and it holds
+deliberately different rows so each response shows which database served it.
+
+    python -m pytest test_read_routing.py
+"""
+
+import os
+import tempfile
+
+import pytest
+
+import db_routing
+from admin_pannel.routes import admin_bp
+from caching import local_cache
+from extensions import db, cache
+from models import User, Referral
+from profile.routes import profile_bp
+from referral.routes import referral_bp
+
+
+USERS = [
+    {'id': 1, 'name': 'Ann', 'email': 'ann@example.com', 'password': 'x', 'referral_code': 'ANN'},
+    {'id': 2, 'name': 'Ben', 'email': 'ben@example.com', 'password': 'x', 'referral_code': 'BEN'},
+]
+
+
+def add_users():
+    db.session.execute(db.insert(User), USERS)
+    replica = db_routing.get_replica()
+    if replica is not None:
+        db.metadata.create_all(replica)
+        with replica.begin() as conn:
+            conn.execute(db.insert(User), [
+                dict(USERS[0], referrals_count=0),
+                dict(USERS[1], referrals_count=7),
+                {'id': 3, 'name': 'Replica only', 'email': 'r@example.com',
+                 'password': 'x', 'referral_code': 'REPLICA', 'referrals_count': 0},
+            ])
+
+
+def routed_app(make_app, replica_uri=None):
+    return make_app(
+        (admin_bp, '/admin'), (referral_bp, '/referral'), (profile_bp, '/profile'),
+        seed=add_users, init=lambda app: db_routing.init_app(app, replica_uri)
+    )
+
+
+@pytest.fixture
+def app(make_app):
+    fd, replica_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = routed_app(make_app, f'sqlite:///{replica_path}')
+    yield app
+    with app.app_context():
+        db_routing.get_replica().dispose()
+    os.remove(replica_path)
+
+
+def profile(client, user_id):
+    return client.post('/profile/profile', json={'userID': user_id}).get_json()
+
+
+def test_read_only_views_use_the_replica(app):
+    client = app.test_client()
+    assert client.get('/admin/dashboard').get_json()['total_users'] == 3
+    assert client.get('/admin/users').get_json()['total'] == 3
+    assert profile(client, 2)['totalReferrals'] == 7
+
+
+def test_writes_go_to_the_primary(app):
+    client = app.test_client()
+    response = client.post('/referral/process_referral', json={
+        'email': 'friend@example.com', 'referrer_code': 'ANN'
+    })
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(Referral.id))) == 1
+        with db_routing.get_replica().connect() as conn:
+            assert conn.scalar(db.select(db.func.count(Referral.id))) == 0
+
+
+def test_user_reads_own_writes_from_the_primary(app):
+    client = app.test_client()
+    client.post('/referral/process_referral', json={
+        'email': 'friend@example.com', 'referrer_code': 'ANN'
+    })
+    # Ann just wrote: her profile comes from the primary; Ben's still from the replica
+    assert profile(client, 1)['totalReferrals'] == 1
+    assert profile(client, 2)['totalReferrals'] == 7
+
+    with app.app_context():
+        cache.clear()  # window over, and the memoized profile expired
+    local_cache.clear()
+    assert profile(client, 1)['totalReferrals'] == 0
+
+
+def test_without_a_replica_everything_uses_the_primary(make_app):
+    app = routed_app(make_app)
+    assert app.test_client().get('/admin/dashboard').get_json()['total_users'] == 2
@@ -0,0 +1,75 @@
+"""
+test_search.py
+
+Checks the admin user/referral search in search.py: substring and prefix
+matches, ordering, short terms, and that the SQLite trigram index follows
+inserts, renames and deletes.
+
+    python -m pytest test_search.py
+"""
+
+import pytest
+
+from admin_pannel.routes import admin_bp
+from extensions import db
+from models import Referral, User
+
+
+def add_rows():
+    for name, email in [
+        ('Bob Marley', 'bob@example.com'),
+        ('Anna Robinson', 'anna@example.com'),
+        ('Robert Smith', 'robert@mail.org'),
+        ('Cy Young', 'cy@example.com'),
+    ]:
+        db.session.add(User(name=name, email=email, password='x', referral_code=name[:3].upper() + email[:2]))
+    db.session.commit()
+    db.session.add_all([
+        Referral(referrer_id=1, referred_email='friend.one@mail.org'),
+        Referral(referrer_id=1, referred_email='other@example.com'),
+    ])
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app((admin_bp, '/admin'), seed=add_rows)
+
+
+def names(client, **params):
+    return [u['name'] for u in client.get('/admin/users', query_string=params).get_json()['users']]
+
+
+def test_substring_match_prefix_first(app):
+    client = app.test_client()
+    # "rob" starts Robert's name, and appears inside Anna Robinson's
+    assert names(client, name='ROB') == ['Robert Smith', 'Anna Robinson']
+    assert names(client, email='mail.org') == ['Robert Smith']
+    assert sorted(names(client, q='example')) == ['Anna Robinson', 'Bob Marley', 'Cy Young']
+    assert names(client, q='nobody') == []
+
+
+def test_short_terms_and_special_characters(app):
+    client = app.test_client()
+    assert names(client, name='cy') == ['Cy Young']
+    assert names(client, q='"bob') == []
+    assert names(client, q='%') == []
+
+
+def test_index_follows_writes(app):
+    client = app.test_client()
+    with app.app_context():
+        user = db.session.get(User, 4)
+        user.name = 'Cyrus Newname'
+        db.session.delete(db.session.get(User, 3))
+        db.session.commit()
+    assert names(client, name='newname') == ['Cyrus Newname']
+    assert names(client, name='young') == []
+    assert names(client, name='robert') == []
+    assert names(client, name='rob') == ['Anna Robinson']
+
+
+def test_referral_email_search(app):
+    client = app.test_client()
+    response = client.get('/admin/referrals', query_string={'email': 'mail.org'}).get_json()
+    assert [r['referred_email'] for r in response['referrals']] == ['friend.one@mail.org']
+    assert response['total'] == 1
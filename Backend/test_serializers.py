@@ -0,0 +1,78 @@
+"""
+test_serializers.py
+
+Checks the compiled row serializers and the orjson JSON provider
+(serializers.py) against the hand-written dicts and Flask's default provider
+they replace.
+
+    python -m pytest test_serializers.py
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+import serializers
+from extensions import db
+from models import User, Withdrawal
+
+pytest.importorskip('orjson')
+
+
+def add_rows():
+    db.session.add(User(name='Ann', email='ann@example.com', password='x', referral_code='ANN',
+                        total_earned=2.5, created_at=datetime(2025, 1, 2, 3, 4, 5, 678901)))
+    db.session.add(Withdrawal(user_id=1, amount=1.0, user_payment_info='{}', status='pending',
+                              created_at=datetime(2025, 1, 3)))
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(seed=add_rows, init=serializers.init_app)
+    with app.app_context():
+        yield app
+
+
+def test_dump_matches_the_hand_written_dict(app):
+    user = db.session.get(User, 1)
+    assert serializers.users.dump(user) == {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "referral_code": user.referral_code,
+        "referrals_count": user.referrals_count,
+        "profile_picture": user.profile_picture,
+        "created_at": user.created_at.isoformat(),
+        "total_earned": user.total_earned,
+        "total_points": user.total_points,
+        "last_trivia_attempt": None,
+    }
+
+    withdrawal = db.session.get(Withdrawal, 1)
+    row = db.session.execute(serializers.withdrawals.select()).one()
+    expected = serializers.withdrawals.dump(withdrawal)
+    assert expected['created_at'] == '2025-01-03T00:00:00' and expected['processed_at'] is None
+    assert serializers.withdrawals.dump(row) == expected
+    assert serializers.withdrawals.dump_tuple(tuple(row)) == expected
+
+
+def test_provider_output_matches_flask_default(app):
+    payload = {
+        "users": serializers.users.many(db.session.scalars(db.select(User))),
+        "when": datetime(2025, 1, 2, 3, 4, 5),
+        "day": date(2025, 1, 2),
+        "price": Decimal('1.50'),
+        "counts": {1: 'a', 2: 'b'},
+        "big": 2 ** 70,
+    }
+    default = DefaultJSONProvider(app)
+    assert app.json.loads(app.json.dumps(payload)) == default.loads(default.dumps(payload))
+
+    with app.test_request_context():
+        body = jsonify(payload).get_data(as_text=True)
+        assert body.endswith('\n')
+        assert app.json.loads(body) == default.loads(default.dumps(payload))
+        assert app.json.loads(body)['when'] == 'Thu, 02 Jan 2025 03:04:05 GMT'
@@ -3,6 +3,8 @@ import json, random
 from datetime import datetime, timedelta
 from extensions import db
 from models import User  # Import User model
+from counters import increment_user
+from events import publish, user_points_changed
 
 trivia_bp = Blueprint('trivia', __name__)
 
@@ -82,12 +84,14 @@ def check_results():
     # Update user data
     user.last_trivia_attempt = now
     points_earned = score * 10  # Each correct answer gives 10 points
-    user.total_points += points_earned
+    # Add in SQL so simultaneous submissions can't overwrite each other's points
+    (total_points,) = increment_user(user.id, total_points=points_earned)
     db.session.commit()
+    publish(user_points_changed, user_id=user.id)
 
     return jsonify({
         "score": score,
         "points_earned": points_earned,
-        "total_points": user.total_points,
+        "total_points": total_points,
         "results": results
     })
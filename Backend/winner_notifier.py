@@ -1,15 +1,8 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from mailer import build_message, deliver
 
-# Configuration
-SENDER_EMAIL = "hi@playchike.com"
-PASSWORD = "#cab466GOES601#"
-SMTP_SERVER = "mail.playchike.com"
-SMTP_PORT = 465  # Use 465 for SSL
-
-def send_winner_email(receiver_email, name, referral_count, prize, timeframe, date, referral_code):
+def build_winner_message(receiver_email, name, referral_count, prize, timeframe, date, referral_code):
+    """Builds the HTML "top referrer" email."""
 
     # Email subject
     subject = f"🎉 Congratulations, You’re the {timeframe.capitalize()} Top Referrer!"
@@ -118,23 +111,15 @@ def send_winner_email(receiver_email, name, referral_count, prize, timeframe, da
     """
 
     # Create a multipart message
-    message = MIMEMultipart("alternative")
-    message["From"] = SENDER_EMAIL
-    message["To"] = receiver_email
-    message["Subject"] = subject
+    return build_message(receiver_email, subject, html_message, "html")
 
-    # Attach the HTML content
-    message.attach(MIMEText(html_message, "html"))
 
+def send_winner_email(receiver_email, name, referral_count, prize, timeframe, date, referral_code):
+    """Sends the winner email immediately (prefer enqueueing via email_outbox)."""
     try:
-        # Connect to the SMTP server over SSL
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
-            # Log in to the server
-            server.login(SENDER_EMAIL, PASSWORD)
-
-            # Send the email
-            server.send_message(message)
-
+        deliver(build_winner_message(
+            receiver_email, name, referral_count, prize, timeframe, date, referral_code
+        ))
         print(f"Winner email sent successfully to {receiver_email}")
 
     except Exception as e:
@@ -3,6 +3,9 @@ from extensions import db, cache
 from models import User, Withdrawal
 from referral.utils import increment_referrals_count
 from referral.utils import get_daily_leaderboard, get_weekly_leaderboard
+from events import publish, user_points_changed
+from counters import debit_user
+from idempotency import idempotent
 import json
 
 from flask_cors import cross_origin
@@ -16,6 +19,7 @@ MIN_WITHDRAWAL_AMOUNT = 10.0  # example
 
 @user_withdrawals_bp.route('/withdrawals', methods=['POST', 'OPTIONS'])
 @cross_origin()
+@idempotent
 def request_withdrawal():
     """
     User requests a new withdrawal.
@@ -64,8 +68,12 @@ def request_withdrawal():
     )
 
     try:
-        # Deduct the withdrawal amount from the user's total earned balance
-        user.total_earned -= amount
+        # Deduct the withdrawal amount from the user's total earned balance.
+        # The balance check is part of the UPDATE, so two concurrent requests
+        # can't both spend the same funds.
+        if debit_user(user.id, 'total_earned', amount) is None:
+            db.session.rollback()
+            return jsonify({"message": "Insufficient balance"}), 400
 
         db.session.add(new_withdrawal)
         db.session.commit()
@@ -73,6 +81,8 @@ def request_withdrawal():
         db.session.rollback()
         return jsonify({"message": "Error creating withdrawal", "error": str(e)}), 500
 
+    publish(user_points_changed, user_id=user.id, earned_delta=-amount)
+
     return jsonify({
         "message": "Withdrawal request created",
         "withdrawal_id": new_withdrawal.id,